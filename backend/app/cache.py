@@ -0,0 +1,350 @@
+"""
+Pluggable cache backends for the chat path.
+
+CACHE_BACKEND selects one of:
+
+    memory  per-process dict (the default; fine for a single worker)
+    shm     fixed-size table in a memory-mapped file shared by all workers
+            on one host (CACHE_SHM_PATH)
+    redis   any server speaking the Redis protocol (CACHE_REDIS_URL); the
+            client is a minimal RESP implementation, no redis package needed
+
+Values are bytes; get_json/set_json wrap them for JSON data. With the shm
+and redis backends every worker reads the same entries, so a delete after a
+write invalidates the entry for all workers at once.
+
+A cache must never fail a request: backend errors are logged and treated as
+misses.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from . import codec
+from .env import Env
+from .logs import log
+from .metrics import CACHE_LOOKUPS
+
+
+class CacheBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached value, or None when missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store value for ttl seconds."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key (for every worker sharing this backend)."""
+
+    def get_json(self, key: str, cache: str) -> Optional[Any]:
+        """Decoded JSON value; counts the lookup under the cache label."""
+        value = None
+        try:
+            raw = self.get(key)
+            if raw is not None:
+                value = codec.loads(raw)
+        except ValueError as e:
+            # A corrupt or truncated entry: drop it so the next request refills it
+            log.warning("cache.invalid_entry", backend=self.name, key=key, error=str(e))
+            self.invalidate(key)
+            raw = None
+        except Exception as e:
+            log.warning("cache.get_failed", backend=self.name, key=key, error=str(e))
+            raw = None
+        CACHE_LOOKUPS.inc(cache=cache, result="miss" if raw is None else "hit")
+        return value
+
+    def set_json(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            self.set(key, codec.dumps(value), ttl)
+        except Exception as e:
+            log.warning("cache.set_failed", backend=self.name, key=key, error=str(e))
+
+    def invalidate(self, key: str) -> None:
+        try:
+            self.delete(key)
+        except Exception as e:
+            log.warning("cache.delete_failed", backend=self.name, key=key, error=str(e))
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SharedMemoryCache(CacheBackend):
+    """
+    Direct-mapped table in a memory-mapped file, shared by every process
+    that opens the same path.
+
+    Each key hashes (with a stable hash; Python's hash() differs per process)
+    to one fixed-size slot: a header (key hash, expiry as wall-clock time,
+    key and value lengths) followed by the key and value bytes. A colliding
+    key simply evicts the previous entry, and values larger than a slot are
+    not cached. Reads take a shared and writes an exclusive flock on the
+    file, so no process sees a half-written slot.
+    """
+
+    name = "shm"
+    _HEADER = struct.Struct("<QdHI")  # key hash, expires at, key length, value length
+
+    def __init__(self, path: str, slots: int = 1024, slot_bytes: int = 65536):
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        size = slots * slot_bytes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            current = os.fstat(self._fd).st_size
+            if current == 0:
+                # Sparse file: untouched slots take no memory
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        if current not in (0, size):
+            # Resizing a file other workers have mapped would crash them
+            # (SIGBUS past the new end); a new size needs a new file
+            os.close(self._fd)
+            raise ValueError(
+                f"{path} is {current} bytes but CACHE_SHM_SLOTS x CACHE_SHM_SLOT_BYTES is {size}; "
+                "remove it or set CACHE_SHM_PATH to a new file"
+            )
+        self._map = mmap.mmap(self._fd, size)
+        self._local_lock = threading.Lock()  # flock is per process, not per thread
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _slot(self, key_hash: int) -> int:
+        return (key_hash % self.slots) * self.slot_bytes
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        with self._local_lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode("utf-8")
+        key_hash = self._hash(encoded)
+        offset = self._slot(key_hash)
+        with self._locked(fcntl.LOCK_SH):
+            stored_hash, expires_at, key_length, value_length = self._HEADER.unpack_from(self._map, offset)
+            if stored_hash != key_hash or expires_at <= time.time():
+                return None
+            start = offset + self._HEADER.size
+            if self._map[start:start + key_length] != encoded:
+                return None
+            start += key_length
+            return bytes(self._map[start:start + value_length])
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        encoded = key.encode("utf-8")
+        if self._HEADER.size + len(encoded) + len(value) > self.slot_bytes:
+            return  # too large for a slot
+        key_hash = self._hash(encoded)
+        offset = self._slot(key_hash)
+        with self._locked(fcntl.LOCK_EX):
+            start = offset + self._HEADER.size
+            self._map[start:start + len(encoded)] = encoded
+            start += len(encoded)
+            self._map[start:start + len(value)] = value
+            self._HEADER.pack_into(self._map, offset, key_hash, time.time() + ttl, len(encoded), len(value))
+
+    def delete(self, key: str) -> None:
+        encoded = key.encode("utf-8")
+        key_hash = self._hash(encoded)
+        offset = self._slot(key_hash)
+        with self._locked(fcntl.LOCK_EX):
+            if self._HEADER.unpack_from(self._map, offset)[0] == key_hash:
+                self._HEADER.pack_into(self._map, offset, 0, 0.0, 0, 0)
+
+
+class RedisProtocolError(RuntimeError):
+    """Raised on an error reply or a malformed response from the server."""
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache on a Redis-protocol server (Redis, Valkey, KeyDB, or the stand-in
+    in fakes/fake_redis.py). One connection per thread, reconnected on error.
+    """
+
+    name = "redis"
+
+    retry_after = 5.0
+
+    def __init__(self, url: str, timeout: float = 0.5, prefix: str = "archie:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.prefix = prefix
+        self._local = threading.local()
+        self._unavailable_until = 0.0
+
+    # RESP encoding / decoding
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise RedisProtocolError("connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisProtocolError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise RedisProtocolError("connection closed")
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count == -1 else [self._read_reply(reader) for _ in range(count)]
+        raise RedisProtocolError(f"unexpected reply type {kind!r}")
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile("rb"))
+        self._local.connection = connection
+        if self.password:
+            self._execute(connection, "AUTH", self.password)
+        if self.db:
+            self._execute(connection, "SELECT", self.db)
+        return connection
+
+    def _execute(self, connection, *args: Any) -> Any:
+        sock, reader = connection
+        sock.sendall(self._encode(*args))
+        return self._read_reply(reader)
+
+    def command(self, *args: Any) -> Any:
+        if time.monotonic() < self._unavailable_until:
+            raise RedisProtocolError("server unavailable, retrying later")
+        connection = getattr(self._local, "connection", None)
+        try:
+            return self._execute(connection or self._connect(), *args)
+        except (OSError, RedisProtocolError) as e:
+            if isinstance(e, RedisProtocolError) and "connection closed" not in str(e):
+                raise
+            # Stale connection: reconnect once
+            self._close()
+            try:
+                return self._execute(self._connect(), *args)
+            except OSError:
+                # Don't pay a connect timeout on every request while the server is down
+                self._close()
+                self._unavailable_until = time.monotonic() + self.retry_after
+                raise
+
+    def _close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection:
+            try:
+                connection[0].close()
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command("GET", self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.command("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self.command("DEL", self.prefix + key)
+
+
+def _default_shm_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "archie-cache")
+
+
+def create_cache() -> CacheBackend:
+    kind = Env.CACHE_BACKEND.lower()
+    try:
+        if kind == "shm":
+            return SharedMemoryCache(
+                Env.CACHE_SHM_PATH or _default_shm_path(),
+                slots=Env.CACHE_SHM_SLOTS,
+                slot_bytes=Env.CACHE_SHM_SLOT_BYTES,
+            )
+        if kind == "redis":
+            return RedisCache(Env.CACHE_REDIS_URL)
+    except Exception as e:
+        log.error("cache.init_failed", backend=kind, error=str(e), fallback="memory")
+        return MemoryCache()
+    if kind != "memory":
+        log.warning("cache.unknown_backend", backend=kind, fallback="memory")
+    return MemoryCache()
+
+
+cache: CacheBackend = create_cache()
@@ -0,0 +1,123 @@
+"""
+Anonymized recordings ("cassettes") of Gemini chat replies.
+
+With CASSETTE_DIR set, a sample of chat generations (CASSETTE_SAMPLE_RATE)
+is appended to CASSETTE_DIR/replies-YYYYMMDD.jsonl: the raw response.text,
+token usage, finish reason, model and prompt metadata. Parsing edge cases
+and output-size trends only show up in real replies;
+benchmarks/replay_cassettes.py runs the collected corpus through the
+post-LLM pipeline to catch regressions deterministically.
+
+What is stored is anonymized: the prompt, the diagram and the user's
+message are never written (only their sizes), the project ID is replaced by
+a hash, and emails, URLs, IP addresses, long digit runs and key-like tokens
+in the reply are masked character by character (letters become x, digits 0),
+so the reply keeps its length and JSON structure.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import codec
+from .env import Env
+from .logs import log
+
+# Matches never contain quotes or backslashes, so masking can't break JSON strings
+_SENSITIVE = re.compile(
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"  # email addresses
+    r"|\b(?:https?|postgres(?:ql)?|redis|mongodb(?:\+srv)?)://[^\s\"'\\<>|;]+"  # URLs and connection strings (stop at op separators)
+    r"|\b\d{1,3}(?:\.\d{1,3}){3}\b"  # IPv4 addresses
+    r"|\b(?:AIza|sk-|ghp_|xox[bp]-|eyJ)[\w.-]{16,}"  # API keys and JWTs
+    r"|\b\d[\d -]{5,}\d\b"  # phone, card and account numbers
+)
+_MASK = str.maketrans(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+    "x" * 52 + "0" * 10,
+)
+
+_lock = threading.Lock()
+
+
+def scrub(text: str) -> Tuple[str, int]:
+    """(text with sensitive substrings masked, number of masked substrings)."""
+    return _SENSITIVE.subn(lambda match: match.group(0).translate(_MASK), text)
+
+
+def pseudonym(project_id: str) -> str:
+    """Stable stand-in for a project ID: replies of one project stay grouped."""
+    return hashlib.sha256(project_id.encode("utf-8")).hexdigest()[:16]
+
+
+def should_record() -> bool:
+    """Whether this generation is recorded (configured, and picked by the sample rate)."""
+    return bool(Env.CASSETTE_DIR) and random.random() < Env.CASSETTE_SAMPLE_RATE
+
+
+def _finish_reason(response: Any) -> Optional[str]:
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return getattr(reason, "name", None) or str(reason)
+
+
+def record(
+    response: Any,
+    text: str,
+    model: Optional[str],
+    project_id: str,
+    prompt: Dict[str, Any],
+    generation_seconds: float,
+    json_mode: bool = True,
+) -> None:
+    """Append one reply to today's cassette file. Never raises."""
+    try:
+        usage = getattr(response, "usage_metadata", None)
+        scrubbed, masked = scrub(text)
+        cassette = {
+            "id": uuid.uuid4().hex[:12],
+            "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "model": model,
+            "jsonMode": json_mode,
+            "project": pseudonym(project_id),
+            "prompt": prompt,
+            "usage": {
+                "promptTokens": getattr(usage, "prompt_token_count", None),
+                "outputTokens": getattr(usage, "candidates_token_count", None),
+                "totalTokens": getattr(usage, "total_token_count", None),
+            },
+            "finishReason": _finish_reason(response),
+            "generationMs": round(generation_seconds * 1000, 1),
+            "masked": masked,
+            "text": scrubbed,
+        }
+        directory = Path(Env.CASSETTE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        line = codec.dumps(cassette) + b"\n"
+        with _lock:
+            with open(directory / f"replies-{time.strftime('%Y%m%d', time.gmtime())}.jsonl", "ab") as file:
+                file.write(line)
+    except Exception as e:
+        log.warning("cassettes.record_failed", error=str(e))
+
+
+def load(paths: List[Path]) -> Iterator[Dict[str, Any]]:
+    """Cassettes from .jsonl files and directories of them, oldest file first."""
+    files: List[Path] = []
+    for path in paths:
+        files.extend(sorted(path.glob("*.jsonl")) if path.is_dir() else [path])
+    for file in files:
+        with open(file, "rb") as lines:
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield codec.loads(line)
+                except ValueError:
+                    log.warning("cassettes.invalid_line", file=str(file), line=number)
@@ -0,0 +1,54 @@
+"""
+JSON encoding and decoding for the backend.
+
+Uses orjson when it is installed (several times faster than the json module
+on large diagram documents; see benchmarks/json_codec.py) and the standard
+library otherwise. Both paths produce compact UTF-8 JSON and raise ValueError
+subclasses on invalid input, so callers don't care which one is active.
+Values orjson can't encode (integers beyond 64 bits, for example) are
+retried with the standard library.
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def dumps(value: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(value, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(value: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Compact JSON text."""
+    return dumps(value, default).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Parse JSON text or UTF-8 bytes; raises ValueError on invalid input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with this module (the app's default response class)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,183 @@
+"""
+Content-negotiated response compression.
+
+CompressionMiddleware compresses text and JSON responses with the best
+encoding the client accepts (Accept-Encoding, q-values honoured): brotli
+when the brotli package is installed, zstd when zstandard is, and gzip
+always. Responses smaller than COMPRESSION_MIN_BYTES are sent as they are,
+since compressing them costs more than it saves.
+
+Streamed responses (the NDJSON of /api/chat/batch) are compressed chunk by
+chunk and flushed after every chunk, so each line still reaches the client
+as soon as it is produced; nothing is buffered. Server-sent events are
+never compressed, because intermediaries tend to hold compressed event
+streams back.
+"""
+
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .env import Env
+from .etags import with_encoding
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+NEVER_COMPRESSED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self) -> None:
+        # Quality 4: close to gzip's speed with a better ratio; 11 is far too slow per request
+        self._compressor = brotli.Compressor(quality=4)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def available_encodings() -> Dict[str, Callable[[], object]]:
+    """Supported encodings, in order of preference."""
+    encodings: Dict[str, Callable[[], object]] = {}
+    if brotli is not None:
+        encodings["br"] = _Brotli
+    if zstandard is not None:
+        encodings["zstd"] = _Zstd
+    encodings["gzip"] = _Gzip
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The preferred supported encoding the client accepts, or None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    candidates: List[Tuple[float, int, str]] = []
+    for rank, name in enumerate(ENCODINGS):
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > 0:
+            candidates.append((weight, -rank, name))
+    return max(candidates)[2] if candidates else None
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return (
+        content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith(NEVER_COMPRESSED_TYPES)
+        and "content-encoding" not in headers
+    )
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None) -> None:
+        self.app = app
+        self.minimum_size = Env.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start: Message = {}
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start)
+                if not _compressible(headers) or start["status"] < 200 or start["status"] in (204, 304):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                # The representation depends on Accept-Encoding even when sent uncompressed
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = ENCODINGS[encoding]()
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = with_encoding(headers["etag"], encoding)
+                if more_body:
+                    # Streamed: length unknown up front
+                    del headers["Content-Length"]
+                    await send(start)
+                else:
+                    body = compressor.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            if more_body:
+                chunk = compressor.chunk(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
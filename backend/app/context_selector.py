@@ -0,0 +1,216 @@
+"""
+Diagram context selection for the chat prompt.
+
+Large diagrams are too big to paste into every prompt. Instead, the nodes the
+user is talking about are located by matching the message against node IDs,
+names, types and technology attributes, then expanded to their k-hop
+neighborhood. Everything outside that neighborhood is collapsed into a compact
+summary (counts by type, entry points), so the prompt grows with the size of
+the edit rather than the size of the diagram.
+"""
+
+import re
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Node types that usually sit at the edge of an architecture and receive
+# external traffic. Used when summarizing entry points.
+ENTRY_POINT_TYPES = {
+    "web-client",
+    "mobile-app",
+    "admin-panel",
+    "cdn",
+    "dns",
+    "load-balancer",
+    "api-gateway",
+    "waf",
+    "webhook-endpoint",
+}
+
+# Words that carry no information about which node the user means
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "change", "do",
+    "for", "from", "how", "i", "in", "into", "is", "it", "its", "make", "me",
+    "my", "of", "on", "or", "our", "please", "should", "so", "that", "the",
+    "this", "to", "use", "we", "what", "which", "why", "with", "you", "your",
+}
+
+MAX_SEED_NODES = 25
+MAX_ENTRY_POINTS = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str) -> Set[str]:
+    return {t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS}
+
+
+def _mentions(text: str, phrase: str) -> bool:
+    """Whole-word containment, so "cache-1" is not found inside "cache-12"."""
+    if phrase not in text:
+        return False
+    return re.search(r"(?<![\w-])" + re.escape(phrase) + r"(?![\w-])", text) is not None
+
+
+def _node_terms(node: Dict[str, Any]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Return (name tokens, type tokens, technology tokens) for a node."""
+    data = node.get("data") or {}
+    name_tokens = _tokens(str(data.get("name", "")))
+    type_tokens = _tokens(str(node.get("type", "")))
+    tech_tokens: Set[str] = set()
+    attributes = data.get("attributes") or {}
+    if isinstance(attributes, dict):
+        for value in attributes.values():
+            if isinstance(value, (str, int, float)):
+                tech_tokens |= _tokens(str(value))
+    return name_tokens, type_tokens, tech_tokens
+
+
+def match_nodes(nodes: List[Dict[str, Any]], message: str) -> List[str]:
+    """
+    Rank nodes by how strongly the message refers to them.
+
+    A node whose ID or full name appears in the message is a direct reference,
+    and direct references win outright. Otherwise the nodes matching the most
+    distinct message words are kept, ordered by a weighted score where name and
+    technology words count more than the node type (so "the payments database"
+    prefers the database named "Payments DB" over every other database).
+    """
+    lowered = message.lower()
+    message_tokens = _tokens(message)
+    direct: List[Tuple[int, int, str]] = []
+    fuzzy: List[Tuple[int, int, int, str]] = []
+
+    for index, node in enumerate(nodes):
+        node_id = str(node.get("id", ""))
+        if not node_id:
+            continue
+        name = str((node.get("data") or {}).get("name", "")).strip().lower()
+        name_tokens, type_tokens, tech_tokens = _node_terms(node)
+        matched = message_tokens & (name_tokens | type_tokens | tech_tokens)
+        weight = (
+            3 * len(matched & name_tokens)
+            + 2 * len(matched & (tech_tokens - name_tokens))
+            + len(matched & (type_tokens - name_tokens - tech_tokens))
+        )
+
+        if _mentions(lowered, node_id.lower()) or (len(name) > 2 and _mentions(lowered, name)):
+            direct.append((weight, index, node_id))
+        elif matched:
+            fuzzy.append((len(matched), weight, index, node_id))
+
+    if direct:
+        direct.sort(key=lambda item: (-item[0], item[1]))
+        return [node_id for _, _, node_id in direct][:MAX_SEED_NODES]
+    if not fuzzy:
+        return []
+
+    # Keep only the nodes matching the most message words so a generic word
+    # like "database" doesn't pull in every database of a huge diagram
+    best = max(item[0] for item in fuzzy)
+    strongest = sorted((item for item in fuzzy if item[0] == best), key=lambda item: (-item[1], item[2]))
+    return [node_id for _, _, _, node_id in strongest][:MAX_SEED_NODES]
+
+
+def _adjacency(edges: Iterable[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    adjacency: Dict[str, Set[str]] = {}
+    for edge in edges:
+        source, target = edge.get("source"), edge.get("target")
+        if not source or not target:
+            continue
+        adjacency.setdefault(source, set()).add(target)
+        adjacency.setdefault(target, set()).add(source)
+    return adjacency
+
+
+def k_hop_neighborhood(seeds: List[str], edges: List[Dict[str, Any]], hops: int, max_nodes: int) -> List[str]:
+    """Breadth-first expansion of the seed nodes, closest nodes first."""
+    adjacency = _adjacency(edges)
+    selected: List[str] = []
+    seen: Set[str] = set()
+    queue = deque()
+    for seed in seeds:
+        if seed not in seen:
+            seen.add(seed)
+            queue.append((seed, 0))
+
+    while queue and len(selected) < max_nodes:
+        node_id, depth = queue.popleft()
+        selected.append(node_id)
+        if depth >= hops:
+            continue
+        for neighbor in sorted(adjacency.get(node_id, ())):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append((neighbor, depth + 1))
+    return selected
+
+
+def entry_points(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> List[str]:
+    """Nodes that receive external traffic: entry-point types, or sources nothing points at."""
+    incoming = {edge.get("target") for edge in edges}
+    outgoing = {edge.get("source") for edge in edges}
+    result = []
+    for node in nodes:
+        node_id = node.get("id")
+        if not node_id:
+            continue
+        if node.get("type") in ENTRY_POINT_TYPES or (node_id in outgoing and node_id not in incoming):
+            result.append(node_id)
+    return result
+
+
+def summarize_diagram(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], shown: Set[str]) -> Dict[str, Any]:
+    """Compact description of the whole diagram for nodes that are not shown in full."""
+    counts = Counter(str(node.get("type", "unknown")) for node in nodes)
+    omitted = Counter(str(node.get("type", "unknown")) for node in nodes if node.get("id") not in shown)
+    entries = entry_points(nodes, edges)
+    return {
+        "totalNodes": len(nodes),
+        "totalEdges": len(edges),
+        "shownNodes": len(shown),
+        "nodeCountsByType": dict(counts.most_common()),
+        "omittedNodeCountsByType": dict(omitted.most_common()),
+        "entryPoints": entries[:MAX_ENTRY_POINTS],
+        "entryPointCount": len(entries),
+    }
+
+
+def select_diagram_context(
+    diagram_json: Any,
+    message: str,
+    hops: int = 2,
+    node_threshold: int = 150,
+    max_nodes: int = 120,
+) -> Tuple[Any, bool]:
+    """
+    Pick the part of the diagram to put into the prompt.
+
+    Returns (context, is_partial). Diagrams with at most node_threshold nodes
+    are returned unchanged. Larger ones are reduced to the k-hop neighborhood
+    of the nodes matched by the message (or the entry points when nothing
+    matches), the edges between those nodes, and a "summary" of the rest.
+    """
+    if not isinstance(diagram_json, dict):
+        return diagram_json, False
+    nodes = [n for n in diagram_json.get("nodes") or [] if isinstance(n, dict)]
+    edges = [e for e in diagram_json.get("edges") or [] if isinstance(e, dict)]
+    if len(nodes) <= node_threshold:
+        return diagram_json, False
+
+    seeds = match_nodes(nodes, message)
+    if seeds:
+        selected_ids = k_hop_neighborhood(seeds, edges, hops, max_nodes)
+    else:
+        selected_ids = entry_points(nodes, edges)[:MAX_ENTRY_POINTS]
+    shown = set(selected_ids)
+
+    context = {key: value for key, value in diagram_json.items() if key not in ("nodes", "edges")}
+    context["nodes"] = [node for node in nodes if node.get("id") in shown]
+    context["edges"] = [
+        edge for edge in edges if edge.get("source") in shown and edge.get("target") in shown
+    ]
+    context["summary"] = summarize_diagram(nodes, edges, shown)
+    context["summary"]["matchedNodeIds"] = seeds
+    context["summary"]["hops"] = hops
+    return context, True
@@ -0,0 +1,118 @@
+"""
+Request deadlines for the chat pipeline.
+
+A chat request gets CHAT_DEADLINE_SECONDS in total, and each stage that
+waits on the database or Gemini gets a budget of its own
+(CHAT_STAGE_TIMEOUTS); a stage may use its budget or whatever is left of
+the request's deadline, whichever is less.
+
+The pipeline runs in a worker thread and calls enter(stage) before each
+stage and leave() after it, which raise once the request was cancelled or
+the stage ran out of time; long calls (the streamed Gemini reply) call
+check() as they go. The event loop side (chat.execute_chat) watches the
+clock and the client's connection: when a stage overruns or the client
+goes away it answers (504 naming the stage) or gives up (client
+disconnected) without waiting for the thread, and cancel() makes the
+thread stop at its next checkpoint. Calls that block also get the stage's
+remaining time as their own timeout, so the thread itself is released soon
+after.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .env import Env
+
+
+class DeadlineExceeded(Exception):
+    """A stage ran out of time (its own budget or the request's deadline)."""
+
+    def __init__(self, stage: Optional[str]):
+        super().__init__(f"deadline exceeded during {stage}" if stage else "request deadline exceeded")
+        self.stage = stage
+
+
+class RequestCancelled(Exception):
+    """The request was abandoned, e.g. because the client disconnected."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """Parse "stage=seconds,stage=seconds" (e.g. "generate=45,load_project=5")."""
+    budgets = {}
+    for pair in spec.split(","):
+        if "=" not in pair:
+            continue
+        stage, seconds = pair.split("=", 1)
+        try:
+            budgets[stage.strip()] = max(0.0, float(seconds))
+        except ValueError:
+            continue
+    return budgets
+
+
+STAGE_BUDGETS = parse_budgets(Env.CHAT_STAGE_TIMEOUTS)
+
+
+class Deadline:
+    """Time left for one request and for the stage it is in; shared by the event loop and the worker thread."""
+
+    def __init__(self, total_seconds: Optional[float] = None, budgets: Optional[Dict[str, float]] = None):
+        self.started = time.monotonic()
+        self.expires_at = self.started + (Env.CHAT_DEADLINE_SECONDS if total_seconds is None else total_seconds)
+        self.budgets = STAGE_BUDGETS if budgets is None else budgets
+        # (stage, when it runs out); replaced as a whole so the event loop never sees a mix
+        self._stage: Tuple[Optional[str], float] = (None, self.expires_at)
+        self._cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    @property
+    def stage(self) -> Optional[str]:
+        """The I/O stage in progress, None between stages."""
+        return self._stage[0]
+
+    def remaining(self) -> float:
+        """Seconds until the current stage (or the request) runs out."""
+        return min(self._stage[1], self.expires_at) - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def enter(self, stage: str) -> float:
+        """Start an I/O stage; returns the seconds it may take. Raises if there's no time left or the request was cancelled."""
+        self.check()
+        budget = self.budgets.get(stage)
+        self._stage = (stage, time.monotonic() + budget if budget is not None else self.expires_at)
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(stage)
+        return remaining
+
+    def leave(self) -> None:
+        """
+        End the I/O stage; raises if it overran, even if its call returned.
+        The work until the next stage only counts against the request's deadline.
+        """
+        self.check()
+        self._stage = (None, self.expires_at)
+
+    def check(self) -> None:
+        """Raise if the request was cancelled or the current stage ran out of time."""
+        if self._cancelled.is_set():
+            raise RequestCancelled(self.reason or "cancelled")
+        if self.expired():
+            raise DeadlineExceeded(self.stage)
+
+    def cancel(self, reason: str) -> None:
+        """Tell the worker thread to stop at its next checkpoint."""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
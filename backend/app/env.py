@@ -5,21 +5,97 @@ load_dotenv()
 
 class Env:
     PORT: int = int(os.getenv("PORT", "4000"))
+    # Persistence: "supabase", or "sqlite" (a local file, for self-hosted and offline use)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "archie.db")
+    # Most queued writes the SQLite writer commits in one transaction
+    SQLITE_WRITE_BATCH: int = int(os.getenv("SQLITE_WRITE_BATCH", "64"))
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
     GEMINI_API_KEY: str = os.getenv("GOOGLE_GEMINI_API_KEY", "")
+    # Alternative Gemini API endpoint, e.g. fakes/fake_gemini.py for load tests (REST transport)
+    GEMINI_API_ENDPOINT: str = os.getenv("GEMINI_API_ENDPOINT", "")
+    # Diagrams with more nodes than this only send the relevant subgraph to Gemini
+    CHAT_CONTEXT_NODE_THRESHOLD: int = int(os.getenv("CHAT_CONTEXT_NODE_THRESHOLD", "150"))
+    CHAT_CONTEXT_HOPS: int = int(os.getenv("CHAT_CONTEXT_HOPS", "2"))
+    CHAT_CONTEXT_MAX_NODES: int = int(os.getenv("CHAT_CONTEXT_MAX_NODES", "120"))
+    # Simple commands are parsed locally; below this confidence they go to Gemini
+    FAST_PATH_ENABLED: bool = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    FAST_PATH_MIN_CONFIDENCE: float = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+    # How long the chosen Gemini model is reused before the model list is fetched again
+    MODEL_CACHE_TTL_SECONDS: float = float(os.getenv("MODEL_CACHE_TTL_SECONDS", "600"))
+    # Structured logging: level, per-event sample rates ("event=0.1,event=0.01"), field size cap
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "")
+    LOG_MAX_FIELD_CHARS: int = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+    # Request traces: "none", "jsonl" (local file) or "otlp" (collector over OTLP/HTTP)
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")
+    TRACING_JSONL_PATH: str = os.getenv("TRACING_JSONL_PATH", "traces.jsonl")
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+    # Fraction of requests traced when the caller didn't decide (no traceparent)
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+    # Opt-in request profiling: disabled unless a token is set; only from allowlisted addresses
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+    PROFILING_ALLOWLIST: str = os.getenv("PROFILING_ALLOWLIST", "127.0.0.1,::1")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_COUNT: int = int(os.getenv("PROFILE_MAX_COUNT", "50"))
+    # Anonymized recordings of Gemini replies for benchmarks/replay_cassettes.py (empty: off)
+    CASSETTE_DIR: str = os.getenv("CASSETTE_DIR", "")
+    CASSETTE_SAMPLE_RATE: float = float(os.getenv("CASSETTE_SAMPLE_RATE", "1.0"))
+    # Background dependency probes served by /api/health?deep=1
+    HEALTH_PROBE_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "30"))
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+    # Cache backend for the chat path: "memory", "shm" (shared by workers on one host) or "redis"
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_SHM_PATH: str = os.getenv("CACHE_SHM_PATH", "")
+    CACHE_SHM_SLOTS: int = int(os.getenv("CACHE_SHM_SLOTS", "1024"))
+    CACHE_SHM_SLOT_BYTES: int = int(os.getenv("CACHE_SHM_SLOT_BYTES", "65536"))
+    # Chat history is cached per project and invalidated when messages are saved
+    HISTORY_CACHE_TTL_SECONDS: float = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "300"))
+    # Chat history in the prompt: at most this many raw messages, older ones are
+    # folded into a per-project rolling summary in the background
+    CHAT_HISTORY_MESSAGES: int = int(os.getenv("CHAT_HISTORY_MESSAGES", "20"))
+    CHAT_SUMMARY_ENABLED: bool = os.getenv("CHAT_SUMMARY_ENABLED", "true").lower() == "true"
+    CHAT_SUMMARY_TRIGGER_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_TRIGGER_MESSAGES", "16"))
+    CHAT_SUMMARY_KEEP_RECENT: int = int(os.getenv("CHAT_SUMMARY_KEEP_RECENT", "6"))
+    CHAT_SUMMARY_MAX_CHARS: int = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "2000"))
+    # "model" (a Gemini call, CHAT_SUMMARY_MODEL or the chat model) or "extractive" (no API call)
+    CHAT_SUMMARY_METHOD: str = os.getenv("CHAT_SUMMARY_METHOD", "model").lower()
+    CHAT_SUMMARY_MODEL: str = os.getenv("CHAT_SUMMARY_MODEL", "")
+    # The summary worker is a single thread: a hung call would hold up every later summary
+    CHAT_SUMMARY_TIMEOUT_SECONDS: float = float(os.getenv("CHAT_SUMMARY_TIMEOUT_SECONDS", "30"))
+    # Responses smaller than this are sent uncompressed
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    # Threads running the blocking parts of chat requests (database and Gemini
+    # calls); asyncio's default of cpus + 4 caps concurrent chats on small hosts
+    CHAT_WORKER_THREADS: int = int(os.getenv("CHAT_WORKER_THREADS", "64"))
+    # Time a chat request may take in total, and the most each stage that waits
+    # on the database or Gemini may use of it ("stage=seconds,...")
+    CHAT_DEADLINE_SECONDS: float = float(os.getenv("CHAT_DEADLINE_SECONDS", "60"))
+    CHAT_STAGE_TIMEOUTS: str = os.getenv(
+        "CHAT_STAGE_TIMEOUTS",
+        "load_project=5,load_history=5,resolve_model=10,generate=45,save_messages=5",
+    )
+    # How often a running chat request checks its deadline and whether the client is still connected
+    CHAT_WATCH_INTERVAL_SECONDS: float = float(os.getenv("CHAT_WATCH_INTERVAL_SECONDS", "0.25"))
+    # Transport timeout of each Supabase (PostgREST) request; the SDK's default is 120s
+    SUPABASE_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+    # /api/chat/batch: items per request and how many are answered at once
+    CHAT_BATCH_MAX_ITEMS: int = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "100"))
+    CHAT_BATCH_MAX_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "4"))
 
     @classmethod
     def validate(cls) -> None:
         missing = []
-        if not cls.SUPABASE_URL:
-            missing.append("SUPABASE_URL")
-        if not cls.SUPABASE_SERVICE_ROLE_KEY:
-            missing.append("SUPABASE_SERVICE_ROLE_KEY")
+        # A SQLite deployment doesn't talk to Supabase at all
+        if cls.STORAGE_BACKEND != "sqlite":
+            if not cls.SUPABASE_URL:
+                missing.append("SUPABASE_URL")
+            if not cls.SUPABASE_SERVICE_ROLE_KEY:
+                missing.append("SUPABASE_SERVICE_ROLE_KEY")
         if not cls.GEMINI_API_KEY:
             missing.append("GOOGLE_GEMINI_API_KEY")
         if missing:
             raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
 
-Env.validate()
-
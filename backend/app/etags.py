@@ -0,0 +1,110 @@
+"""
+Strong ETags and conditional GETs.
+
+ConditionalGetMiddleware gives every non-streamed 200 response to a GET
+request a strong ETag (a hash of the body, unless the route set its
+own) and answers a matching If-None-Match with an empty 304, so clients
+revalidating an unchanged diagram, history page or catalog don't download
+it again. Streamed responses pass through untouched.
+
+A strong ETag names one exact byte sequence, so CompressionMiddleware
+tags compressed representations with the encoding (`"<hash>-gzip"`);
+etag_matches() accepts either form.
+"""
+
+import hashlib
+from typing import Iterable, List
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Headers a 304 repeats from the 200 it stands for (RFC 9110 15.4.5)
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary")
+# CORSMiddleware runs inside this one: without its headers the browser
+# rejects a cross-origin 304 instead of using its cached copy
+NOT_MODIFIED_PREFIXES = ("access-control-",)
+ENCODING_SUFFIXES = ("-gzip", "-br", "-zstd")
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def with_encoding(etag: str, encoding: str) -> str:
+    """ETag of the compressed representation of a strong ETag (weak ETags stay as they are)."""
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def _opaque(etag: str) -> str:
+    tag = etag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, any encoding)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+
+def _keep(raw_headers: Iterable, names: tuple, prefixes: tuple = ()) -> List:
+    kept = []
+    for name, value in raw_headers:
+        lowered = name.decode("latin-1").lower()
+        if lowered in names or lowered.startswith(prefixes):
+            kept.append((name, value))
+    return kept
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match", "")
+        start: Message = {}
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            # First body message: only single-message (non-streamed) 200s get an ETag
+            if start["status"] != 200 or message.get("more_body", False):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            headers = MutableHeaders(scope=start)
+            etag = headers.get("etag")
+            if etag is None:
+                etag = strong_etag(message.get("body", b""))
+                headers["ETag"] = etag
+            if etag_matches(if_none_match, etag):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": _keep(start["headers"], NOT_MODIFIED_HEADERS, NOT_MODIFIED_PREFIXES),
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,369 @@
+"""
+Deterministic fast path for simple chat commands.
+
+Many chat messages are one-line edits such as "delete database-1",
+"rename cache-1 to Redis", "connect web-server-1 to database-1" or
+"add a queue". These are parsed locally against the current diagram and the
+node catalog and answered without calling Gemini. Every node reference is
+resolved with a confidence score; when any part of the command is ambiguous
+the parser returns None and the request falls through to the LLM.
+"""
+
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import FAST_PATH
+from .node_catalog import AVAILABLE_NODE_TYPES
+
+# Confidence of each way a node reference can be resolved
+CONFIDENCE_ID = 1.0
+CONFIDENCE_NAME = 0.95
+CONFIDENCE_NORMALIZED = 0.9
+CONFIDENCE_UNIQUE_TYPE = 0.85
+CONFIDENCE_CUSTOM_TECHNOLOGY = 0.85
+
+# Extra words users commonly use for catalog node types
+TYPE_ALIASES = {
+    "db": "database",
+    "sql database": "database",
+    "server": "web-server",
+    "api server": "web-server",
+    "backend": "web-server",
+    "lb": "load-balancer",
+    "gateway": "api-gateway",
+    "broker": "message-broker",
+    "message queue": "queue",
+    "bucket": "storage",
+    "object storage": "storage",
+    "lambda": "serverless-function",
+    "function": "serverless-function",
+    "cron": "scheduler",
+    "cron job": "scheduler",
+    "firewall": "waf",
+    "frontend": "web-client",
+    "website": "web-client",
+    "mobile client": "mobile-app",
+    "search": "search-engine",
+    "warehouse": "data-warehouse",
+    "webhook": "webhook-endpoint",
+}
+
+_POLITE = r"(?:please\s+|can you\s+|could you\s+)?"
+_END = r"\s*(?:please)?\s*[.!]*\s*$"
+
+DELETE_RE = re.compile(rf"^{_POLITE}(?:delete|remove|drop)\s+(?P<ref>.+?){_END}", re.IGNORECASE)
+RENAME_RE = re.compile(rf"^{_POLITE}rename\s+(?P<rest>.+?){_END}", re.IGNORECASE)
+CONNECT_RE = re.compile(rf"^{_POLITE}(?:connect|link|wire)\s+(?P<rest>.+?){_END}", re.IGNORECASE)
+DISCONNECT_RE = re.compile(rf"^{_POLITE}(?:disconnect|unlink)\s+(?P<rest>.+?){_END}", re.IGNORECASE)
+ADD_RE = re.compile(
+    rf"^{_POLITE}(?:add|create|insert)\s+(?:a|an|one|another)\s+(?:new\s+)?(?P<kind>.+?){_END}",
+    re.IGNORECASE,
+)
+
+# A technology the catalog doesn't know is only accepted when it looks like a
+# product name ("Memcached", "MySQL 8"), not like a phrase ("read replica")
+CUSTOM_TECHNOLOGY_RE = re.compile(r"^(?=.*[A-Z0-9])[\w.+#-]+(?: [\w.+#-]+)?$")
+
+
+@dataclass
+class FastPathResult:
+    intent: str
+    message: str
+    operations: List[Dict[str, Any]]
+    confidence: float
+
+
+class FastPathStats:
+    """Hit/miss counters for the fast path, reported by /api/chat/stats."""
+
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.hits: Counter = Counter()
+        self.low_confidence = 0
+        # Chat requests record from worker threads
+        self._lock = threading.Lock()
+
+    def record(self, result: Optional[FastPathResult], low_confidence: bool = False) -> None:
+        with self._lock:
+            self.attempts += 1
+            if result is not None:
+                self.hits[result.intent] += 1
+            elif low_confidence:
+                self.low_confidence += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts, hits, low_confidence = self.attempts, dict(self.hits), self.low_confidence
+        total_hits = sum(hits.values())
+        return {
+            "attempts": attempts,
+            "hits": total_hits,
+            "misses": attempts - total_hits,
+            "lowConfidence": low_confidence,
+            "hitRate": round(total_hits / attempts, 4) if attempts else 0.0,
+            "hitsByIntent": hits,
+        }
+
+
+stats = FastPathStats()
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def _clean_ref(ref: str) -> str:
+    ref = ref.strip().strip("\"'`").strip()
+    ref = re.sub(r"^the\s+", "", ref, flags=re.IGNORECASE)
+    ref = re.sub(r"\s+node$", "", ref, flags=re.IGNORECASE)
+    return ref.strip().strip("\"'`").strip()
+
+
+def _node_name(node: Dict[str, Any]) -> str:
+    return str((node.get("data") or {}).get("name") or node.get("id"))
+
+
+def resolve_catalog_type(phrase: str) -> Optional[Dict[str, Any]]:
+    """Find the catalog entry for a node type named by id, label or alias."""
+    key = _clean_ref(phrase).lower()
+    key = TYPE_ALIASES.get(key, key)
+    normalized = _normalize(key)
+    for entry in AVAILABLE_NODE_TYPES:
+        if normalized in (_normalize(entry["id"]), _normalize(entry["label"])):
+            return entry
+    return None
+
+
+def resolve_node(ref: str, nodes: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], float]:
+    """
+    Resolve a user reference to exactly one node of the diagram.
+
+    Tries, in order of confidence: the node ID, the exact node name, ID or
+    name ignoring case and punctuation, and finally a node type when the
+    diagram has only one node of that type ("the cache").
+    """
+    ref = _clean_ref(ref)
+    if not ref:
+        return None, 0.0
+    lowered = ref.lower()
+
+    for node in nodes:
+        if str(node.get("id", "")).lower() == lowered:
+            return node, CONFIDENCE_ID
+
+    by_name = [node for node in nodes if _node_name(node).strip().lower() == lowered]
+    if len(by_name) == 1:
+        return by_name[0], CONFIDENCE_NAME
+    if by_name:
+        return None, 0.0
+
+    normalized = _normalize(ref)
+    by_normalized = [
+        node for node in nodes
+        if normalized and normalized in (_normalize(str(node.get("id", ""))), _normalize(_node_name(node)))
+    ]
+    if len(by_normalized) == 1:
+        return by_normalized[0], CONFIDENCE_NORMALIZED
+    if by_normalized:
+        return None, 0.0
+
+    entry = resolve_catalog_type(ref)
+    if entry:
+        of_type = [node for node in nodes if node.get("type") == entry["id"]]
+        if len(of_type) == 1:
+            return of_type[0], CONFIDENCE_UNIQUE_TYPE
+    return None, 0.0
+
+
+def _resolve_pair(
+    rest: str, separators: Tuple[str, ...], nodes: List[Dict[str, Any]]
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], float]:
+    """Split "A to B" at every separator position and keep the most confident split."""
+    best: Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], float] = (None, None, 0.0)
+    pattern = re.compile(r"\s+(?:" + "|".join(separators) + r")\s+", re.IGNORECASE)
+    for match in pattern.finditer(rest):
+        left, left_conf = resolve_node(rest[:match.start()], nodes)
+        right, right_conf = resolve_node(rest[match.end():], nodes)
+        confidence = min(left_conf, right_conf)
+        if left and right and confidence > best[2]:
+            best = (left, right, confidence)
+    return best
+
+
+def _find_edge(edges: List[Dict[str, Any]], a: str, b: str) -> Optional[Dict[str, Any]]:
+    for edge in edges:
+        if {edge.get("source"), edge.get("target")} == {a, b}:
+            return edge
+    return None
+
+
+def _next_node_id(type_id: str, nodes: List[Dict[str, Any]]) -> str:
+    existing = {str(node.get("id")) for node in nodes}
+    index = 1
+    while f"{type_id}-{index}" in existing:
+        index += 1
+    return f"{type_id}-{index}"
+
+
+def _parse_delete(message: str, nodes, edges) -> Optional[FastPathResult]:
+    match = DELETE_RE.match(message)
+    if not match:
+        return None
+    node, confidence = resolve_node(match.group("ref"), nodes)
+    if not node:
+        return None
+    name = _node_name(node)
+    return FastPathResult(
+        intent="delete_node",
+        message=f"I've removed {name} ({node['id']}) from your diagram, along with its connections.",
+        operations=[{"op": "delete_node", "payload": {"id": node["id"]}}],
+        confidence=confidence,
+    )
+
+
+def _parse_rename(message: str, nodes, edges) -> Optional[FastPathResult]:
+    match = RENAME_RE.match(message)
+    if not match:
+        return None
+    rest = match.group("rest")
+    for separator in re.finditer(r"\s+(?:to|as)\s+", rest, re.IGNORECASE):
+        node, confidence = resolve_node(rest[:separator.start()], nodes)
+        new_name = rest[separator.end():].strip().strip("\"'`").strip()
+        if node and new_name:
+            old_name = _node_name(node)
+            return FastPathResult(
+                intent="rename_node",
+                message=f"I've renamed {old_name} ({node['id']}) to {new_name}.",
+                operations=[{"op": "update_node", "payload": {"id": node["id"], "data": {"name": new_name}}}],
+                confidence=confidence,
+            )
+    return None
+
+
+def _parse_connect(message: str, nodes, edges) -> Optional[FastPathResult]:
+    match = CONNECT_RE.match(message)
+    if not match:
+        return None
+    source, target, confidence = _resolve_pair(match.group("rest"), ("to", "with", "and"), nodes)
+    if not source or not target or source["id"] == target["id"]:
+        return None
+    if _find_edge(edges, source["id"], target["id"]):
+        return FastPathResult(
+            intent="connect_nodes",
+            message=f"{_node_name(source)} and {_node_name(target)} are already connected, so there's nothing to change.",
+            operations=[],
+            confidence=confidence,
+        )
+    return FastPathResult(
+        intent="connect_nodes",
+        message=f"I've connected {_node_name(source)} to {_node_name(target)}.",
+        operations=[{"op": "add_edge", "payload": {"source": source["id"], "target": target["id"]}}],
+        confidence=confidence,
+    )
+
+
+def _parse_disconnect(message: str, nodes, edges) -> Optional[FastPathResult]:
+    match = DISCONNECT_RE.match(message)
+    if not match:
+        return None
+    a, b, confidence = _resolve_pair(match.group("rest"), ("from", "and"), nodes)
+    if not a or not b:
+        return None
+    edge = _find_edge(edges, a["id"], b["id"])
+    if not edge or not edge.get("id"):
+        return None
+    return FastPathResult(
+        intent="disconnect_nodes",
+        message=f"I've removed the connection between {_node_name(a)} and {_node_name(b)}.",
+        operations=[{"op": "delete_edge", "payload": {"id": edge["id"]}}],
+        confidence=confidence,
+    )
+
+
+def _parse_add(message: str, nodes, edges) -> Optional[FastPathResult]:
+    match = ADD_RE.match(message)
+    if not match:
+        return None
+    kind = _clean_ref(match.group("kind"))
+
+    # "add a queue" / "add a load balancer"
+    entry = resolve_catalog_type(kind)
+    technology = None
+    confidence = CONFIDENCE_ID
+    if entry:
+        technology = entry["technologies"]["lightweight"][0]
+    else:
+        # "add a Memcached cache" / "add a PostgreSQL database"
+        words = kind.split()
+        for split in range(1, len(words)):
+            entry = resolve_catalog_type(" ".join(words[split:]))
+            if entry:
+                requested = " ".join(words[:split])
+                known = [
+                    tech for tech in entry["technologies"]["lightweight"] + entry["technologies"]["heavy"]
+                    if tech.lower().startswith(requested.lower())
+                ]
+                if known:
+                    technology, confidence = known[0], CONFIDENCE_NAME
+                elif CUSTOM_TECHNOLOGY_RE.match(requested):
+                    technology, confidence = requested, CONFIDENCE_CUSTOM_TECHNOLOGY
+                break
+    if not entry or not technology:
+        return None
+
+    node_id = _next_node_id(entry["id"], nodes)
+    description = entry["description"]
+    article = "an" if entry["label"][0].lower() in "aeiou" else "a"
+    return FastPathResult(
+        intent="add_node",
+        message=(
+            f"I've added {article} {entry['label']} ({technology}) to your diagram as {node_id}. "
+            f"Let me know what it should connect to, or ask me to switch it to a different technology."
+        ),
+        operations=[{
+            "op": "add_node",
+            "payload": {
+                "id": node_id,
+                "type": entry["id"],
+                "data": {
+                    "name": technology,
+                    "description": description,
+                    "attributes": {"technology": technology},
+                },
+            },
+        }],
+        confidence=confidence,
+    )
+
+
+PARSERS = (_parse_delete, _parse_rename, _parse_connect, _parse_disconnect, _parse_add)
+
+
+def parse_command(message: str, diagram_json: Any) -> Optional[FastPathResult]:
+    """Parse a message into diagram operations, or None if it isn't a simple command."""
+    message = " ".join(message.split())
+    if not message or len(message) > 200:
+        return None
+    diagram = diagram_json if isinstance(diagram_json, dict) else {}
+    nodes = [n for n in diagram.get("nodes") or [] if isinstance(n, dict) and n.get("id")]
+    edges = [e for e in diagram.get("edges") or [] if isinstance(e, dict)]
+    for parser in PARSERS:
+        result = parser(message, nodes, edges)
+        if result is not None:
+            return result
+    return None
+
+
+def try_fast_path(message: str, diagram_json: Any, min_confidence: float) -> Optional[FastPathResult]:
+    """Return a fast-path answer when the command is parsed confidently, recording hit-rate stats."""
+    result = parse_command(message, diagram_json)
+    if result is not None and result.confidence < min_confidence:
+        stats.record(None, low_confidence=True)
+        FAST_PATH.inc(result="low_confidence")
+        return None
+    stats.record(result)
+    FAST_PATH.inc(result="miss" if result is None else "hit")
+    return result
@@ -0,0 +1,60 @@
+"""
+Lazily imported and configured Gemini SDK.
+
+google.generativeai pulls in protobuf, grpc and the Google API client and
+dominates the backend's import time, so it is imported on first use (or by
+the warm-up at startup) instead of when the app module is loaded.
+"""
+
+import sys
+import threading
+from typing import Any, Optional
+
+from .env import Env
+from .logs import log
+
+_genai: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def _patch_importlib_metadata() -> None:
+    # Patch importlib.metadata for Python 3.9 compatibility
+    # This ensures packages_distributions is available via the backport
+    try:
+        import importlib_metadata
+    except ImportError:
+        return  # importlib-metadata not installed, use built-in
+    # For Python 3.9, importlib.metadata may not exist or may not have packages_distributions
+    # Replace it with the backport which has full functionality
+    if 'importlib.metadata' not in sys.modules:
+        sys.modules['importlib.metadata'] = importlib_metadata
+    elif not hasattr(sys.modules['importlib.metadata'], 'packages_distributions'):
+        sys.modules['importlib.metadata'] = importlib_metadata
+
+
+def get_genai() -> Any:
+    """The google.generativeai module, configured with the API key on first use."""
+    global _genai
+    if _genai is not None:
+        return _genai
+    with _lock:
+        if _genai is None:
+            _patch_importlib_metadata()
+            import google.generativeai as genai
+            # Configure Gemini API - handle errors gracefully
+            try:
+                if Env.GEMINI_API_KEY and Env.GEMINI_API_ENDPOINT:
+                    # Only the REST transport can talk to a plain-HTTP stand-in
+                    genai.configure(
+                        api_key=Env.GEMINI_API_KEY,
+                        transport="rest",
+                        client_options={"api_endpoint": Env.GEMINI_API_ENDPOINT},
+                    )
+                elif Env.GEMINI_API_KEY:
+                    genai.configure(api_key=Env.GEMINI_API_KEY)
+                else:
+                    log.warning("gemini.not_configured", hint="GOOGLE_GEMINI_API_KEY not set in backend/.env")
+            except Exception as e:
+                log.warning("gemini.configure_failed", error=str(e))
+            _genai = genai
+    return _genai
@@ -0,0 +1,107 @@
+"""
+Background dependency health checks.
+
+The database (Supabase or SQLite) and the Gemini API are probed every
+HEALTH_PROBE_INTERVAL_SECONDS by one background task, and the results
+(latency, last error, consecutive failures) are cached. /api/health?deep=1
+only reads the cache, so probe traffic stays the same however often the
+load balancer polls.
+
+Exhausted Gemini quota can't be probed without spending quota, so the model
+check also fails while chat requests have recently been rate limited (see
+note_rate_limited).
+"""
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .env import Env
+from .logs import log
+
+# How long a 429 from Gemini marks the model provider unhealthy
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class CheckResult:
+    ok: Optional[bool] = None           # None until the first probe has finished
+    latencyMs: Optional[float] = None
+    checkedAt: Optional[float] = None
+    lastSuccessAt: Optional[float] = None
+    lastError: Optional[str] = None
+    lastErrorAt: Optional[float] = None
+    consecutiveFailures: int = 0
+
+
+def _probe_database() -> None:
+    from .repository import get_repository
+    repository = get_repository()
+    if repository is None:
+        raise RuntimeError("Supabase is not configured")
+    repository.ping()
+
+
+def _probe_model() -> None:
+    # Model metadata lookup: authenticates the key and reaches the API without using generation quota
+    from .gemini_client import get_genai
+    from .model_resolver import resolve_model
+    get_genai().get_model(f"models/{resolve_model()}")
+
+
+class HealthMonitor:
+    def __init__(self, probes: Dict[str, Callable[[], None]]):
+        self.probes = probes
+        self.results: Dict[str, CheckResult] = {name: CheckResult() for name in probes}
+        self.last_rate_limited: Optional[float] = None
+
+    def note_rate_limited(self) -> None:
+        """Called when a chat request hit Gemini's rate limit or quota."""
+        self.last_rate_limited = time.time()
+
+    async def _probe(self, name: str, probe: Callable[[], None]) -> None:
+        result = self.results[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(probe), timeout=Env.HEALTH_PROBE_TIMEOUT_SECONDS)
+            result.ok = True
+            result.lastSuccessAt = time.time()
+            result.consecutiveFailures = 0
+        except Exception as e:
+            error = f"timed out after {Env.HEALTH_PROBE_TIMEOUT_SECONDS}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            if result.ok is not False:
+                log.warning("health.check_failed", check=name, error=error)
+            result.ok = False
+            result.lastError = error[:300]
+            result.lastErrorAt = time.time()
+            result.consecutiveFailures += 1
+        result.latencyMs = round((time.perf_counter() - started) * 1000, 1)
+        result.checkedAt = time.time()
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+
+    async def run(self) -> None:
+        """Probe forever on the configured interval (cancelled at shutdown)."""
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(Env.HEALTH_PROBE_INTERVAL_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        # Results older than this mean the probe loop itself is stuck
+        stale_after = 3 * Env.HEALTH_PROBE_INTERVAL_SECONDS + Env.HEALTH_PROBE_TIMEOUT_SECONDS
+        checks: Dict[str, Any] = {}
+        for name, result in self.results.items():
+            check = asdict(result)
+            check["stale"] = result.checkedAt is not None and now - result.checkedAt > stale_after
+            checks[name] = check
+        rate_limited = self.last_rate_limited is not None and now - self.last_rate_limited < RATE_LIMIT_WINDOW_SECONDS
+        if "model" in checks:
+            checks["model"]["rateLimited"] = rate_limited
+        ok = all(check["ok"] is True and not check["stale"] for check in checks.values()) and not rate_limited
+        return {"ok": ok, "checks": checks}
+
+
+monitor = HealthMonitor({"database": _probe_database, "model": _probe_model})
@@ -0,0 +1,201 @@
+"""
+Rolling per-project summary of the chat history.
+
+The chat prompt carries at most CHAT_HISTORY_MESSAGES raw messages: the
+newest ones not yet covered by the project's summary. Once
+CHAT_SUMMARY_TRIGGER_MESSAGES of them have piled up, a background worker
+folds all but the newest CHAT_SUMMARY_KEEP_RECENT into the summary (stored
+in the chat_summaries table, migrations/001_chat_summaries.sql) and moves
+the project's watermark forward. The prompt gets the summary followed by
+the messages after the watermark, so its size stays bounded however long
+the conversation runs.
+
+Summaries are written by a cheap Gemini call (CHAT_SUMMARY_METHOD=model) or,
+when that fails or is disabled, by an extractive summarizer that keeps the
+first sentence of each message. Summarizing never runs on the request path
+and never fails a request.
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import cache
+from .env import Env
+from .logs import log
+from .metrics import CHAT_SUMMARIES, record_usage
+from .prompt import build_summary_prompt
+
+# Messages read per summarization run; a longer backlog is folded over several runs
+FOLD_BATCH_MESSAGES = 200
+# A project whose summarization failed isn't retried sooner than this
+RETRY_AFTER_SECONDS = 60.0
+EXTRACT_SENTENCE_CHARS = 160
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+_lock = threading.Lock()
+_pending: set = set()
+_last_attempt: Dict[str, float] = {}
+
+
+def history_cache_key(project_id: str) -> str:
+    return f"history:{project_id}"
+
+
+def _trigger() -> int:
+    # More raw messages than fit in the prompt would never be seen
+    return max(1, min(Env.CHAT_SUMMARY_TRIGGER_MESSAGES, Env.CHAT_HISTORY_MESSAGES))
+
+
+def load_history(repository, project_id: str) -> Dict[str, Any]:
+    """
+    {"summary": str or None, "messages": [...]} for the prompt, oldest message
+    first; cached until the next message or summary is saved. Schedules a
+    summarization when enough unsummarized messages have accumulated.
+    """
+    history = cache.get_json(history_cache_key(project_id), cache="history")
+    if history is None:
+        summary = None
+        if Env.CHAT_SUMMARY_ENABLED:
+            try:
+                summary = repository.get_summary(project_id)
+            except Exception as e:
+                # e.g. the migration hasn't been applied yet: fall back to raw history
+                log.warning("chat.summary_load_failed", projectId=project_id, error=str(e))
+        rows = repository.recent_messages(
+            project_id,
+            Env.CHAT_HISTORY_MESSAGES,
+            after=summary["summarized_through"] if summary else None,
+        )
+        rows.reverse()
+        history = {"summary": summary["summary"] if summary else None, "messages": rows}
+        cache.set_json(history_cache_key(project_id), history, Env.HISTORY_CACHE_TTL_SECONDS)
+    if Env.CHAT_SUMMARY_ENABLED and len(history["messages"]) >= _trigger():
+        schedule(project_id)
+    return history
+
+
+def format_history(history: Dict[str, Any]) -> str:
+    lines = []
+    if history.get("summary"):
+        lines += ["Summary of the earlier conversation:", history["summary"], "", "Latest messages:"]
+    lines += [f"{row['role'].upper()}: {row['content']}" for row in history["messages"]]
+    return "\n".join(lines) if lines else "No previous messages."
+
+
+def schedule(project_id: str) -> bool:
+    """Queue a summarization run for the project unless one is pending or recently failed."""
+    with _lock:
+        if project_id in _pending or time.monotonic() - _last_attempt.get(project_id, -RETRY_AFTER_SECONDS) < RETRY_AFTER_SECONDS:
+            return False
+        _pending.add(project_id)
+        _last_attempt[project_id] = time.monotonic()
+    _executor.submit(_run, project_id)
+    return True
+
+
+def _run(project_id: str) -> None:
+    try:
+        summarize_project(project_id)
+    except Exception as e:
+        CHAT_SUMMARIES.inc(method="failed")
+        log.warning("chat.summary_failed", projectId=project_id, error=str(e))
+    finally:
+        with _lock:
+            _pending.discard(project_id)
+
+
+def summarize_project(project_id: str) -> Optional[str]:
+    """Fold the project's older unsummarized messages into its summary. Returns the method used, if any."""
+    from .repository import get_repository
+    repository = get_repository()
+    if repository is None:
+        return None
+    current = repository.get_summary(project_id)
+    rows = repository.messages_since(
+        project_id,
+        current["summarized_through"] if current else None,
+        FOLD_BATCH_MESSAGES,
+    )
+    if len(rows) < _trigger():
+        return None
+
+    fold_count = max(1, len(rows) - Env.CHAT_SUMMARY_KEEP_RECENT)
+    # The watermark must not fall between a message and its reply (the rows
+    # after a user message up to the next one), nor between rows saved in the
+    # same microsecond: the part after it would be summarized without the rest
+    while fold_count < len(rows) and (
+        rows[fold_count]["role"] != "user" or rows[fold_count]["created_at"] == rows[fold_count - 1]["created_at"]
+    ):
+        fold_count += 1
+    boundary = rows[fold_count - 1]["created_at"]
+    folded = rows[:fold_count]
+    previous = current["summary"] if current else ""
+
+    summary, method = summarize(previous, folded)
+    started = time.perf_counter()
+    repository.save_summary({
+        "project_id": project_id,
+        "summary": summary,
+        "summarized_through": boundary,
+        "message_count": (current["message_count"] if current else 0) + len(folded),
+        "method": method,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    })
+    cache.invalidate(history_cache_key(project_id))
+    CHAT_SUMMARIES.inc(method=method)
+    log.info(
+        "chat.summary_updated",
+        projectId=project_id,
+        method=method,
+        foldedMessages=len(folded),
+        summaryChars=len(summary),
+        saveMs=round((time.perf_counter() - started) * 1000, 1),
+    )
+    return method
+
+
+def summarize(previous: str, rows: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """(new summary, method); falls back to the extractive summary if the model call fails."""
+    if Env.CHAT_SUMMARY_METHOD == "model":
+        try:
+            return model_summary(previous, rows), "model"
+        except Exception as e:
+            log.warning("chat.summary_model_failed", error=str(e))
+    return extractive_summary(previous, rows), "extractive"
+
+
+def model_summary(previous: str, rows: List[Dict[str, Any]]) -> str:
+    from .gemini_client import get_genai
+    from .model_resolver import resolve_model
+    transcript = "\n".join(f"{row['role'].upper()}: {row['content']}" for row in rows)
+    prompt = build_summary_prompt(previous, transcript, Env.CHAT_SUMMARY_MAX_CHARS)
+    model = get_genai().GenerativeModel(Env.CHAT_SUMMARY_MODEL or resolve_model())
+    response = model.generate_content(prompt, request_options={"timeout": Env.CHAT_SUMMARY_TIMEOUT_SECONDS})
+    record_usage(getattr(response, "usage_metadata", None))
+    summary = (response.text or "").strip()
+    if not summary:
+        raise ValueError("empty summary")
+    return summary[:Env.CHAT_SUMMARY_MAX_CHARS]
+
+
+def extractive_summary(previous: str, rows: List[Dict[str, Any]]) -> str:
+    """Previous summary plus the first sentence of each message, trimmed from the oldest end."""
+    lines = [line for line in previous.splitlines() if line.strip()]
+    for row in rows:
+        text = " ".join(row["content"].split())
+        sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        if len(sentence) > EXTRACT_SENTENCE_CHARS:
+            sentence = sentence[:EXTRACT_SENTENCE_CHARS - 3] + "..."
+        if sentence:
+            lines.append(f"- {row['role']}: {sentence}")
+    kept: List[str] = []
+    size = 0
+    for line in reversed(lines):
+        if size + len(line) + 1 > Env.CHAT_SUMMARY_MAX_CHARS:
+            break
+        kept.append(line)
+        size += len(line) + 1
+    return "\n".join(reversed(kept))
@@ -0,0 +1,357 @@
+"""
+Tolerant JSON repair for model output.
+
+When a reply does not parse, it is usually broken in one of a few mechanical
+ways: a markdown fence or prose around the object, trailing commas, raw
+newlines inside strings, single-quoted strings, Python literals, or output
+that was cut off mid-array. repair_json fixes all of these in one linear pass
+over the text and reports which repairs it applied.
+
+Truncated output is salvaged rather than closed blindly: the partial element
+of the outermost open array is dropped, so every complete operation before
+the cut is kept and no half-written operation is applied.
+"""
+
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from . import codec
+
+_WHITESPACE = " \t\r\n"
+_VALID_ESCAPES = '"\\/bfnrtu'
+_BARE_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-._")
+_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "-Infinity": "null", "undefined": "null",
+}
+# Run of string characters that need no attention (no quote, backslash or control character)
+_PLAIN_RUN = re.compile(r'[^"\'\\\x00-\x1f]+')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+# Parser states inside a container
+_KEY = "key"            # object: expecting a key or "}"
+_COLON = "colon"        # object: expecting ":"
+_VALUE = "value"        # expecting a value (or "]" right after "[")
+_NEXT = "next"          # expecting "," or the closing bracket
+
+
+@dataclass
+class _Frame:
+    kind: str           # "{" or "["
+    state: str
+    safe: int           # output length after the last complete member
+    members: int = 0
+    after_comma: bool = False
+
+
+@dataclass
+class RepairResult:
+    text: str
+    repairs: List[str] = field(default_factory=list)
+    # Complete array elements dropped from truncated output
+    dropped_elements: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.repairs)
+
+
+def _is_number(token: str) -> bool:
+    try:
+        json.loads(token)
+        return True
+    except ValueError:
+        return False
+
+
+def _starts_key(text: str, start: int) -> bool:
+    """Whether text[start:] looks like '"key":' (a member that is missing its comma)."""
+    end = text.find('"', start + 1, start + 66)
+    if end == -1:
+        return False
+    j = end + 1
+    while j < len(text) and text[j] in _WHITESPACE:
+        j += 1
+    return j < len(text) and text[j] == ":"
+
+
+def repair_json(text: str) -> RepairResult:
+    """Repair text into valid JSON in a single pass. Never raises."""
+    out: List[str] = []
+    length = 0                      # total length of out, kept in step with appends
+    stack: List[_Frame] = []
+    repairs: Counter = Counter()
+    finished = False
+    started = False
+    i, n = 0, len(text)
+
+    def emit(chunk: str) -> None:
+        nonlocal length
+        out.append(chunk)
+        length += len(chunk)
+
+    def truncate_to(size: int) -> None:
+        nonlocal length
+        while length > size:
+            last = out.pop()
+            length -= len(last)
+            if length < size:
+                out.append(last[:size - length])
+                length = size
+
+    def value_done() -> None:
+        nonlocal finished
+        if not stack:
+            finished = True
+            return
+        frame = stack[-1]
+        frame.state = _NEXT
+        frame.members += 1
+        frame.after_comma = False
+        frame.safe = length
+
+    def before_value() -> bool:
+        """Prepare to emit a value; returns False when a value isn't allowed here."""
+        if not stack:
+            return True
+        frame = stack[-1]
+        if frame.kind == "[" and frame.state == _NEXT:
+            repairs["missing_comma"] += 1
+            emit(",")
+            frame.state = _VALUE
+        return frame.state == _VALUE
+
+    while i < n and not finished:
+        char = text[i]
+
+        if not started:
+            # Skip prose and code fences before the first object or array
+            if char in "{[":
+                started = True
+                if i:
+                    repairs["leading_text"] += 1
+            else:
+                i += 1
+                continue
+
+        if char in _WHITESPACE:
+            i += 1
+            continue
+
+        if char in "{[":
+            if not before_value():
+                repairs["unexpected_character"] += 1
+                i += 1
+                continue
+            emit(char)
+            stack.append(_Frame(kind=char, state=_KEY if char == "{" else _VALUE, safe=length))
+            i += 1
+            continue
+
+        if char in "}]":
+            if not any(frame.kind == ("{" if char == "}" else "[") for frame in stack):
+                repairs["unmatched_bracket"] += 1
+                i += 1
+                continue
+            while True:
+                frame = stack[-1]
+                if frame.after_comma:
+                    repairs["trailing_comma"] += 1
+                    truncate_to(frame.safe)
+                elif frame.kind == "{" and frame.state in (_COLON, _VALUE):
+                    repairs["dangling_key"] += 1
+                    truncate_to(frame.safe)
+                stack.pop()
+                emit("}" if frame.kind == "{" else "]")
+                value_done()
+                if frame.kind == ("{" if char == "}" else "["):
+                    break
+                repairs["unclosed_bracket"] += 1
+            i += 1
+            continue
+
+        if char == ",":
+            frame = stack[-1]
+            if frame.state == _NEXT:
+                emit(",")
+                frame.state = _KEY if frame.kind == "{" else _VALUE
+                frame.after_comma = True
+            else:
+                repairs["extra_comma"] += 1
+            i += 1
+            continue
+
+        if char == ":":
+            frame = stack[-1]
+            if frame.kind == "{" and frame.state == _COLON:
+                emit(":")
+                frame.state = _VALUE
+            else:
+                repairs["unexpected_character"] += 1
+            i += 1
+            continue
+
+        if char in "\"'":
+            frame = stack[-1]
+            is_key = frame.kind == "{" and frame.state in (_KEY, _NEXT)
+            if is_key:
+                if frame.state == _NEXT:
+                    repairs["missing_comma"] += 1
+                    emit(",")
+                    frame.state = _KEY
+            elif not before_value():
+                repairs["unexpected_character"] += 1
+                i += 1
+                continue
+            if char == "'":
+                repairs["single_quotes"] += 1
+
+            # Scan the string body
+            quote = char
+            pieces = ['"']
+            i += 1
+            closed = False
+            while i < n:
+                plain = _PLAIN_RUN.match(text, i)
+                if plain:
+                    pieces.append(plain.group())
+                    i = plain.end()
+                    continue
+                c = text[i]
+                if c == "\\":
+                    if i + 1 >= n:
+                        i += 1
+                        break
+                    nxt = text[i + 1]
+                    if quote == "'" and nxt == "'":
+                        pieces.append("'")
+                    elif nxt in _VALID_ESCAPES:
+                        pieces.append(text[i:i + 2])
+                    else:
+                        # Keep the backslash literally and process the next character normally
+                        repairs["invalid_escape"] += 1
+                        pieces.append("\\\\")
+                        i += 1
+                        continue
+                    i += 2
+                    continue
+                if c == quote:
+                    # A quote followed by something that can't follow a string
+                    # is an unescaped quote inside the string
+                    j = i + 1
+                    while j < n and text[j] in _WHITESPACE:
+                        j += 1
+                    if j >= n or text[j] in ",}]:" or (text[j] == '"' and _starts_key(text, j)):
+                        i += 1
+                        closed = True
+                        break
+                    repairs["unescaped_quote"] += 1
+                    pieces.append('\\"' if quote == '"' else "'")
+                    i += 1
+                    continue
+                if c == '"':
+                    pieces.append('\\"')
+                elif c < " ":
+                    repairs["control_character"] += 1
+                    pieces.append(_CONTROL_ESCAPES.get(c, "\\u%04x" % ord(c)))
+                else:
+                    pieces.append(c)
+                i += 1
+            if not closed:
+                break  # truncated inside a string
+            pieces.append('"')
+            emit("".join(pieces))
+            if is_key:
+                frame.state = _COLON
+                frame.after_comma = False
+            else:
+                value_done()
+            continue
+
+        if char == "/" and i + 1 < n and text[i + 1] in "/*":
+            # JavaScript-style comment
+            repairs["comment"] += 1
+            end = text.find("\n", i) if text[i + 1] == "/" else text.find("*/", i + 2)
+            i = n if end == -1 else end + (1 if text[i + 1] == "/" else 2)
+            continue
+
+        if char in _BARE_CHARS:
+            start = i
+            while i < n and text[i] in _BARE_CHARS:
+                i += 1
+            if i >= n:
+                break  # a number or literal cut off at the end may be incomplete
+            token = text[start:i]
+            frame = stack[-1]
+            if frame.kind == "{" and frame.state in (_KEY, _NEXT):
+                repairs["unquoted_key"] += 1
+                if frame.state == _NEXT:
+                    repairs["missing_comma"] += 1
+                    emit(",")
+                emit(json.dumps(token))
+                frame.state = _COLON
+                frame.after_comma = False
+                continue
+            if not before_value():
+                repairs["unexpected_character"] += 1
+                continue
+            if token in _LITERALS:
+                if _LITERALS[token] != token:
+                    repairs["python_literal"] += 1
+                emit(_LITERALS[token])
+            elif _is_number(token):
+                emit(token)
+            else:
+                repairs["unquoted_string"] += 1
+                emit(json.dumps(token))
+            value_done()
+            continue
+
+        repairs["unexpected_character"] += 1
+        i += 1
+
+    if finished and text[i:].strip():
+        repairs["trailing_text"] += 1
+
+    dropped = 0
+    if stack:
+        # Truncated: drop the partial element of the outermost open array (or
+        # the partial member of the innermost object) and close everything
+        repairs["truncated"] += 1
+        arrays = [index for index, frame in enumerate(stack) if frame.kind == "["]
+        cut = arrays[0] if arrays else len(stack) - 1
+        frame = stack[cut]
+        if length > frame.safe:
+            dropped = 1
+        truncate_to(frame.safe)
+        del stack[cut + 1:]
+        while stack:
+            frame = stack.pop()
+            emit("}" if frame.kind == "{" else "]")
+    elif not started:
+        repairs["no_json"] += 1
+
+    repair_list = [name if count == 1 else f"{name} x{count}" for name, count in repairs.items()]
+    return RepairResult(text="".join(out), repairs=repair_list, dropped_elements=dropped)
+
+
+def loads_tolerant(text: str) -> Tuple[Optional[Any], RepairResult]:
+    """
+    Parse JSON, repairing it first if needed.
+
+    Returns (value, result); value is None when even the repaired text is not
+    valid JSON (for example when the text contains no JSON at all).
+    """
+    try:
+        return codec.loads(text), RepairResult(text=text)
+    except ValueError:
+        pass
+    result = repair_json(text)
+    try:
+        return codec.loads(result.text), result
+    except ValueError:
+        return None, result
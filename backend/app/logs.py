@@ -0,0 +1,178 @@
+"""
+Structured JSON logging for the request path.
+
+Events are written as one JSON object per line. Handlers run on a background
+thread behind a QueueHandler, so logging from the event loop only formats a
+record and puts it on a queue; nothing blocks on stdout. Disabled levels
+return before any formatting, and chatty events can be sampled per event
+name, so debug logging costs next to nothing when it is off.
+
+    from .logs import log
+    log.info("chat.fast_path_hit", intent="delete_node", confidence=1.0)
+
+Every event carries the ID of the request it was logged from (see
+request_id_var, set by the request-ID middleware in main.py).
+"""
+
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+from . import codec
+from .env import Env
+
+# Correlates every event logged while handling one request
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Tracebacks are capped separately: they are rarer but longer than fields
+MAX_TRACEBACK_CHARS = 4000
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "event=rate,event=rate" (e.g. "gemini.model_listed=0.1")."""
+    rates = {}
+    for pair in spec.split(","):
+        if "=" not in pair:
+            continue
+        event, rate = pair.split("=", 1)
+        try:
+            rates[event.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+def _cap(value: Any, limit: int) -> Any:
+    """Truncate long strings (and the strings inside lists/dicts) to limit characters."""
+    if isinstance(value, str):
+        if len(value) > limit:
+            return f"{value[:limit]}…[{len(value) - limit} more chars]"
+        return value
+    if isinstance(value, dict):
+        return {key: _cap(item, limit) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        capped = [_cap(item, limit) for item in value[:50]]
+        if len(value) > 50:
+            capped.append(f"…[{len(value) - 50} more items]")
+        return capped
+    return value
+
+
+class JSONFormatter(logging.Formatter):
+    def __init__(self, max_field_chars: int):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["requestId"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(_cap(fields, self.max_field_chars))
+        if record.exc_info:
+            text = "".join(traceback.format_exception(*record.exc_info))
+            entry["traceback"] = _cap(text, MAX_TRACEBACK_CHARS)
+        return codec.dumps_str(entry, default=str)
+
+
+class EventLogger:
+    """Thin wrapper around a stdlib logger: log.<level>(event, **fields)."""
+
+    def __init__(self, logger: logging.Logger, sample_rates: Dict[str, float]):
+        self.logger = logger
+        self.sample_rates = sample_rates
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info: Any = None) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = self.sample_rates.get(event)
+        if rate is not None and random.random() >= rate:
+            return
+        if rate is not None and rate < 1.0:
+            fields["sampleRate"] = rate
+        self.logger.log(
+            level,
+            event,
+            exc_info=exc_info,
+            extra={"fields": fields, "request_id": request_id_var.get()},
+        )
+
+    def enabled(self, level: int) -> bool:
+        """Check before building expensive fields for a debug event."""
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields: Any) -> None:
+        """Log at error level with the current exception's traceback."""
+        self._log(logging.ERROR, event, fields, exc_info=sys.exc_info())
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _setup() -> EventLogger:
+    global _listener
+    logger = logging.getLogger("archie")
+    logger.setLevel(getattr(logging, Env.LOG_LEVEL.upper(), logging.INFO))
+    logger.propagate = False
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter(Env.LOG_MAX_FIELD_CHARS))
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+    logger.addHandler(_DroppingQueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return EventLogger(logger, _parse_sample_rates(Env.LOG_SAMPLE_RATES))
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking the event loop when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread; only freeze the message here
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def flush(timeout: float = 1.0) -> None:
+    """Wait until queued records have been written (for CLI scripts and shutdown)."""
+    deadline = time.monotonic() + timeout
+    while _listener is not None and not _listener.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+log = _setup()
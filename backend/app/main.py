@@ -1,28 +1,48 @@
-# Patch importlib.metadata for Python 3.9 compatibility
-# This ensures packages_distributions is available via the backport
-import sys
-try:
-    import importlib_metadata
-    # For Python 3.9, importlib.metadata may not exist or may not have packages_distributions
-    # Replace it with the backport which has full functionality
-    if 'importlib.metadata' not in sys.modules:
-        sys.modules['importlib.metadata'] = importlib_metadata
-    elif not hasattr(sys.modules['importlib.metadata'], 'packages_distributions'):
-        sys.modules['importlib.metadata'] = importlib_metadata
-except ImportError:
-    pass  # importlib-metadata not installed, use built-in
-
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from .routes.health import router as health_router
 from .routes.chat import router as chat_router
+from .routes.projects import router as projects_router
+from .routes.metrics import router as metrics_router
+from .routes.admin import router as admin_router
+from .logs import request_id_var
+from .codec import FastJSONResponse
+from .compression import CompressionMiddleware
+from .etags import ConditionalGetMiddleware
+from .env import Env
+from .warmup import warm_up
+from .health_checks import monitor as health_monitor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import uuid
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail fast on missing configuration, then warm up in the background so
+    # /api/health answers immediately and /api/ready turns green when done
+    Env.validate()
+    # Chat requests spend their time waiting on the database and Gemini in
+    # asyncio.to_thread workers; size the pool for I/O, not for CPUs
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=Env.CHAT_WORKER_THREADS, thread_name_prefix="chat")
+    )
+    warmup_task = asyncio.create_task(warm_up())
+    health_task = asyncio.create_task(health_monitor.run())
+    yield
+    warmup_task.cancel()
+    health_task.cancel()
 
 app = FastAPI(
     title="Visual System Editor Backend",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS to allow the frontend origin
@@ -36,6 +56,44 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# ETags are computed on the uncompressed body, then the response is
+# compressed for the client (the middleware added last is the outermost)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+
+class RequestIdMiddleware:
+    """
+    Tags every request with an ID (the caller's X-Request-ID if it sent one)
+    so all log events of one request can be correlated. Plain ASGI rather
+    than @app.middleware("http"): that wrapper re-chunks response bodies and
+    hides client disconnects from the routes (chat cancels work on them).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get("x-request-id", "")[:64] or uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+app.add_middleware(RequestIdMiddleware)
+
+
 # Global exception handler to ensure CORS headers are always sent
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -55,6 +113,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
         status_code=exc.status_code,
         content={"detail": exc.detail},
         headers={
+            **(exc.headers or {}),
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
             "Access-Control-Allow-Headers": "*",
@@ -63,4 +122,8 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
 
 app.include_router(health_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
+app.include_router(projects_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
+# Served at the conventional /metrics path for Prometheus scrapers
+app.include_router(metrics_router)
 
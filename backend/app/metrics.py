@@ -0,0 +1,259 @@
+"""
+In-process metrics in Prometheus text format.
+
+A deliberately small implementation (counters and histograms with labels)
+so recording a sample is a dict lookup and a few additions under a lock,
+cheap enough to leave on in production. Everything registered here is
+served by GET /metrics.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond local work up to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with _lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with _lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+def render_latest() -> str:
+    """All registered metrics in Prometheus text exposition format 0.0.4."""
+    with _lock:
+        metrics = list(_registry)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class StageClock:
+    """
+    Times consecutive stages of one request.
+
+    Call lap(stage) at the end of each stage; the time since the previous lap
+    (or since the clock was created) is recorded for that stage, and as a
+    span on trace (a tracing.RequestTrace) when one is given.
+    """
+
+    def __init__(self, histogram: "Histogram", trace: Any = None, span_prefix: str = ""):
+        self.histogram = histogram
+        self.trace = trace
+        self.span_prefix = span_prefix
+        self.started = self._last = time.perf_counter()
+        # Wall-clock anchor for span timestamps
+        self._started_ns = time.time_ns()
+        self.laps: Dict[str, float] = {}
+        self.last_stage: Optional[str] = None
+
+    def _wall_ns(self, perf: float) -> int:
+        return self._started_ns + int((perf - self.started) * 1e9)
+
+    def lap(self, stage: str, attributes: Optional[Dict[str, Any]] = None) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        if self.trace is not None:
+            self.trace.add_span(self.span_prefix + stage, self._wall_ns(self._last), self._wall_ns(now), attributes)
+        self._last = now
+        self.laps[stage] = self.laps.get(stage, 0.0) + elapsed
+        self.last_stage = stage
+        self.histogram.observe(elapsed, stage=stage)
+        return elapsed
+
+    def skip(self) -> None:
+        """Restart the lap without recording (for time that belongs to no stage)."""
+        self._last = time.perf_counter()
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# Chat pipeline metrics
+CHAT_REQUESTS = Counter(
+    "archie_chat_requests_total",
+    "Chat requests by how they were answered (fast_path, llm) or the HTTP status they failed with.",
+    ["outcome"],
+)
+CHAT_REQUEST_SECONDS = Histogram(
+    "archie_chat_request_duration_seconds",
+    "End-to-end duration of /api/chat requests.",
+    ["outcome"],
+)
+CHAT_STAGE_SECONDS = Histogram(
+    "archie_chat_stage_duration_seconds",
+    "Duration of each stage of the /api/chat pipeline.",
+    ["stage"],
+)
+CHAT_ABANDONED = Counter(
+    "archie_chat_abandoned_total",
+    "Chat requests stopped early: reason=deadline (with the stage that ran out) or client_disconnected.",
+    ["reason", "stage"],
+)
+REPLY_PARSE = Counter(
+    "archie_model_reply_parse_total",
+    "Model replies by parse outcome: schema (valid as generated), repaired (local JSON repair) or failed.",
+    ["method"],
+)
+REPLY_REPAIRS = Counter(
+    "archie_model_reply_repairs_total",
+    "Local JSON repairs applied to model replies, by kind.",
+    ["kind"],
+)
+REJECTED_OPS = Counter(
+    "archie_model_reply_rejected_ops_total",
+    "Compact operation lines rejected as malformed.",
+)
+GEMINI_RATE_LIMITED = Counter(
+    "archie_gemini_rate_limited_total",
+    "Gemini calls rejected with 429 / quota exceeded.",
+)
+GEMINI_TOKENS = Counter(
+    "archie_gemini_tokens_total",
+    "Gemini tokens reported in usage_metadata, by kind (prompt, output, total).",
+    ["kind"],
+)
+GEMINI_OUTPUT_TOKENS = Histogram(
+    "archie_gemini_output_tokens",
+    "Output tokens per Gemini reply.",
+    buckets=TOKEN_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "archie_cache_lookups_total",
+    "Cache lookups by cache name and result (hit, miss).",
+    ["cache", "result"],
+)
+CHAT_SUMMARIES = Counter(
+    "archie_chat_summaries_total",
+    "Background history summarization runs by method (model, extractive) or failed.",
+    ["method"],
+)
+STORAGE_WRITE_BATCH = Histogram(
+    "archie_storage_write_batch_size",
+    "Writes committed per SQLite transaction (STORAGE_BACKEND=sqlite).",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+FAST_PATH = Counter(
+    "archie_fast_path_total",
+    "Fast-path parser attempts by result (hit, miss, low_confidence).",
+    ["result"],
+)
+
+
+def record_usage(usage_metadata: Optional[object]) -> None:
+    """Record Gemini token counts from a response's usage_metadata."""
+    if usage_metadata is None:
+        return
+    prompt = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    output = getattr(usage_metadata, "candidates_token_count", 0) or 0
+    total = getattr(usage_metadata, "total_token_count", 0) or (prompt + output)
+    GEMINI_TOKENS.inc(prompt, kind="prompt")
+    GEMINI_TOKENS.inc(output, kind="output")
+    GEMINI_TOKENS.inc(total, kind="total")
+    if output:
+        GEMINI_OUTPUT_TOKENS.observe(output)
@@ -0,0 +1,140 @@
+"""
+Parsing and validation of Gemini replies.
+
+Generation runs in Gemini's JSON mode with RESPONSE_SCHEMA, so a reply is
+normally a JSON object that validates directly against ModelReply. Replies
+that don't (models without JSON mode wrapping the object in a code fence,
+trailing commas, output cut off by the token limit, ...) are fixed by the
+local repair pass in json_repair before giving up, so the user doesn't have
+to resend. Every parse is counted so the failure rate can be monitored.
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from .json_repair import loads_tolerant
+from .metrics import REJECTED_OPS, REPLY_PARSE, REPLY_REPAIRS
+from .op_dsl import expand_ops
+
+# Gemini response schema (OpenAPI subset) for {message, ops[]}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "message": {"type": "string"},
+        "ops": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["message", "ops"],
+}
+
+JSON_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": RESPONSE_SCHEMA,
+}
+
+DEFAULT_MESSAGE = "I've processed your request."
+
+
+class ModelReply(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    message: str = DEFAULT_MESSAGE
+    ops: List[str] = []
+    # Verbose operation objects from replies generated before the compact syntax
+    operations: Optional[List[Dict[str, Any]]] = None
+
+
+@dataclass
+class ParsedReply:
+    message: str
+    operations: List[Dict[str, Any]]
+    # Compact lines as generated, for savings reporting
+    ops: List[str] = field(default_factory=list)
+    op_errors: List[str] = field(default_factory=list)
+    # "schema": valid as generated, "repaired": needed local repair, "failed": unusable
+    method: str = "schema"
+    repairs: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class ParseStats:
+    """Counters for how replies were parsed, reported by /api/chat/stats."""
+
+    def __init__(self) -> None:
+        self.counts = {"schema": 0, "repaired": 0, "failed": 0}
+        self.rejected_ops = 0
+        self.repairs: Counter = Counter()
+        # Chat requests record from worker threads
+        self._lock = threading.Lock()
+
+    def record(self, parsed: ParsedReply) -> None:
+        with self._lock:
+            self.counts[parsed.method] += 1
+            self.rejected_ops += len(parsed.op_errors)
+            for repair in parsed.repairs:
+                self.repairs[repair.split(" x")[0]] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, rejected_ops, repairs = dict(self.counts), self.rejected_ops, dict(self.repairs)
+        total = sum(counts.values())
+        return {
+            "total": total,
+            **counts,
+            "rejectedOps": rejected_ops,
+            "failureRate": round(counts["failed"] / total, 4) if total else 0.0,
+            "repairRate": round(counts["repaired"] / total, 4) if total else 0.0,
+            "repairsByKind": repairs,
+        }
+
+
+stats = ParseStats()
+
+
+def _from_model(reply: ModelReply, method: str) -> ParsedReply:
+    if reply.ops or reply.operations is None:
+        operations, op_errors = expand_ops(reply.ops)
+    else:
+        operations, op_errors = reply.operations, []
+    return ParsedReply(
+        message=reply.message,
+        operations=operations,
+        ops=reply.ops,
+        op_errors=op_errors,
+        method=method,
+    )
+
+
+def parse_model_reply(reply_text: str) -> ParsedReply:
+    """Validate a reply against ModelReply, repairing it locally if it isn't valid as generated."""
+    try:
+        parsed = _from_model(ModelReply.model_validate_json(reply_text), "schema")
+    except ValidationError as e:
+        value, repair = loads_tolerant(reply_text)
+        try:
+            if value is None:
+                raise ValueError("no JSON object found in the response")
+            parsed = _from_model(ModelReply.model_validate(value), "repaired")
+            parsed.repairs = repair.repairs
+        except (ValueError, ValidationError) as retry_error:
+            error = str(retry_error).splitlines()[0] if str(retry_error) else str(e)
+            parsed = ParsedReply(
+                message=(
+                    "I received your message, but encountered an error processing it. "
+                    f"The AI response couldn't be parsed as JSON. Please try rephrasing your request. (Error: {error[:100]})"
+                ),
+                operations=[],
+                method="failed",
+                error=error,
+                repairs=repair.repairs,
+            )
+    stats.record(parsed)
+    REPLY_PARSE.inc(method=parsed.method)
+    for repair in parsed.repairs:
+        REPLY_REPAIRS.inc(kind=repair.split(" x")[0])
+    if parsed.op_errors:
+        REJECTED_OPS.inc(len(parsed.op_errors))
+    return parsed
@@ -0,0 +1,135 @@
+"""
+Choice of the Gemini model used for chat.
+
+Listing models is a network round trip, and the answer only changes when
+Google ships or retires a model, so the chosen model is kept in the cache
+backend (shared by all workers unless CACHE_BACKEND=memory) for
+MODEL_CACHE_TTL_SECONDS instead of being looked up on every request.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from .env import Env
+from .gemini_client import get_genai
+from .logs import log
+from .cache import cache
+
+# Prioritize free-tier compatible models
+# Updated list based on actual available models (gemini-1.5-flash is no longer available)
+# Free tier typically supports: gemini-2.5-flash, gemini-2.0-flash, gemini-flash-latest
+PREFERRED_MODELS = [
+    "gemini-2.5-flash",           # Latest stable free-tier model
+    "gemini-2.0-flash",           # Alternative free-tier option
+    "gemini-flash-latest",         # Latest flash model
+    "gemini-2.5-flash-lite",      # Lite version
+    "gemini-2.0-flash-lite",      # Alternative lite
+    "gemini-pro-latest",          # Pro model (may have limits)
+    "gemini-1.5-flash",           # Legacy (may not be available)
+    "gemini-1.5-pro",             # Legacy (may not be available)
+]
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when no usable Gemini model could be found."""
+
+
+CACHE_KEY = "model:choice"
+
+_lock = threading.Lock()
+
+
+def _is_stable(name: str) -> bool:
+    # Free-tier models only (not experimental, not preview)
+    return "-exp" not in name.lower() and "-preview" not in name.lower()
+
+
+def list_available_models() -> List[Dict[str, str]]:
+    """Models that support generateContent. Returns [] if listing fails."""
+    available_models = []
+    try:
+        for model in get_genai().list_models():
+            model_display_name = model.name.split('/')[-1] if '/' in model.name else model.name
+            if 'generateContent' in model.supported_generation_methods:
+                available_models.append({
+                    'name': model_display_name,
+                    'full_name': model.name,
+                })
+
+        if not available_models:
+            log.warning("gemini.no_models", reason="no models with generateContent support found")
+        else:
+            log.debug("gemini.models_listed", count=len(available_models), models=[m['name'] for m in available_models])
+    except Exception:
+        log.exception("gemini.list_models_failed")
+    return available_models
+
+
+def choose_model(available_models: List[Dict[str, str]]) -> Optional[str]:
+    """Pick the first preferred model that is available, else the first stable one."""
+    for preferred in PREFERRED_MODELS:
+        for model_info in available_models:
+            # Exact match or starts with preferred name
+            if (model_info['name'] == preferred or
+                    model_info['name'].startswith(preferred) or
+                    preferred in model_info['name']):
+                if _is_stable(model_info['name']):
+                    log.info("gemini.model_selected", model=model_info['name'], preferred=True)
+                    return model_info['name']
+
+    for model_info in available_models:
+        if _is_stable(model_info['name']):
+            log.info("gemini.model_selected", model=model_info['name'], preferred=False)
+            return model_info['name']
+    return None
+
+
+def _discover_model() -> str:
+    available_models = list_available_models()
+    model_name = choose_model(available_models)
+
+    # Fallback: try creating models directly (for backwards compatibility)
+    if not model_name:
+        log.warning("gemini.direct_model_fallback")
+        for name in PREFERRED_MODELS:
+            try:
+                get_genai().GenerativeModel(name)
+                model_name = name
+                log.info("gemini.model_selected", model=model_name, direct=True)
+                break
+            except Exception as e:
+                log.debug("gemini.model_unavailable", model=name, error=str(e))
+                continue
+
+    if not model_name:
+        error_detail = "No available Gemini models found. "
+        if available_models:
+            error_detail += f"Available models: {', '.join([m['name'] for m in available_models[:5]])}"
+        else:
+            error_detail += "Please check your API key and model availability."
+        raise ModelUnavailableError(error_detail)
+    return model_name
+
+
+def resolve_model() -> str:
+    """
+    Name of the model to generate with (display name like "gemini-2.5-flash",
+    which GenerativeModel accepts). Raises ModelUnavailableError.
+    """
+    model_name = cache.get_json(CACHE_KEY, cache="model")
+    if model_name:
+        return model_name
+
+    with _lock:
+        # Another request in this worker may have resolved it while we waited
+        model_name = cache.get_json(CACHE_KEY, cache="model")
+        if model_name:
+            return model_name
+        model_name = _discover_model()
+        cache.set_json(CACHE_KEY, model_name, Env.MODEL_CACHE_TTL_SECONDS)
+        return model_name
+
+
+def invalidate() -> None:
+    """Forget the cached choice (in every worker), e.g. after the model was reported missing."""
+    cache.invalidate(CACHE_KEY)
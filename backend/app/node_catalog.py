@@ -0,0 +1,549 @@
+"""
+Catalog of node types that can be created in the diagram.
+"""
+
+# All available node types that can be created in the diagram
+# Each node type includes its ID, label, description, and common use cases
+# This list must stay in sync with frontend/src/nodes/nodeTypes.ts
+AVAILABLE_NODE_TYPES = [
+    {
+        "id": "web-server",
+        "label": "Web Server",
+        "description": "Serves HTTP/HTTPS requests and hosts web applications. Handles incoming client requests and serves responses.",
+        "technologies": {
+            "lightweight": ["Express.js", "Flask", "Sinatra", "Node.js", "FastAPI", "Django"],
+            "heavy": ["Nginx", "Apache", "AWS ALB", "Kubernetes Ingress", "HAProxy", "Traefik"]
+        },
+        "use_cases": [
+            "Hosting web applications and APIs",
+            "Serving static content",
+            "Handling HTTP/HTTPS requests",
+            "Application servers for business logic"
+        ]
+    },
+    {
+        "id": "database",
+        "label": "Database",
+        "description": "Stores and manages structured data persistently. Provides data persistence and query capabilities.",
+        "technologies": {
+            "lightweight": ["SQLite", "PostgreSQL (Single)", "MySQL (Single)", "MongoDB (Single)", "SQLite"],
+            "heavy": ["PostgreSQL Cluster", "MongoDB Sharded", "DynamoDB", "Cassandra", "CockroachDB", "AWS RDS Multi-AZ", "Azure Cosmos DB"]
+        },
+        "use_cases": [
+            "Storing application data",
+            "User data and authentication",
+            "Transaction records",
+            "Relational or NoSQL data storage"
+        ]
+    },
+    {
+        "id": "worker",
+        "label": "Worker",
+        "description": "Background processing service that handles asynchronous tasks and long-running operations.",
+        "technologies": {
+            "lightweight": ["Node.js Worker", "Python Worker", "Background Job Processor", "Celery (Single)"],
+            "heavy": ["Kubernetes Job", "AWS Lambda", "Celery Workers", "Sidekiq Workers", "Bull Queue Cluster"]
+        },
+        "use_cases": [
+            "Background job processing",
+            "Image/video processing",
+            "Data transformation tasks",
+            "Scheduled tasks and cron jobs"
+        ]
+    },
+    {
+        "id": "cache",
+        "label": "Cache",
+        "description": "High-speed temporary storage for frequently accessed data to improve performance and reduce latency.",
+        "technologies": {
+            "lightweight": ["Redis (Single)", "In-Memory Cache", "Node Cache", "Memcached (Single)"],
+            "heavy": ["Redis Cluster", "Memcached Pool", "AWS ElastiCache", "Hazelcast", "Apache Ignite"]
+        },
+        "use_cases": [
+            "Caching database query results",
+            "Session storage",
+            "API response caching",
+            "Reducing database load"
+        ]
+    },
+    {
+        "id": "queue",
+        "label": "Queue",
+        "description": "Message queue system that enables asynchronous communication and task distribution between services.",
+        "technologies": {
+            "lightweight": ["Redis Queue", "RabbitMQ (Single)", "Bull Queue", "Beanstalkd"],
+            "heavy": ["Kafka Cluster", "AWS SQS", "RabbitMQ Cluster", "Google Pub/Sub", "Azure Service Bus", "NATS"]
+        },
+        "use_cases": [
+            "Task queuing and processing",
+            "Decoupling services",
+            "Handling peak loads",
+            "Reliable message delivery"
+        ]
+    },
+    {
+        "id": "storage",
+        "label": "Storage",
+        "description": "Object storage or file storage system for storing files, media, and unstructured data.",
+        "technologies": {
+            "lightweight": ["Local Storage", "Simple S3 Bucket", "File System", "MinIO"],
+            "heavy": ["AWS S3", "Azure Blob Storage", "Google Cloud Storage", "Distributed File System", "Ceph"]
+        },
+        "use_cases": [
+            "File storage (images, documents)",
+            "Object storage (S3-style)",
+            "Media files and assets",
+            "Backup and archival storage"
+        ]
+    },
+    {
+        "id": "third-party-api",
+        "label": "Third-party API",
+        "description": "External service or API that your system integrates with. Represents dependencies on external services.",
+        "technologies": {
+            "lightweight": ["Stripe API", "Twilio API", "SendGrid API", "Generic REST API"],
+            "heavy": ["Stripe Enterprise", "Twilio Enterprise", "SendGrid Enterprise", "AWS Marketplace APIs"]
+        },
+        "use_cases": [
+            "Payment processing APIs",
+            "Authentication services (OAuth)",
+            "Email/SMS services",
+            "External data providers"
+        ]
+    },
+    {
+        "id": "compute-node",
+        "label": "Compute Node",
+        "description": "Generic compute resource for processing tasks, running containers, or executing code.",
+        "technologies": {
+            "lightweight": ["Docker Container", "Simple VM", "Local Compute"],
+            "heavy": ["Kubernetes Node", "AWS ECS", "Azure Container Instances", "Google Cloud Run"]
+        },
+        "use_cases": [
+            "Container orchestration nodes",
+            "Serverless function execution",
+            "Batch processing",
+            "General-purpose compute resources"
+        ]
+    },
+    {
+        "id": "load-balancer",
+        "label": "Load Balancer",
+        "description": "Distributes incoming network traffic across multiple servers to ensure high availability and performance.",
+        "technologies": {
+            "lightweight": ["Nginx (Basic)", "HAProxy (Basic)", "Simple Load Balancer"],
+            "heavy": ["AWS ALB", "AWS NLB", "Kubernetes Ingress", "HAProxy Enterprise", "F5 BIG-IP"]
+        },
+        "use_cases": [
+            "Distributing traffic across web servers",
+            "High availability and redundancy",
+            "SSL termination",
+            "Traffic routing and health checks"
+        ]
+    },
+    {
+        "id": "message-broker",
+        "label": "Message Broker",
+        "description": "Middleware that enables communication between distributed systems using publish-subscribe or message queue patterns.",
+        "technologies": {
+            "lightweight": ["Redis Pub/Sub", "Simple Event Bus", "RabbitMQ (Single)"],
+            "heavy": ["Apache Kafka", "AWS EventBridge", "RabbitMQ Cluster", "NATS", "Google Pub/Sub", "Azure Event Hubs"]
+        },
+        "use_cases": [
+            "Event-driven architectures",
+            "Microservices communication",
+            "Real-time messaging",
+            "Pub/sub messaging patterns"
+        ]
+    },
+    {
+        "id": "cdn",
+        "label": "CDN",
+        "description": "Content Delivery Network that caches and serves content from edge locations close to users for faster delivery.",
+        "technologies": {
+            "lightweight": ["Cloudflare Free", "Optional CDN"],
+            "heavy": ["AWS CloudFront", "Fastly", "Cloudflare Enterprise", "Akamai", "Azure CDN"]
+        },
+        "use_cases": [
+            "Serving static assets globally",
+            "Reducing latency for users",
+            "Offloading traffic from origin servers",
+            "Video streaming and media delivery"
+        ]
+    },
+    {
+        "id": "monitoring",
+        "label": "Monitoring Service",
+        "description": "Service that collects metrics, logs, and traces to monitor system health, performance, and availability.",
+        "technologies": {
+            "lightweight": ["Basic Logging", "Console Logs", "Simple Metrics", "Winston", "Pino"],
+            "heavy": ["Prometheus + Grafana", "Datadog", "New Relic", "AWS CloudWatch", "Splunk", "Elastic Stack"]
+        },
+        "use_cases": [
+            "Application performance monitoring",
+            "Infrastructure metrics",
+            "Log aggregation and analysis",
+            "Alerting and incident management"
+        ]
+    },
+    {
+        "id": "api-gateway",
+        "label": "API Gateway",
+        "description": "Single entry point for API requests that handles routing, authentication, rate limiting, and request/response transformation.",
+        "technologies": {
+            "lightweight": ["Express Gateway", "Kong (Basic)", "Simple API Router"],
+            "heavy": ["AWS API Gateway", "Kong Enterprise", "Azure API Management", "Apigee", "Tyk"]
+        },
+        "use_cases": [
+            "API request routing and load balancing",
+            "Authentication and authorization",
+            "Rate limiting and throttling",
+            "Request/response transformation"
+        ]
+    },
+    {
+        "id": "dns",
+        "label": "DNS",
+        "description": "Domain Name System service that translates domain names to IP addresses and manages DNS records.",
+        "technologies": {
+            "lightweight": ["Cloudflare DNS", "Simple DNS", "Route53 Basic"],
+            "heavy": ["AWS Route53", "Azure DNS", "Google Cloud DNS", "DNS Made Easy"]
+        },
+        "use_cases": [
+            "Domain name resolution",
+            "Load balancing via DNS",
+            "CDN routing",
+            "Service discovery"
+        ]
+    },
+    {
+        "id": "vpc-network",
+        "label": "VPC / Network",
+        "description": "Virtual Private Cloud or network infrastructure that provides isolated network environments for resources.",
+        "technologies": {
+            "lightweight": ["Simple Network", "Local Network"],
+            "heavy": ["AWS VPC", "Azure Virtual Network", "Google Cloud VPC", "Multi-Region VPC"]
+        },
+        "use_cases": [
+            "Network isolation and security",
+            "Private network segments",
+            "Subnet management",
+            "Network routing and connectivity"
+        ]
+    },
+    {
+        "id": "vpn-link",
+        "label": "VPN / Private Link",
+        "description": "Virtual Private Network or private link that provides secure, encrypted connections between networks or services.",
+        "technologies": {
+            "lightweight": ["OpenVPN", "WireGuard", "Simple VPN"],
+            "heavy": ["AWS VPN", "Azure VPN Gateway", "Google Cloud VPN", "AWS PrivateLink"]
+        },
+        "use_cases": [
+            "Secure remote access",
+            "Site-to-site connectivity",
+            "Private service connections",
+            "Encrypted data transmission"
+        ]
+    },
+    {
+        "id": "auth-service",
+        "label": "Auth Service",
+        "description": "Authentication service that handles user login, session management, and authentication tokens.",
+        "technologies": {
+            "lightweight": ["JWT Auth", "Passport.js", "Simple Auth Service"],
+            "heavy": ["Auth0", "AWS Cognito", "Azure AD", "Okta", "Keycloak"]
+        },
+        "use_cases": [
+            "User authentication",
+            "Session management",
+            "Token generation and validation",
+            "Single sign-on (SSO)"
+        ]
+    },
+    {
+        "id": "identity-provider",
+        "label": "Identity Provider (IdP)",
+        "description": "Identity provider that manages user identities and provides authentication services (e.g., OAuth, SAML).",
+        "technologies": {
+            "lightweight": ["OAuth 2.0", "Simple IdP", "Social Login"],
+            "heavy": ["Okta", "Azure AD", "Google Identity", "AWS SSO", "Ping Identity"]
+        },
+        "use_cases": [
+            "OAuth/OIDC authentication",
+            "SAML-based SSO",
+            "Social login integration",
+            "Centralized identity management"
+        ]
+    },
+    {
+        "id": "secrets-manager",
+        "label": "Secrets Manager",
+        "description": "Service for securely storing and managing secrets, API keys, passwords, and certificates.",
+        "technologies": {
+            "lightweight": ["Environment Variables", "Simple Secrets", ".env files"],
+            "heavy": ["AWS Secrets Manager", "Azure Key Vault", "HashiCorp Vault", "Google Secret Manager"]
+        },
+        "use_cases": [
+            "API key management",
+            "Password and credential storage",
+            "Certificate management",
+            "Secure configuration storage"
+        ]
+    },
+    {
+        "id": "waf",
+        "label": "Web Application Firewall",
+        "description": "Security service that filters and monitors HTTP/HTTPS traffic to protect web applications from attacks.",
+        "technologies": {
+            "lightweight": ["Cloudflare WAF (Free)", "Basic Firewall"],
+            "heavy": ["AWS WAF", "Azure Application Gateway WAF", "Cloudflare Enterprise WAF", "F5 Advanced WAF"]
+        },
+        "use_cases": [
+            "SQL injection prevention",
+            "XSS attack protection",
+            "DDoS mitigation",
+            "Rate limiting and bot protection"
+        ]
+    },
+    {
+        "id": "search-engine",
+        "label": "Search Engine",
+        "description": "Search service that provides full-text search capabilities for applications and data.",
+        "technologies": {
+            "lightweight": ["Elasticsearch (Single)", "Simple Search", "PostgreSQL Full-Text"],
+            "heavy": ["Elasticsearch Cluster", "AWS OpenSearch", "Azure Cognitive Search", "Solr Cloud"]
+        },
+        "use_cases": [
+            "Full-text search",
+            "Product search",
+            "Document search",
+            "Real-time search indexing"
+        ]
+    },
+    {
+        "id": "data-warehouse",
+        "label": "Data Warehouse",
+        "description": "Centralized repository for storing and analyzing large volumes of structured data for business intelligence.",
+        "technologies": {
+            "lightweight": ["PostgreSQL (Analytics)", "Simple Data Warehouse"],
+            "heavy": ["Snowflake", "AWS Redshift", "Google BigQuery", "Azure Synapse", "Databricks"]
+        },
+        "use_cases": [
+            "Business intelligence and analytics",
+            "Data aggregation and reporting",
+            "Historical data analysis",
+            "ETL data processing"
+        ]
+    },
+    {
+        "id": "stream-processor",
+        "label": "Stream Processor",
+        "description": "Service that processes continuous streams of data in real-time for analytics and event processing.",
+        "technologies": {
+            "lightweight": ["Kafka Streams (Basic)", "Simple Stream Processor"],
+            "heavy": ["Apache Flink", "Apache Spark Streaming", "AWS Kinesis", "Google Cloud Dataflow"]
+        },
+        "use_cases": [
+            "Real-time data processing",
+            "Event stream processing",
+            "Real-time analytics",
+            "Streaming ETL pipelines"
+        ]
+    },
+    {
+        "id": "etl-job",
+        "label": "ETL / Batch Job",
+        "description": "Extract, Transform, Load job that processes data in batches for data integration and transformation.",
+        "technologies": {
+            "lightweight": ["Python Script", "Simple ETL", "Cron Job"],
+            "heavy": ["Apache Airflow", "AWS Glue", "Azure Data Factory", "dbt", "Talend"]
+        },
+        "use_cases": [
+            "Data integration",
+            "Batch data processing",
+            "Data transformation pipelines",
+            "Scheduled data migrations"
+        ]
+    },
+    {
+        "id": "scheduler",
+        "label": "Scheduler / Cron",
+        "description": "Service that schedules and executes tasks, jobs, or workflows at specified times or intervals.",
+        "technologies": {
+            "lightweight": ["Cron", "Node-cron", "Simple Scheduler"],
+            "heavy": ["AWS EventBridge", "Azure Scheduler", "Google Cloud Scheduler", "Quartz Scheduler"]
+        },
+        "use_cases": [
+            "Scheduled task execution",
+            "Cron job management",
+            "Workflow scheduling",
+            "Periodic data processing"
+        ]
+    },
+    {
+        "id": "serverless-function",
+        "label": "Serverless Function",
+        "description": "Event-driven compute service that runs code in response to events without managing servers.",
+        "technologies": {
+            "lightweight": ["Vercel Function", "Netlify Function", "Simple Lambda", "Cloudflare Workers"],
+            "heavy": ["AWS Lambda (Multi-Region)", "Azure Functions", "Google Cloud Functions", "AWS Step Functions"]
+        },
+        "use_cases": [
+            "Event-driven processing",
+            "API endpoints",
+            "Background task processing",
+            "Microservices architecture"
+        ]
+    },
+    {
+        "id": "logging-service",
+        "label": "Logging Service",
+        "description": "Service that collects, stores, and analyzes application and system logs for debugging and monitoring.",
+        "technologies": {
+            "lightweight": ["Winston", "Pino", "Console Logs", "File Logging"],
+            "heavy": ["ELK Stack", "AWS CloudWatch Logs", "Azure Monitor", "Splunk", "Datadog Logs"]
+        },
+        "use_cases": [
+            "Centralized log collection",
+            "Log aggregation and storage",
+            "Log analysis and search",
+            "Debugging and troubleshooting"
+        ]
+    },
+    {
+        "id": "alerting-service",
+        "label": "Alerting / Incident Management",
+        "description": "Service that monitors system health and sends alerts or manages incidents when issues are detected.",
+        "technologies": {
+            "lightweight": ["Email Alerts", "Simple Notifications"],
+            "heavy": ["PagerDuty", "Opsgenie", "VictorOps", "AWS SNS", "Datadog Alerts"]
+        },
+        "use_cases": [
+            "System health monitoring",
+            "Alert notification",
+            "Incident management",
+            "On-call management"
+        ]
+    },
+    {
+        "id": "status-page",
+        "label": "Status Page / Health Check",
+        "description": "Public status page or health check service that displays system availability and service status.",
+        "technologies": {
+            "lightweight": ["Simple Status Page", "Health Check Endpoint"],
+            "heavy": ["Statuspage.io", "Atlassian Statuspage", "Cachet", "Uptime Robot"]
+        },
+        "use_cases": [
+            "Public service status",
+            "Health check endpoints",
+            "Service availability monitoring",
+            "Incident communication"
+        ]
+    },
+    {
+        "id": "orchestrator",
+        "label": "Workflow Orchestrator",
+        "description": "Service that orchestrates and manages complex workflows, pipelines, and multi-step processes.",
+        "technologies": {
+            "lightweight": ["Simple Workflow", "Basic Orchestrator"],
+            "heavy": ["Apache Airflow", "AWS Step Functions", "Temporal", "Conductor", "Prefect"]
+        },
+        "use_cases": [
+            "Workflow management",
+            "Pipeline orchestration",
+            "Multi-step process coordination",
+            "Distributed task coordination"
+        ]
+    },
+    {
+        "id": "notification-service",
+        "label": "Notification Service",
+        "description": "Service that sends notifications to users via various channels (push, in-app, etc.).",
+        "technologies": {
+            "lightweight": ["Simple Notifications", "Firebase Cloud Messaging (Basic)"],
+            "heavy": ["AWS SNS", "OneSignal", "Pusher", "Twilio Notify", "SendGrid Notifications"]
+        },
+        "use_cases": [
+            "Push notifications",
+            "In-app notifications",
+            "User alerts",
+            "Multi-channel notifications"
+        ]
+    },
+    {
+        "id": "email-service",
+        "label": "Email Service",
+        "description": "Service that handles email sending, receiving, and management for applications.",
+        "technologies": {
+            "lightweight": ["SendGrid", "Mailgun", "Simple SMTP"],
+            "heavy": ["AWS SES", "SendGrid Enterprise", "Mailgun Enterprise", "Postmark", "SparkPost"]
+        },
+        "use_cases": [
+            "Transactional emails",
+            "Email marketing",
+            "Email delivery",
+            "Email templates and management"
+        ]
+    },
+    {
+        "id": "webhook-endpoint",
+        "label": "Webhook Endpoint",
+        "description": "HTTP endpoint that receives webhook callbacks from external services for event-driven integrations.",
+        "technologies": {
+            "lightweight": ["Express.js Webhook", "Simple HTTP Endpoint"],
+            "heavy": ["AWS API Gateway Webhooks", "Zapier", "Microsoft Power Automate", "Webhook.site"]
+        },
+        "use_cases": [
+            "Third-party service callbacks",
+            "Event-driven integrations",
+            "Real-time data synchronization",
+            "External service notifications"
+        ]
+    },
+    {
+        "id": "web-client",
+        "label": "Web Client",
+        "description": "Web browser or web application client that interacts with backend services.",
+        "technologies": {
+            "lightweight": ["React", "Vue.js", "Angular", "Vanilla JS"],
+            "heavy": ["React (SSR)", "Next.js", "Nuxt.js", "Angular Universal", "Progressive Web App"]
+        },
+        "use_cases": [
+            "Web application frontend",
+            "Browser-based clients",
+            "User interface",
+            "Client-side applications"
+        ]
+    },
+    {
+        "id": "mobile-app",
+        "label": "Mobile App",
+        "description": "Mobile application (iOS, Android) that interacts with backend services via APIs.",
+        "technologies": {
+            "lightweight": ["React Native", "Flutter", "Ionic"],
+            "heavy": ["Native iOS (Swift)", "Native Android (Kotlin)", "Flutter Enterprise", "React Native Enterprise"]
+        },
+        "use_cases": [
+            "Mobile application frontend",
+            "Native mobile apps",
+            "Mobile user interface",
+            "Cross-platform mobile apps"
+        ]
+    },
+    {
+        "id": "admin-panel",
+        "label": "Admin Panel",
+        "description": "Administrative interface for managing and configuring system components and settings.",
+        "technologies": {
+            "lightweight": ["React Admin", "Simple Dashboard", "Custom Admin UI"],
+            "heavy": ["Retool", "AdminJS", "Forest Admin", "Grafana", "Custom Enterprise Dashboard"]
+        },
+        "use_cases": [
+            "System administration",
+            "Configuration management",
+            "User management",
+            "Dashboard and monitoring"
+        ]
+    }
+]
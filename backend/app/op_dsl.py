@@ -0,0 +1,235 @@
+"""
+Compact operation syntax for model output.
+
+Gemini is asked to return each diagram operation as one short pipe-separated
+line instead of the nested operation JSON the frontend consumes. Output
+tokens dominate generation latency, and the compact form needs about half as
+many of them (see benchmarks/op_dsl_savings.py). The lines are expanded
+server-side into exactly the operation JSON that the frontend applies
+(frontend/src/hooks/useProject.ts).
+
+Syntax (one operation per line, fields separated by "|"):
+
+    an|<id>|<type>|<x>,<y>|<name>|<description>|<attributes>   add_node
+    un|<id>|<name>|<description>|<attributes>                   update_node
+    dn|<id>                                                     delete_node
+    ae|<source>|<target>[|<edge type>]                          add_edge
+    de|<id>                                                     delete_edge
+
+<attributes> is "key=value;key=value". Empty fields are omitted (an empty
+position lets the frontend lay the node out). Literal "|", ";", "=" and "\\"
+inside values are escaped with a backslash.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+OP_CODES = {
+    "an": "add_node",
+    "un": "update_node",
+    "dn": "delete_node",
+    "ae": "add_edge",
+    "de": "delete_edge",
+}
+
+# Number of fields after the op code: (minimum, maximum)
+FIELD_COUNTS = {
+    "an": (6, 6),
+    "un": (4, 4),
+    "dn": (1, 1),
+    "ae": (2, 3),
+    "de": (1, 1),
+}
+
+_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.:-]*$")
+_POSITION_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class DSLError(ValueError):
+    """Raised when a compact operation line is malformed."""
+
+
+def _split_escaped(text: str, separator: str) -> List[str]:
+    """Split on an unescaped separator, keeping escapes for the next level."""
+    if "\\" not in text:
+        return text.split(separator)
+    parts, current, i = [], [], 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if char == separator:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    parts.append("".join(current))
+    return parts
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text.strip()
+    return re.sub(r"\\(.)", r"\1", text).strip()
+
+
+def _escape(text: Any) -> str:
+    return re.sub(r"([\\|;=])", r"\\\1", str(text))
+
+
+def _parse_id(value: str, field: str) -> str:
+    value = _unescape(value)
+    if not _ID_RE.match(value):
+        raise DSLError(f"invalid {field} {value!r}")
+    return value
+
+
+def _parse_attributes(text: str) -> Dict[str, Any]:
+    attributes: Dict[str, Any] = {}
+    if not text.strip():
+        return attributes
+    for pair in _split_escaped(text, ";"):
+        if not pair.strip():
+            continue
+        key_value = _split_escaped(pair, "=")
+        if len(key_value) != 2 or not _unescape(key_value[0]):
+            raise DSLError(f"invalid attribute {pair!r}, expected key=value")
+        attributes[_unescape(key_value[0])] = _unescape(key_value[1])
+    return attributes
+
+
+def _parse_data(name: str, description: str, attributes: str) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    if _unescape(name):
+        data["name"] = _unescape(name)
+    if _unescape(description):
+        data["description"] = _unescape(description)
+    parsed_attributes = _parse_attributes(attributes)
+    if parsed_attributes:
+        data["attributes"] = parsed_attributes
+    return data
+
+
+def expand_line(line: str) -> Dict[str, Any]:
+    """Expand one compact line into the operation JSON the frontend applies."""
+    fields = _split_escaped(line.strip(), "|")
+    code = fields[0].strip().lower()
+    if code not in OP_CODES:
+        raise DSLError(f"unknown op code {fields[0]!r}")
+    args = fields[1:]
+    minimum, maximum = FIELD_COUNTS[code]
+    if not minimum <= len(args) <= maximum:
+        raise DSLError(f"{code} expects {minimum}-{maximum} fields, got {len(args)}")
+
+    op = OP_CODES[code]
+    if code == "an":
+        node_id, node_type, position, name, description, attributes = args
+        payload: Dict[str, Any] = {"id": _parse_id(node_id, "node id"), "type": _parse_id(node_type, "node type")}
+        operation: Dict[str, Any] = {"op": op, "payload": payload}
+        if position.strip():
+            match = _POSITION_RE.match(position)
+            if not match:
+                raise DSLError(f"invalid position {position!r}, expected x,y")
+            x, y = (float(value) for value in match.groups())
+            x, y = (int(x) if x.is_integer() else x), (int(y) if y.is_integer() else y)
+            payload["position"] = {"x": x, "y": y}
+            operation["metadata"] = {"x": x, "y": y}
+        payload["data"] = _parse_data(name, description, attributes)
+        # Keep the key order of the verbose format: op, payload, metadata
+        return {key: operation[key] for key in ("op", "payload", "metadata") if key in operation}
+    if code == "un":
+        node_id, name, description, attributes = args
+        data = _parse_data(name, description, attributes)
+        if not data:
+            raise DSLError("un has nothing to update")
+        return {"op": op, "payload": {"id": _parse_id(node_id, "node id"), "data": data}}
+    if code == "ae":
+        payload = {"source": _parse_id(args[0], "source"), "target": _parse_id(args[1], "target")}
+        if len(args) == 3 and _unescape(args[2]):
+            payload["type"] = _unescape(args[2])
+        return {"op": op, "payload": payload}
+    return {"op": op, "payload": {"id": _parse_id(args[0], "id")}}
+
+
+def expand_ops(lines: Any) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Expand a list of compact lines (or one newline-separated string).
+
+    Malformed lines are rejected rather than guessed at: they are left out of
+    the result and described in the returned error list.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    if not isinstance(lines, list):
+        return [], [f"ops must be a list of strings, got {type(lines).__name__}"]
+
+    operations: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for number, line in enumerate(lines, start=1):
+        if not isinstance(line, str):
+            errors.append(f"line {number}: expected a string, got {type(line).__name__}")
+            continue
+        if not line.strip():
+            continue
+        try:
+            operations.append(expand_line(line))
+        except DSLError as e:
+            errors.append(f"line {number}: {e}")
+    return operations, errors
+
+
+def compact_operation(operation: Dict[str, Any]) -> Optional[str]:
+    """Inverse of expand_line, used to measure savings. Returns None for unknown ops."""
+    op = operation.get("op")
+    payload = operation.get("payload") or {}
+    data = payload.get("data") or {}
+    attributes = ";".join(f"{_escape(k)}={_escape(v)}" for k, v in (data.get("attributes") or {}).items())
+    if op == "add_node":
+        position = payload.get("position")
+        xy = f"{position['x']},{position['y']}" if position else ""
+        return "|".join([
+            "an", _escape(payload.get("id", "")), _escape(payload.get("type", "")), xy,
+            _escape(data.get("name", "")), _escape(data.get("description", "")), attributes,
+        ])
+    if op == "update_node":
+        return "|".join([
+            "un", _escape(payload.get("id", "")), _escape(data.get("name", "")),
+            _escape(data.get("description", "")), attributes,
+        ])
+    if op == "add_edge":
+        parts = ["ae", _escape(payload.get("source", "")), _escape(payload.get("target", ""))]
+        if payload.get("type"):
+            parts.append(_escape(payload["type"]))
+        return "|".join(parts)
+    if op == "delete_node":
+        return f"dn|{_escape(payload.get('id', ''))}"
+    if op == "delete_edge":
+        return f"de|{_escape(payload.get('id', ''))}"
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for Gemini on JSON/English)."""
+    return (len(text) + 3) // 4
+
+
+def measure_savings(lines: List[str], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compare the size of the compact lines the model produced with the verbose
+    operation JSON it would otherwise have had to generate.
+    """
+    compact = json.dumps(lines)
+    verbose = json.dumps(operations)
+    compact_tokens, verbose_tokens = estimate_tokens(compact), estimate_tokens(verbose)
+    return {
+        "compactChars": len(compact),
+        "verboseChars": len(verbose),
+        "compactTokens": compact_tokens,
+        "verboseTokens": verbose_tokens,
+        "savedTokens": verbose_tokens - compact_tokens,
+        "ratio": round(verbose_tokens / compact_tokens, 2) if compact_tokens else 0.0,
+    }
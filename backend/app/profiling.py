@@ -0,0 +1,186 @@
+"""
+Opt-in profiling of single chat requests.
+
+A request is profiled only when profiling is configured (PROFILING_TOKEN is
+set), it carries that token in the X-Profile-Token header or the
+profile_token query parameter, and it comes from an address in
+PROFILING_ALLOWLIST. The request then runs under cProfile; the profile is
+written to PROFILE_DIR (a .prof file for snakeviz/pstats, a text summary and
+a small metadata file) and its ID is returned in the X-Profile-ID header.
+
+Only one request is profiled at a time; a second request asking for a
+profile meanwhile runs unprofiled. cProfile records the thread that enabled
+it, so the chat pipeline enables it inside its worker thread (active()) and
+the profile contains only the profiled request.
+
+The files are written on a background thread once both the profiled thread
+has finished and the route has reported the outcome (finish()), and the next
+profile can only start after that. A request answered with a 504 or 499
+leaves its worker thread running, so its profile waits for that thread.
+"""
+
+import cProfile
+import hmac
+import io
+import ipaddress
+import json
+import pstats
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import Request
+
+from .env import Env
+from .logs import log
+
+PROFILE_ID_RE = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+SUMMARY_LINES = 40
+
+_busy = threading.Lock()
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+
+def _allowlist() -> List[Any]:
+    networks = []
+    for entry in Env.PROFILING_ALLOWLIST.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            log.warning("profiling.invalid_allowlist_entry", entry=entry)
+    return networks
+
+
+_networks = _allowlist()
+
+
+def authorized(request: Request) -> bool:
+    """Whether the request carries the profiling token and comes from an allowed address."""
+    if not Env.PROFILING_TOKEN:
+        return False
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile_token") or ""
+    if not hmac.compare_digest(token.encode(), Env.PROFILING_TOKEN.encode()):
+        return False
+    host = request.client.host if request.client else ""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _networks)
+
+
+def _profile_dir() -> Path:
+    directory = Path(Env.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+class RequestProfile:
+    """cProfile session for one request; written once the thread is done and finish() was called."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiled = False
+        self._metadata: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def active(self) -> Iterator[None]:
+        """Profile the current thread for the duration of the block."""
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            with self._lock:
+                self._profiled = True
+                ready = self._metadata is not None
+            if ready:
+                _writer.submit(self._write)
+
+    def finish(self, **metadata: Any) -> None:
+        """Report the request's outcome; the files are written off the event loop."""
+        with self._lock:
+            self._metadata = metadata
+            ready = self._profiled
+        if ready:
+            _writer.submit(self._write)
+
+    def _write(self) -> None:
+        duration = time.perf_counter() - self.started
+        try:
+            directory = _profile_dir()
+            self.profiler.dump_stats(str(directory / f"{self.profile_id}.prof"))
+            summary = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=summary)
+            stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+            (directory / f"{self.profile_id}.txt").write_text(summary.getvalue())
+            (directory / f"{self.profile_id}.json").write_text(json.dumps({
+                "id": self.profile_id,
+                "route": self.route,
+                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "durationMs": round(duration * 1000, 1),
+                **(self._metadata or {}),
+            }))
+            _prune(directory)
+            log.info("profiling.profile_written", profileId=self.profile_id, durationMs=round(duration * 1000, 1))
+        except Exception:
+            log.exception("profiling.write_failed", profileId=self.profile_id)
+        finally:
+            _busy.release()
+
+
+def start_profile(request: Request, route: str) -> Optional[RequestProfile]:
+    """Start profiling when the request asks for it and is allowed to; else None."""
+    if not authorized(request):
+        return None
+    if not _busy.acquire(blocking=False):
+        log.info("profiling.skipped_busy", route=route)
+        return None
+    try:
+        return RequestProfile(route)
+    except Exception:
+        _busy.release()
+        log.exception("profiling.start_failed", route=route)
+        return None
+
+
+def _prune(directory: Path) -> None:
+    """Keep only the newest PROFILE_MAX_COUNT profiles."""
+    profiles = sorted(directory.glob("*.json"), reverse=True)
+    for stale in profiles[Env.PROFILE_MAX_COUNT:]:
+        for suffix in (".json", ".prof", ".txt"):
+            stale.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """Metadata of the most recent profiles, newest first."""
+    directory = Path(Env.PROFILE_DIR)
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True)[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id: str, kind: str) -> Optional[Path]:
+    """Path of a profile's .prof or .txt file, or None for an unknown/invalid ID."""
+    if not PROFILE_ID_RE.match(profile_id) or kind not in ("prof", "txt"):
+        return None
+    path = Path(Env.PROFILE_DIR) / f"{profile_id}.{kind}"
+    return path if path.is_file() else None
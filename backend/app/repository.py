@@ -0,0 +1,498 @@
+"""
+Persistence for projects, chat messages and history summaries.
+
+STORAGE_BACKEND selects one of:
+
+    supabase  the hosted Postgres behind PostgREST (the default)
+    sqlite    a local database file (SQLITE_PATH), for self-hosted and
+              offline deployments: no network hop, no Supabase project
+
+Everything on the request path (chat, history, the history API, health
+checks and warm-up) goes through get_repository(), so both backends serve
+the same operations with the same row shapes: timestamps are ISO 8601
+strings and diagram_json is decoded.
+
+The SQLite backend runs in WAL mode, so readers never wait for the writer
+and vice versa. Each thread reads through its own connection. Writes are
+queued to a single writer thread, which commits whatever has queued up
+(up to SQLITE_WRITE_BATCH writes) in one transaction. Concurrent chat
+requests therefore share commits instead of each paying for one.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import codec
+from .env import Env
+from .logs import log
+from .metrics import STORAGE_WRITE_BATCH
+
+# (created_at, id) of a message, as used by keyset pagination
+Position = Sequence[str]
+
+
+class Repository(ABC):
+    name = ""
+
+    @abstractmethod
+    def ping(self) -> None:
+        """Cheapest possible round trip; raises when the database is unreachable."""
+
+    @abstractmethod
+    def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """{"id", "diagram_json"} of the project, or None if it doesn't exist."""
+
+    @abstractmethod
+    def project_exists(self, project_id: str) -> bool:
+        """Whether the project exists."""
+
+    @abstractmethod
+    def add_messages(self, project_id: str, messages: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Insert (role, content) messages, each created 1 µs after the one before; returns the saved rows."""
+
+    @abstractmethod
+    def recent_messages(self, project_id: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The newest messages (role, content, created_at) created after `after`, newest first."""
+
+    @abstractmethod
+    def messages_since(self, project_id: str, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """The oldest messages (role, content, created_at) created after `after`, oldest first."""
+
+    @abstractmethod
+    def message_page(
+        self,
+        project_id: str,
+        columns: Sequence[str],
+        limit: int,
+        before: Optional[Position] = None,
+        after: Optional[Position] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to limit messages seeking on (created_at, id): newest first, older
+        than `before` if given; or oldest first, newer than `after`.
+        """
+
+    @abstractmethod
+    def get_summary(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """The project's chat_summaries row (summary, summarized_through, message_count), if any."""
+
+    @abstractmethod
+    def save_summary(self, row: Dict[str, Any]) -> None:
+        """Insert or replace the project's chat_summaries row."""
+
+    @abstractmethod
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Insert or update projects or chat_messages rows by id, keeping their ids and timestamps."""
+
+    def describe_error(self, error: Exception) -> Dict[str, str]:
+        """Log fields for a database error."""
+        return {"error": str(error)}
+
+
+class SupabaseRepository(Repository):
+    name = "supabase"
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def ping(self) -> None:
+        self.client.table("projects").select("id").limit(1).execute()
+
+    def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        res = self.client.table("projects").select("id, diagram_json").eq("id", project_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def project_exists(self, project_id: str) -> bool:
+        res = self.client.table("projects").select("id").eq("id", project_id).limit(1).execute()
+        return bool(res.data)
+
+    def add_messages(self, project_id: str, messages: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        # Timestamps are set here: the column default (now()) is the same for every row of an insert
+        res = self.client.table("chat_messages").insert([
+            {"project_id": project_id, "role": role, "content": content, "created_at": created_at}
+            for (role, content), created_at in zip(messages, _message_timestamps(len(messages)))
+        ]).execute()
+        return res.data or []
+
+    def recent_messages(self, project_id: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = (
+            self.client.table("chat_messages")
+            .select("role, content, created_at")
+            .eq("project_id", project_id)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+        )
+        if after:
+            query = query.gt("created_at", after)
+        return query.execute().data or []
+
+    def messages_since(self, project_id: str, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        query = (
+            self.client.table("chat_messages")
+            .select("role, content, created_at")
+            .eq("project_id", project_id)
+            .order("created_at")
+            .order("id")
+            .limit(limit)
+        )
+        if after:
+            query = query.gt("created_at", after)
+        return query.execute().data or []
+
+    @staticmethod
+    def _keyset_filter(position: Position, op: str) -> str:
+        # (created_at, id) < / > (position) as a PostgREST or-filter; values
+        # are quoted because timestamps contain ':' and '+'. created_at follows
+        # insertion order (see _message_timestamps and migration 003); id only
+        # settles rows saved in the same microsecond. Both are re-serialized so
+        # nothing but a timestamp and a UUID reaches the filter
+        created_at = datetime.fromisoformat(position[0]).isoformat()
+        message_id = str(uuid.UUID(position[1]))
+        return f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{message_id})'
+
+    def message_page(
+        self,
+        project_id: str,
+        columns: Sequence[str],
+        limit: int,
+        before: Optional[Position] = None,
+        after: Optional[Position] = None,
+    ) -> List[Dict[str, Any]]:
+        backwards = after is None
+        query = (
+            self.client.table("chat_messages")
+            .select(", ".join(columns))
+            .eq("project_id", project_id)
+            .order("created_at", desc=backwards)
+            .order("id", desc=backwards)
+            .limit(limit)
+        )
+        if before:
+            query = query.or_(self._keyset_filter(before, "lt"))
+        elif after:
+            query = query.or_(self._keyset_filter(after, "gt"))
+        return query.execute().data or []
+
+    def get_summary(self, project_id: str) -> Optional[Dict[str, Any]]:
+        res = (
+            self.client.table("chat_summaries")
+            .select("summary, summarized_through, message_count")
+            .eq("project_id", project_id)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    def save_summary(self, row: Dict[str, Any]) -> None:
+        self.client.table("chat_summaries").upsert(row, on_conflict="project_id").execute()
+
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        self.client.table(table).upsert(rows, on_conflict="id").execute()
+
+    def describe_error(self, error: Exception) -> Dict[str, str]:
+        # postgrest's APIError carries a dict with message, code and hint
+        details = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+        fields = {
+            "error": details.get("message", str(error)),
+            "code": details.get("code", "N/A"),
+            "hint": details.get("hint", "N/A"),
+        }
+        if "row-level security" in fields["error"].lower():
+            fields["hint"] = (
+                "RLS policy is blocking the query. Verify that SUPABASE_SERVICE_ROLE_KEY is the "
+                "service role key (not anon key); it bypasses RLS automatically."
+            )
+        return fields
+
+
+SQLITE_SCHEMA = """
+create table if not exists projects (
+    id text primary key,
+    name text,
+    diagram_json text not null default '{}',
+    created_at text not null,
+    updated_at text not null
+);
+create table if not exists chat_messages (
+    id text primary key,
+    project_id text not null references projects(id) on delete cascade,
+    role text not null,
+    content text not null,
+    created_at text not null
+);
+-- Every history query filters on project_id and orders by (created_at, id)
+create index if not exists chat_messages_project_created_idx on chat_messages (project_id, created_at, id);
+create table if not exists chat_summaries (
+    project_id text primary key references projects(id) on delete cascade,
+    summary text not null,
+    summarized_through text not null,
+    message_count integer not null default 0,
+    method text not null,
+    updated_at text not null
+);
+"""
+
+SQLITE_COLUMNS = {
+    "projects": ("id", "name", "diagram_json", "created_at", "updated_at"),
+    "chat_messages": ("id", "project_id", "role", "content", "created_at"),
+}
+
+
+def _now() -> str:
+    # Fixed-width UTC timestamps: string order is time order
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _message_timestamps(count: int) -> List[str]:
+    # A message and its reply are saved together; distinct, increasing
+    # timestamps keep the reply after the message in every (created_at, id) order
+    now = datetime.now(timezone.utc)
+    return [(now + timedelta(microseconds=index)).isoformat(timespec="microseconds") for index in range(count)]
+
+
+def _timestamp(value: Optional[str]) -> str:
+    """An imported timestamp (PostgREST trims fractional digits) in _now()'s fixed-width form."""
+    if not value:
+        return _now()
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+class SqliteRepository(Repository):
+    name = "sqlite"
+
+    def __init__(self, path: str, write_batch: int = 64) -> None:
+        self.path = path
+        self.write_batch = max(1, write_batch)
+        self._local = threading.local()
+        self._writes: "queue.Queue[Optional[Tuple[Callable[[sqlite3.Connection], Any], Future]]]" = queue.Queue()
+        setup = self._connect()
+        try:
+            setup.executescript(SQLITE_SCHEMA)
+        finally:
+            setup.close()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: no implicit transactions; the writer opens its own
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("pragma journal_mode = wal")
+        # With WAL, NORMAL only syncs at checkpoints; a power loss can drop the
+        # last commits but never corrupts the database
+        connection.execute("pragma synchronous = normal")
+        connection.execute("pragma foreign_keys = on")
+        connection.execute("pragma temp_store = memory")
+        connection.execute("pragma cache_size = -16000")  # 16 MB per connection
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._reader().execute(sql, params).fetchall()]
+
+    def _write(self, write: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run write on the writer thread; returns once its batch is committed."""
+        future: Future = Future()
+        self._writes.put((write, future))
+        return future.result()
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        while True:
+            item = self._writes.get()
+            if item is None:
+                connection.close()
+                return
+            batch = [item]
+            while len(batch) < self.write_batch:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._writes.put(None)  # stop after this batch
+                    break
+                batch.append(item)
+            self._commit(connection, batch)
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[Tuple[Callable, Future]]) -> None:
+        started = time.perf_counter()
+        results = []
+        try:
+            connection.execute("begin immediate")
+            for write, future in batch:
+                # A savepoint per write: one failing write doesn't undo the others
+                connection.execute("savepoint write")
+                try:
+                    results.append((future, write(connection), None))
+                    connection.execute("release write")
+                except Exception as e:
+                    connection.execute("rollback to write")
+                    connection.execute("release write")
+                    results.append((future, None, e))
+            connection.execute("commit")
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("rollback")
+            log.error("sqlite.commit_failed", writes=len(batch), error=str(e))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        STORAGE_WRITE_BATCH.observe(len(batch))
+        log.debug("sqlite.batch_committed", writes=len(batch), ms=round((time.perf_counter() - started) * 1000, 2))
+        for future, value, error in results:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    def close(self) -> None:
+        """Stop the writer once queued writes are committed."""
+        self._writes.put(None)
+        self._writer.join()
+
+    def ping(self) -> None:
+        self._reader().execute("select 1").fetchone()
+
+    def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("select id, diagram_json from projects where id = ?", (project_id,))
+        if not rows:
+            return None
+        rows[0]["diagram_json"] = codec.loads(rows[0]["diagram_json"])
+        return rows[0]
+
+    def project_exists(self, project_id: str) -> bool:
+        return bool(self._query("select 1 from projects where id = ?", (project_id,)))
+
+    def add_messages(self, project_id: str, messages: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = [
+            {"id": str(uuid.uuid4()), "project_id": project_id, "role": role, "content": content, "created_at": created_at}
+            for (role, content), created_at in zip(messages, _message_timestamps(len(messages)))
+        ]
+
+        def insert(connection: sqlite3.Connection) -> List[Dict[str, Any]]:
+            connection.executemany(
+                "insert into chat_messages (id, project_id, role, content, created_at) "
+                "values (:id, :project_id, :role, :content, :created_at)",
+                rows,
+            )
+            return rows
+
+        return self._write(insert)
+
+    def recent_messages(self, project_id: str, limit: int, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._query(
+            "select role, content, created_at from chat_messages "
+            "where project_id = ? and created_at > ? order by created_at desc, id desc limit ?",
+            (project_id, after or "", limit),
+        )
+
+    def messages_since(self, project_id: str, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        return self._query(
+            "select role, content, created_at from chat_messages "
+            "where project_id = ? and created_at > ? order by created_at, id limit ?",
+            (project_id, after or "", limit),
+        )
+
+    def message_page(
+        self,
+        project_id: str,
+        columns: Sequence[str],
+        limit: int,
+        before: Optional[Position] = None,
+        after: Optional[Position] = None,
+    ) -> List[Dict[str, Any]]:
+        unknown = set(columns) - set(SQLITE_COLUMNS["chat_messages"])
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        sql = f"select {', '.join(columns)} from chat_messages where project_id = ?"
+        params: List[Any] = [project_id]
+        # Row-value comparisons seek in the (project_id, created_at, id) index
+        if before:
+            sql += " and (created_at, id) < (?, ?)"
+            params += list(before)
+        elif after:
+            sql += " and (created_at, id) > (?, ?)"
+            params += list(after)
+        order = "asc" if after else "desc"
+        sql += f" order by created_at {order}, id {order} limit ?"
+        return self._query(sql, params + [limit])
+
+    def get_summary(self, project_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "select summary, summarized_through, message_count from chat_summaries where project_id = ?",
+            (project_id,),
+        )
+        return rows[0] if rows else None
+
+    def save_summary(self, row: Dict[str, Any]) -> None:
+        self._write(lambda connection: connection.execute(
+            "insert into chat_summaries (project_id, summary, summarized_through, message_count, method, updated_at) "
+            "values (:project_id, :summary, :summarized_through, :message_count, :method, :updated_at) "
+            "on conflict (project_id) do update set summary = excluded.summary, "
+            "summarized_through = excluded.summarized_through, message_count = excluded.message_count, "
+            "method = excluded.method, updated_at = excluded.updated_at",
+            row,
+        ))
+
+    def upsert_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if table not in SQLITE_COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        columns = SQLITE_COLUMNS[table]
+        values = []
+        for row in rows:
+            # Columns the SQLite schema doesn't have (session_id, user_id, ...) are dropped
+            value = {column: row.get(column) for column in columns}
+            value["created_at"] = _timestamp(value["created_at"])
+            if table == "projects":
+                value["updated_at"] = _timestamp(value["updated_at"])
+                value["diagram_json"] = codec.dumps_str(value["diagram_json"] or {})
+            values.append(value)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+        sql = (
+            f"insert into {table} ({', '.join(columns)}) values ({', '.join(':' + column for column in columns)}) "
+            f"on conflict (id) do update set {updates}"
+        )
+        self._write(lambda connection: connection.executemany(sql, values))
+
+
+_repository: Optional[Repository] = None
+_lock = threading.Lock()
+
+
+def create_repository() -> Optional[Repository]:
+    kind = Env.STORAGE_BACKEND
+    if kind == "sqlite":
+        return SqliteRepository(Env.SQLITE_PATH, write_batch=Env.SQLITE_WRITE_BATCH)
+    if kind != "supabase":
+        log.warning("storage.unknown_backend", backend=kind, fallback="supabase")
+    from .supabase_client import get_supabase
+    client = get_supabase()
+    return SupabaseRepository(client) if client is not None else None
+
+
+def get_repository() -> Optional[Repository]:
+    """Shared repository, created on first call. None if the backend can't be configured."""
+    global _repository
+    if _repository is not None:
+        return _repository
+    with _lock:
+        if _repository is None:
+            _repository = create_repository()
+        return _repository
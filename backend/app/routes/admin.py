@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Literal
+from ..env import Env
+from ..profiling import authorized, list_profiles, profile_path
+
+router = APIRouter()
+
+def require_admin(request: Request) -> None:
+    # Same guard as profiling itself: token plus allowlisted address
+    if not Env.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not authorized(request):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+@router.get("/admin/profiles")
+async def get_profiles(request: Request, limit: int = 50):
+    require_admin(request)
+    return {"profiles": list_profiles(limit=max(1, min(limit, 200)))}
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str, format: Literal["text", "pstats"] = "text"):
+    require_admin(request)
+    path = profile_path(profile_id, "txt" if format == "text" else "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format == "text":
+        return PlainTextResponse(path.read_text())
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
@@ -1,10 +1,21 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..warmup import state as warmup_state
+from ..health_checks import monitor as health_monitor
 
 router = APIRouter()
 
 @router.get("/health")
-async def health():
-    return {"ok": True}
-
-
+async def health(deep: bool = False):
+    if not deep:
+        return {"ok": True}
+    # Cached results of the background probes; never probes on the request
+    snapshot = health_monitor.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ok"] else 503, content=snapshot)
 
+@router.get("/ready")
+async def ready():
+    # 503 until the startup warm-up (database connection, model choice) has
+    # finished, and while a required step (see warmup.REQUIRED_STEPS) is failing
+    snapshot = warmup_state.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
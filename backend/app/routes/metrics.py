@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..metrics import render_latest
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus scrape endpoint (text exposition format 0.0.4)
+    return PlainTextResponse(
+        render_latest(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from datetime import datetime, timezone
+from typing import List, Optional
+from ..repository import get_repository
+from ..logs import log
+from .. import codec
+import base64
+import uuid
+
+router = APIRouter()
+
+# Columns a client may ask for; id and created_at are always returned (they make up the cursor)
+MESSAGE_FIELDS = ("role", "content")
+CURSOR_FIELDS = ("id", "created_at")
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(row: dict) -> str:
+    raw = codec.dumps([row["created_at"], row["id"]])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[str]:
+    # Cursors come from the client: both parts are parsed and re-serialized,
+    # never passed on as given (they end up inside a PostgREST filter)
+    try:
+        created_at, message_id = codec.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        timestamp = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        # UTC with microseconds: the same fixed-width form the SQLite backend stores
+        return [timestamp.astimezone(timezone.utc).isoformat(timespec="microseconds"), str(uuid.UUID(message_id))]
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/projects/{project_id}/messages")
+def list_messages(
+    project_id: str,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    One page of a project's chat history, oldest message first.
+
+    Without a cursor this is the newest page. Pass `before=<olderCursor>` to
+    page back through older messages and `after=<newerCursor>` to page
+    forward; hasMore says whether another page follows in that direction.
+    Pages seek on (created_at, id) instead of using OFFSET, so every page
+    costs the same however deep it is. `fields` limits the returned columns
+    (comma-separated, from role and content). Responses carry an ETag
+    (ConditionalGetMiddleware); a matching If-None-Match gets an empty 304.
+    """
+    try:
+        uuid.UUID(project_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid projectId format. Expected UUID, got: {project_id}")
+    if before and after:
+        raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(MESSAGE_FIELDS)
+    unknown = [field for field in requested if field not in MESSAGE_FIELDS + CURSOR_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = list(CURSOR_FIELDS) + [field for field in MESSAGE_FIELDS if field in requested]
+
+    repository = get_repository()
+    if repository is None:
+        raise HTTPException(status_code=503, detail="Supabase is not configured")
+
+    # Walking backwards (the default) reads newest-first and reverses the page
+    backwards = after is None
+    try:
+        rows = repository.message_page(
+            project_id,
+            columns,
+            limit + 1,  # one extra row tells whether there is another page
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.warning("projects.messages_load_failed", projectId=project_id, **repository.describe_error(e))
+        raise HTTPException(status_code=500, detail="Database error while loading messages")
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    body = codec.dumps({
+        "messages": rows,
+        # Walking forward there is always something older (at least the cursor row)
+        "olderCursor": encode_cursor(rows[0]) if rows and (has_more or not backwards) else None,
+        # Also for the newest page, so clients can poll for new messages with after=
+        "newerCursor": encode_cursor(rows[-1]) if rows else None,
+        "hasMore": has_more,
+    })
+
+    # Always revalidate: new messages change the newest page
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "private, no-cache"})
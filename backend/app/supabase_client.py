@@ -1,17 +1,43 @@
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING, Optional
 from .env import Env
-from typing import Optional
+from .logs import log
 
-# Validate environment variables before creating client
-try:
-    Env.validate()
-    supabase: Optional[Client] = create_client(
-        Env.SUPABASE_URL,
-        Env.SUPABASE_SERVICE_ROLE_KEY,
-    )
-except (RuntimeError, Exception) as e:
-    print(f"⚠️  Warning: Failed to initialize Supabase client: {e}")
-    print(f"   The backend will work, but chat/backend features requiring Supabase will not function.")
-    print(f"   To fix: Create backend/.env file with SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
-    supabase: Optional[Client] = None
+if TYPE_CHECKING:
+    from supabase import Client
+
+# The supabase SDK (and postgrest/httpx under it) is imported on first use,
+# not at app import, to keep cold starts short
+_client: Optional["Client"] = None
+_initialized = False
+_lock = threading.Lock()
+
+
+def get_supabase() -> Optional["Client"]:
+    """Shared Supabase client, created on first call. None if it can't be configured."""
+    global _client, _initialized
+    if _initialized:
+        return _client
+    with _lock:
+        if _initialized:
+            return _client
+        try:
+            # Validate environment variables before creating client
+            Env.validate()
+            from supabase import ClientOptions, create_client
+            _client = create_client(
+                Env.SUPABASE_URL,
+                Env.SUPABASE_SERVICE_ROLE_KEY,
+                # A hung request must not hold a worker thread for minutes
+                options=ClientOptions(postgrest_client_timeout=Env.SUPABASE_TIMEOUT_SECONDS),
+            )
+        except Exception as e:
+            log.warning(
+                "supabase.init_failed",
+                error=str(e),
+                hint="Chat features requiring Supabase will not work. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in backend/.env",
+            )
+            _client = None
+        _initialized = True
+        return _client
 
@@ -0,0 +1,255 @@
+"""
+Per-request traces of the chat pipeline.
+
+Spans follow the OpenTelemetry data model and are exported in OTLP/JSON
+encoding, either to a collector over OTLP/HTTP (TRACING_EXPORTER=otlp,
+POST {OTEL_EXPORTER_OTLP_ENDPOINT}/v1/traces) or as one span per line to a
+local file (TRACING_EXPORTER=jsonl), which needs no collector and can be
+inspected with trace_report.py. Export runs on a background thread.
+
+Incoming W3C traceparent headers are honored, so a trace started in the
+frontend continues through the backend stages.
+"""
+
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import codec
+from .env import Env
+from .logs import log
+
+SERVICE_NAME = "archie-backend"
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP status codes
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER = 1, 2
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled)."""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def _new_id(hex_chars: int) -> str:
+    return os.urandom(hex_chars // 2).hex()
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}  # OTLP/JSON encodes int64 as a string
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str
+    start_ns: int
+    end_ns: int = 0
+    kind: int = KIND_INTERNAL
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: int = STATUS_UNSET
+    status_message: str = ""
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class RequestTrace:
+    """The root span of one request and the stage spans recorded under it."""
+
+    def __init__(self, name: str, traceparent: Optional[str] = None, sampled: Optional[bool] = None):
+        parent = parse_traceparent(traceparent)
+        if parent:
+            trace_id, parent_span_id, parent_sampled = parent
+        else:
+            trace_id, parent_span_id, parent_sampled = _new_id(32), "", None
+        if sampled is None:
+            # A sampled parent is followed; without one (or with an unsampled one,
+            # as the browser sends) TRACING_SAMPLE_RATE decides
+            sampled = bool(parent_sampled) or random.random() < Env.TRACING_SAMPLE_RATE
+        self.sampled = sampled and exporter is not None
+        self.root = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=_new_id(16),
+            parent_span_id=parent_span_id,
+            start_ns=time.time_ns(),
+            kind=KIND_SERVER,
+        )
+        self.spans: List[Span] = []
+
+    @property
+    def trace_id(self) -> str:
+        return self.root.trace_id
+
+    def traceparent(self) -> str:
+        """traceparent header value pointing at this request's root span."""
+        return f"00-{self.trace_id}-{self.root.span_id}-{'01' if self.sampled else '00'}"
+
+    def add_span(self, name: str, start_ns: int, end_ns: int, attributes: Optional[Dict[str, Any]] = None) -> None:
+        if not self.sampled:
+            return
+        self.spans.append(Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=_new_id(16),
+            parent_span_id=self.root.span_id,
+            start_ns=start_ns,
+            end_ns=end_ns,
+            attributes=dict(attributes or {}),
+        ))
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.root.attributes.update(attributes)
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """End the root span and hand all spans to the exporter."""
+        self.root.end_ns = time.time_ns()
+        if error:
+            self.root.status, self.root.status_message = STATUS_ERROR, error
+        else:
+            self.root.status = STATUS_OK
+        if self.sampled:
+            exporter.submit([self.root] + self.spans)
+
+
+class _Exporter:
+    """Exports batches of spans from a background thread."""
+
+    batch_size = 128
+    flush_interval = 1.0
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        self._last_error_logged = 0.0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, spans: List[Span]) -> None:
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                return  # drop rather than block the request
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.export([span.to_otlp() for span in batch])
+            except Exception as e:
+                # A missing collector shouldn't flood the logs
+                if time.monotonic() - self._last_error_logged > 60:
+                    self._last_error_logged = time.monotonic()
+                    log.warning("tracing.export_failed", exporter=type(self).__name__, error=str(e))
+
+    def flush(self, timeout: float = 2.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Let the batch that was just taken off the queue be written
+        time.sleep(min(self.flush_interval, max(0.0, deadline - time.monotonic())))
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+
+class JSONLinesExporter(_Exporter):
+    """Appends one OTLP/JSON span per line to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as handle:
+            for span in spans:
+                handle.write(codec.dumps_str(span) + "\n")
+
+
+class OTLPHTTPExporter(_Exporter):
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        super().__init__()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }]
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=codec.dumps(body),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+def _create_exporter() -> Optional[_Exporter]:
+    kind = Env.TRACING_EXPORTER.lower()
+    if kind == "jsonl":
+        return JSONLinesExporter(Env.TRACING_JSONL_PATH)
+    if kind == "otlp":
+        return OTLPHTTPExporter(Env.OTEL_EXPORTER_OTLP_ENDPOINT)
+    if kind not in ("", "none"):
+        log.warning("tracing.unknown_exporter", exporter=kind)
+    return None
+
+
+exporter: Optional[_Exporter] = _create_exporter()
@@ -0,0 +1,94 @@
+"""
+Startup warm-up, run in the background by the app lifespan.
+
+The database (the Supabase client and its HTTP connection, or the SQLite
+file) and the Gemini model choice are prepared concurrently, so the first
+chat request doesn't pay for SDK imports, TLS handshakes and the model
+listing. /api/ready reports ready once warm-up has finished and the required
+steps succeeded; failed required steps are retried every RETRY_SECONDS.
+
+Only the database is required. A failed model step is reported but doesn't
+hold readiness back: chat requests resolve the model themselves, and
+marking every instance unready during a Gemini outage would also take down
+the routes that don't need Gemini.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .logs import log
+
+REQUIRED_STEPS = ("database",)
+RETRY_SECONDS = 5.0
+
+
+class WarmupState:
+    def __init__(self) -> None:
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def failed(self) -> List[str]:
+        """Required steps that haven't succeeded (yet)."""
+        return [name for name in REQUIRED_STEPS if not self.steps.get(name, {}).get("ok")]
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and not self.failed
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.finished_at is not None
+        return {
+            "ready": self.ready,
+            "warmupSeconds": round(self.finished_at - self.started_at, 3) if finished else None,
+            "failed": self.failed if finished else [],
+            "steps": self.steps,
+        }
+
+
+state = WarmupState()
+
+
+def _warm_database() -> str:
+    from .repository import get_repository
+    repository = get_repository()
+    if repository is None:
+        raise RuntimeError("Supabase is not configured")
+    # Cheapest possible query; opens the pooled HTTP connection (or the SQLite file)
+    repository.ping()
+    return f"connected ({repository.name})"
+
+
+def _warm_model() -> str:
+    from .gemini_client import get_genai
+    from .model_resolver import resolve_model
+    get_genai()
+    return resolve_model()
+
+
+STEPS: Dict[str, Callable[[], str]] = {"database": _warm_database, "model": _warm_model}
+
+
+async def _run_step(name: str, step: Callable[[], str]) -> None:
+    started = time.perf_counter()
+    try:
+        detail = await asyncio.to_thread(step)
+        state.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - started, 3), "detail": detail}
+    except Exception as e:
+        state.steps[name] = {"ok": False, "seconds": round(time.perf_counter() - started, 3), "error": str(e)[:300]}
+        log.warning("warmup.step_failed", step=name, error=str(e))
+
+
+async def warm_up() -> None:
+    """Warm the database connection and the model choice concurrently, then retry failed required steps."""
+    state.started_at = time.perf_counter()
+    await asyncio.gather(*(_run_step(name, step) for name, step in STEPS.items()))
+    state.finished_at = time.perf_counter()
+    log.info("warmup.finished", seconds=round(state.finished_at - state.started_at, 3), steps=state.steps)
+    while state.failed:
+        await asyncio.sleep(RETRY_SECONDS)
+        await asyncio.gather(*(_run_step(name, STEPS[name]) for name in state.failed))
+        if not state.failed:
+            log.info("warmup.recovered", steps=state.steps)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Chat Load Test
+Drives concurrent POST /api/chat traffic and reports latency percentiles
+(p50/p95/p99), throughput and an error breakdown.
+
+By default it starts everything locally: the Gemini stand-in
+(fakes/fake_gemini.py), the PostgREST stand-in (fakes/fake_postgrest.py) and
+the backend under uvicorn pointed at both. No quota is spent and no real
+database is touched. The stand-ins' latency, error and 429 rates and reply
+mix are set with the --gemini-* and --db-* options. With --target the
+load goes to an already running backend instead, whose projects must exist
+(--project-id).
+
+--compare checks the run against a baseline (benchmarks/chat_load_baseline.json
+by default) and exits 1 when p95 latency rose or throughput fell by more
+than --max-regression. --save-baseline records the run as the new baseline.
+Compare runs only against baselines recorded with the same options and on
+comparable hardware.
+
+Usage:
+    python benchmarks/chat_load.py [--requests 400] [--concurrency 16] [--compare]
+    python benchmarks/chat_load.py --gemini-latency lognormal:1500,0.6 --gemini-rate-limit-rate 0.05
+    python benchmarks/chat_load.py --target http://localhost:4000 --project-id <uuid> --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFAULT_BASELINE = Path(__file__).parent / "chat_load_baseline.json"
+
+MESSAGES = [
+    "Design a checkout service with a queue between the API and the payment worker",
+    "Add a read replica for the database and a cache in front of it",
+    "We expect about 50k users, make the API tier highly available",
+    "Add monitoring and alerting for the workers",
+    "Put a CDN in front of the web server and add object storage for uploads",
+    "Explain how requests flow from the load balancer to the database",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def sample_diagram(node_count: int) -> Dict:
+    types = ["web-server", "database", "cache", "queue", "worker", "load-balancer"]
+    nodes = [
+        {
+            "id": f"{types[index % len(types)]}-{index + 1}",
+            "type": types[index % len(types)],
+            "position": {"x": 250 * (index % 6), "y": 250 * (index // 6)},
+            "data": {"name": f"Component {index + 1}", "attributes": {"replicas": 2}},
+        }
+        for index in range(node_count)
+    ]
+    edges = [
+        {"id": f"edge-{index}", "source": nodes[index - 1]["id"], "target": nodes[index]["id"]}
+        for index in range(1, node_count)
+    ]
+    return {"nodes": nodes, "edges": edges}
+
+
+class Stack:
+    """The stand-ins and the backend as child processes."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.gemini_url = f"http://127.0.0.1:{free_port()}"
+        self.postgrest_url = f"http://127.0.0.1:{free_port()}"
+        self.backend_url = f"http://127.0.0.1:{free_port()}"
+
+    def spawn(self, command: List[str], env: Optional[Dict[str, str]] = None) -> None:
+        self.processes.append(subprocess.Popen(
+            command,
+            cwd=BACKEND_DIR,
+            env={**os.environ, **(env or {})},
+            stdout=subprocess.DEVNULL,
+            stderr=None if self.args.verbose else subprocess.DEVNULL,
+        ))
+
+    def start(self) -> None:
+        args = self.args
+        seed = [] if args.seed is None else ["--seed", str(args.seed)]
+        self.spawn([
+            sys.executable, "fakes/fake_gemini.py", "--port", self.gemini_url.rsplit(":", 1)[1],
+            "--latency", args.gemini_latency, "--error-rate", str(args.gemini_error_rate),
+            "--rate-limit-rate", str(args.gemini_rate_limit_rate), "--replies", args.gemini_replies,
+            "--tokens-per-second", str(args.gemini_tokens_per_second),
+        ] + seed)
+        self.spawn([
+            sys.executable, "fakes/fake_postgrest.py", "--port", self.postgrest_url.rsplit(":", 1)[1],
+            "--latency", args.db_latency, "--error-rate", str(args.db_error_rate),
+        ] + seed)
+        self.spawn(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", self.backend_url.rsplit(":", 1)[1], "--workers", str(args.workers), "--no-access-log"],
+            env={
+                "STORAGE_BACKEND": "supabase",
+                "SUPABASE_URL": self.postgrest_url,
+                "SUPABASE_SERVICE_ROLE_KEY": "fake.service.key",
+                "GOOGLE_GEMINI_API_KEY": "fake-key",
+                "GEMINI_API_ENDPOINT": self.gemini_url,
+                "LOG_LEVEL": "WARNING",
+                "TRACING_EXPORTER": "none",
+                "CACHE_BACKEND": "memory",
+            },
+        )
+
+    async def wait_ready(self, client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(process.poll() is not None for process in self.processes):
+                raise SystemExit("❌ A stand-in or the backend exited during startup (rerun with --verbose)")
+            try:
+                if (await client.get(f"{self.backend_url}/api/ready")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+        raise SystemExit(f"❌ Backend not ready after {timeout:.0f}s (rerun with --verbose)")
+
+    async def seed_projects(self, client: httpx.AsyncClient, count: int, node_count: int) -> List[str]:
+        rows = [
+            {"id": str(uuid.uuid4()), "name": f"Load test {index + 1}", "diagram_json": sample_diagram(node_count)}
+            for index in range(count)
+        ]
+        response = await client.post(f"{self.postgrest_url}/rest/v1/projects", json=rows)
+        response.raise_for_status()
+        return [row["id"] for row in rows]
+
+    async def stats(self, client: httpx.AsyncClient) -> Dict:
+        gemini = (await client.get(f"{self.gemini_url}/stats")).json()
+        database = (await client.get(f"{self.postgrest_url}/stats")).json()
+        return {"gemini": gemini, "database": database}
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def classify(response: Optional[httpx.Response], error: Optional[Exception]) -> str:
+    """Error breakdown key: status code plus the start of the detail."""
+    if error is not None:
+        return f"transport: {type(error).__name__}"
+    if response.status_code == 200:
+        return "200"
+    try:
+        detail = str(response.json().get("detail", ""))
+    except ValueError:
+        detail = response.text
+    return f"{response.status_code}: {detail[:60]}"
+
+
+async def run_load(
+    url: str, project_ids: List[str], requests: int, concurrency: int, timeout: float
+) -> Tuple[List[Tuple[float, str]], float]:
+    """[(seconds, outcome)] per request and the wall time of the run."""
+    results: List[Tuple[float, str]] = []
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def worker() -> None:
+            for number in counter:
+                payload = {
+                    "projectId": project_ids[number % len(project_ids)],
+                    "message": MESSAGES[number % len(MESSAGES)],
+                }
+                started = time.perf_counter()
+                response, error = None, None
+                try:
+                    response = await client.post(f"{url}/api/chat", json=payload)
+                except httpx.HTTPError as e:
+                    error = e
+                results.append((time.perf_counter() - started, classify(response, error)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results, time.perf_counter() - started
+
+
+def summarize(results: List[Tuple[float, str]], wall_seconds: float) -> Dict:
+    latencies = [seconds * 1000 for seconds, _ in results]
+    ok = [seconds * 1000 for seconds, outcome in results if outcome == "200"]
+    breakdown = Counter(outcome for _, outcome in results)
+    summary = {
+        "requests": len(results),
+        "succeeded": breakdown.get("200", 0),
+        "errorRate": round(1 - breakdown.get("200", 0) / len(results), 4) if results else 0,
+        "durationSeconds": round(wall_seconds, 2),
+        "throughputRps": round(len(results) / wall_seconds, 2) if wall_seconds else 0,
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies), 1),
+            "mean": round(statistics.fmean(latencies), 1),
+        },
+        "errors": {outcome: count for outcome, count in breakdown.most_common() if outcome != "200"},
+    }
+    if ok:
+        summary["successLatencyMs"] = {"p50": round(percentile(ok, 50), 1), "p95": round(percentile(ok, 95), 1)}
+    return summary
+
+
+def print_summary(summary: Dict) -> None:
+    latency = summary["latencyMs"]
+    print(f"\n📊 {summary['requests']} requests in {summary['durationSeconds']}s: "
+          f"{summary['throughputRps']} req/s, {summary['succeeded']} succeeded "
+          f"({summary['errorRate'] * 100:.1f}% errors)")
+    print(f"   latency ms  p50 {latency['p50']:>8}  p95 {latency['p95']:>8}  p99 {latency['p99']:>8}  "
+          f"max {latency['max']:>8}  mean {latency['mean']:>8}")
+    for outcome, count in summary["errors"].items():
+        print(f"   ⚠️  {count:>5} × {outcome}")
+
+
+def compare(summary: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    problems = []
+    base = baseline["results"]
+    p95, base_p95 = summary["latencyMs"]["p95"], base["latencyMs"]["p95"]
+    if p95 > base_p95 * (1 + max_regression):
+        problems.append(f"p95 latency {p95} ms vs baseline {base_p95} ms (+{(p95 / base_p95 - 1) * 100:.0f}%)")
+    rps, base_rps = summary["throughputRps"], base["throughputRps"]
+    if rps < base_rps * (1 - max_regression):
+        problems.append(f"throughput {rps} req/s vs baseline {base_rps} req/s ({(rps / base_rps - 1) * 100:.0f}%)")
+    if summary["errorRate"] > base["errorRate"] + 0.01:
+        problems.append(f"error rate {summary['errorRate']:.2%} vs baseline {base['errorRate']:.2%}")
+    return problems
+
+
+CONFIG_KEYS = (
+    "requests", "concurrency", "projects", "diagram_nodes", "workers",
+    "gemini_latency", "gemini_error_rate", "gemini_rate_limit_rate", "gemini_replies", "gemini_tokens_per_second",
+    "db_latency", "db_error_rate", "seed",
+)
+
+
+async def main_async(args: argparse.Namespace) -> Dict:
+    stack = None
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            if args.target:
+                if not args.project_id:
+                    raise SystemExit("❌ --target needs --project-id (projects that exist in that backend)")
+                url, project_ids = args.target.rstrip("/"), args.project_id
+            else:
+                stack = Stack(args)
+                stack.start()
+                print("🚀 Starting the stand-ins and the backend...")
+                await stack.wait_ready(client)
+                url = stack.backend_url
+                project_ids = await stack.seed_projects(client, args.projects, args.diagram_nodes)
+
+            if args.warmup:
+                await run_load(url, project_ids, args.warmup, args.concurrency, args.timeout)
+            print(f"⏱️  {args.requests} requests, concurrency {args.concurrency}, {len(project_ids)} projects")
+            results, wall_seconds = await run_load(url, project_ids, args.requests, args.concurrency, args.timeout)
+            summary = summarize(results, wall_seconds)
+            if stack:
+                summary["standIns"] = await stack.stats(client)
+            return summary
+    finally:
+        if stack:
+            stack.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent (and not measured) first")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request, seconds")
+    parser.add_argument("--projects", type=int, default=20, help="projects seeded in the PostgREST stand-in")
+    parser.add_argument("--diagram-nodes", type=int, default=40, help="nodes per seeded diagram")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--gemini-latency", default="lognormal:800,0.4")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-replies", default="json=85,fenced=8,prose=4,malformed=3")
+    parser.add_argument("--gemini-tokens-per-second", type=float, default=0)
+    parser.add_argument("--db-latency", default="lognormal:15,0.5")
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the stand-ins")
+    parser.add_argument("--target", help="load an already running backend instead of starting one")
+    parser.add_argument("--project-id", action="append", help="project to chat with (with --target; repeatable)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--compare", action="store_true", help="fail if worse than the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative regression (default: 0.2)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the stand-ins' and backend's stderr")
+    args = parser.parse_args()
+
+    summary = asyncio.run(main_async(args))
+    print_summary(summary)
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    record = {"config": config, "results": summary}
+    if args.output:
+        args.output.write_text(json.dumps(record, indent=2) + "\n")
+    if args.save_baseline:
+        record["recordedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        args.baseline.write_text(json.dumps(record, indent=2) + "\n")
+        print(f"💾 Baseline written to {args.baseline}")
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["config"] != config:
+            changed = sorted(key for key in config if baseline["config"].get(key) != config[key])
+            print(f"⚠️  Options differ from the baseline's ({', '.join(changed)}); the comparison may not mean much")
+        problems = compare(summary, baseline, args.max_regression)
+        if problems:
+            print(f"\n❌ Regressed against {args.baseline.name}:")
+            for problem in problems:
+                print(f"   • {problem}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.max_regression:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+App Import Time
+Measures how long `import app.main` takes in a fresh interpreter (the part of
+a cold start the backend controls) using `python -X importtime`, lists the
+slowest imports, and checks the result against import_time_budget.json:
+
+  • the median import time must stay under the budget, and
+  • SDKs that are meant to load lazily (google.generativeai, supabase,
+    postgrest) must not be imported by app.main at all.
+
+Exits 1 when either check fails, so CI can track it.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--top 15] [--no-check]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+BUDGET_PATH = Path(__file__).parent / "import_time_budget.json"
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure_once() -> list:
+    """[(module, self_us, cumulative_us, depth)] for one `import app.main`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("❌ import app.main failed")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--no-check", action="store_true", help="report only, don't compare with the budget")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    totals_ms = [next(c for m, _, c, _ in run if m == "app.main") / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    # Slowest top-level packages of the median run, by cumulative time
+    median_run = runs[totals_ms.index(sorted(totals_ms)[len(totals_ms) // 2])]
+    print(f"⏱️  import app.main: median {median_ms:.0f} ms over {args.runs} run(s) "
+          f"(min {min(totals_ms):.0f}, max {max(totals_ms):.0f})")
+    print(f"\n{'module':<45} {'cumulative':>12} {'self':>10}")
+    top_level = [entry for entry in median_run if entry[3] <= 1 and not entry[0].startswith("app")]
+    for module, self_us, cumulative_us, _ in sorted(top_level, key=lambda e: -e[2])[:args.top]:
+        print(f"{module:<45} {cumulative_us / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms")
+    app_modules = [entry for entry in median_run if entry[0].startswith("app.")]
+    print(f"\n{'app module':<45} {'cumulative':>12}")
+    for module, _, cumulative_us, _ in sorted(app_modules, key=lambda e: -e[2])[:args.top]:
+        print(f"{module:<45} {cumulative_us / 1000:>9.1f} ms")
+
+    if args.no_check:
+        return 0
+
+    budget = json.loads(BUDGET_PATH.read_text())
+    failures = []
+    if median_ms > budget["max_ms"]:
+        failures.append(f"import app.main took {median_ms:.0f} ms, budget is {budget['max_ms']} ms")
+    imported = {module for module, *_ in median_run}
+    for module in budget["lazy_modules"]:
+        if module in imported:
+            failures.append(f"{module} is imported by app.main but should be imported lazily")
+
+    if failures:
+        print("\n❌ Import-time check failed:")
+        for failure in failures:
+            print(f"   • {failure}")
+        return 1
+    print(f"\n✅ Within budget ({budget['max_ms']} ms) and no eager SDK imports")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+JSON Codec Benchmark
+Compares app/codec.py (orjson when installed) with the standard json module
+on diagram documents the size of our largest projects: parsing a
+diagram_json payload, serializing it for an API response, and rendering it
+into the chat prompt (previously Python's str() of the dict).
+
+Diagrams are generated (a grid of catalog nodes with descriptions and
+attributes, chained by edges); pass --file to measure a real diagram_json
+document instead, e.g. one taken from a project_transfer.py export.
+
+Usage:
+    python benchmarks/json_codec.py [--nodes 500 2000 8000] [--runs 20] [--file diagram.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import codec
+from app.node_catalog import AVAILABLE_NODE_TYPES
+
+
+def sample_diagram(node_count: int) -> dict:
+    """A generated diagram with node_count nodes in a 6-wide grid and an edge chain through them."""
+    nodes = []
+    for index in range(node_count):
+        entry = AVAILABLE_NODE_TYPES[index % len(AVAILABLE_NODE_TYPES)]
+        technology = entry["technologies"]["lightweight"][0]
+        nodes.append({
+            "id": f"{entry['id']}-{index + 1}",
+            "type": entry["id"],
+            "position": {"x": 100.5 + 250 * (index % 6), "y": 100.25 + 250 * (index // 6)},
+            "data": {
+                "name": f"{technology} {entry['label']} {index + 1}",
+                "description": entry["description"],
+                "attributes": {"technology": technology, "replicas": index % 5 + 1, "managed": index % 2 == 0},
+            },
+        })
+    edges = [
+        {
+            "id": f"edge-{index}",
+            "source": nodes[index - 1]["id"],
+            "target": nodes[index]["id"],
+            "type": "default",
+            "label": "calls" if index % 3 else None,
+        }
+        for index in range(1, node_count)
+    ]
+    return {"nodes": nodes, "edges": edges, "viewport": {"x": 0, "y": 0, "zoom": 1}}
+
+
+def median_ms(function, runs: int) -> float:
+    function()  # warm up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def stdlib_response(value) -> bytes:
+    # What starlette's JSONResponse.render does
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def benchmark(name: str, diagram: dict, runs: int) -> None:
+    payload = codec.dumps(diagram)
+    # The codec must round-trip exactly what the json module produces
+    assert codec.loads(payload) == json.loads(payload) == diagram
+    cases = [
+        ("parse", lambda: json.loads(payload), lambda: codec.loads(payload)),
+        ("serialize", lambda: stdlib_response(diagram), lambda: codec.dumps(diagram)),
+        ("prompt render", lambda: str(diagram), lambda: codec.dumps_str(diagram)),
+    ]
+    print(f"\n{name}: {len(payload) / 1e6:.2f} MB, {len(diagram.get('nodes') or [])} nodes")
+    print(f"   {'operation':<15} {'stdlib/str()':>13} {'codec':>10} {'speedup':>9}")
+    for label, baseline, candidate in cases:
+        baseline_ms = median_ms(baseline, runs)
+        candidate_ms = median_ms(candidate, runs)
+        print(f"   {label:<15} {baseline_ms:>10.2f} ms {candidate_ms:>7.2f} ms {baseline_ms / candidate_ms:>8.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--file", help="diagram_json document to measure instead of generated diagrams")
+    args = parser.parse_args()
+
+    backend = "orjson" if codec.HAS_ORJSON else "stdlib json (orjson not installed)"
+    print(f"⏱️  JSON codec: {backend}, median of {args.runs} runs")
+    if args.file:
+        benchmark(args.file, codec.loads(Path(args.file).read_bytes()), args.runs)
+        return
+    for node_count in args.nodes:
+        benchmark("Generated diagram", sample_diagram(node_count), args.runs)
+
+
+if __name__ == "__main__":
+    main()
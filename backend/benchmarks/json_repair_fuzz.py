@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+JSON Repair Fuzzing and Benchmark
+Fuzzes app/json_repair.py with large model-style replies and measures its
+throughput.
+
+Fuzzing: well-formed replies with up to thousands of compact ops are
+corrupted the way model output breaks (trailing commas, raw newlines,
+single quotes, Python literals, code fences and prose, truncation at a random
+offset). Every repaired result must be valid JSON, must never raise, and a
+truncated reply must keep exactly the ops that were complete before the cut.
+
+Benchmark: repair time at increasing reply sizes, to show the pass stays
+linear.
+
+Usage:
+    python benchmarks/json_repair_fuzz.py [--cases 2000] [--seed 1]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.json_repair import repair_json
+
+
+def make_reply(rng: random.Random, op_count: int) -> dict:
+    ops = []
+    for index in range(op_count):
+        kind = rng.choice(["an", "ae", "un", "dn"])
+        if kind == "an":
+            ops.append(f"an|node-{index}|cache|{rng.randint(0, 2000)},{rng.randint(0, 2000)}|Redis Cache {index}|"
+                       f"Caches hot keys for service {index}.|technology=Redis")
+        elif kind == "ae":
+            ops.append(f"ae|node-{rng.randint(0, op_count)}|node-{rng.randint(0, op_count)}")
+        elif kind == "un":
+            ops.append(f"un|node-{index}||Updated description {index}.|")
+        else:
+            ops.append(f"dn|node-{index}")
+    return {"message": f"I've updated {op_count} components of your diagram.", "ops": ops}
+
+
+def corrupt(rng: random.Random, reply: dict):
+    """Return (corrupted text, expected value, truncation offset or None)."""
+    text = json.dumps(reply, indent=rng.choice([None, 2]))
+    mode = rng.choice(["trailing_comma", "newline", "single_quotes", "fence", "literal", "truncate", "truncate"])
+    if mode == "trailing_comma":
+        return text.replace('"]', '",]', 1).replace("]}", "],}", 1), reply, None
+    if mode == "newline":
+        return text.replace("updated", "updated\n", 1), {**reply, "message": reply["message"].replace("updated", "updated\n", 1)}, None
+    if mode == "single_quotes":
+        return text.replace('"', "'"), reply, None
+    if mode == "fence":
+        return f"Sure! Here is the change:\n```json\n{text}\n```\nLet me know if you need anything else.", reply, None
+    if mode == "literal":
+        return text[:-1] + ', "done": True}', {**reply, "done": True}, None
+    cut = rng.randint(1, len(text) - 1)
+    return text, None, cut
+
+
+def check_truncation(full_text: str, cut: int, reply: dict, repaired: dict) -> None:
+    """A truncated reply must keep exactly the ops whose closing quote is before the cut."""
+    complete, position = 0, full_text.find('"ops"')
+    for op in reply["ops"]:
+        position = full_text.find(json.dumps(op), position) + len(json.dumps(op))
+        if position > cut:
+            break
+        complete += 1
+    assert repaired.get("ops", []) == reply["ops"][:complete], "salvaged ops differ from the complete ops"
+
+
+def fuzz(cases: int, seed: int) -> None:
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for case in range(cases):
+        reply = make_reply(rng, rng.choice([1, 5, 50, 500, 3000]))
+        text, expected, cut = corrupt(rng, reply)
+        result = repair_json(text if cut is None else text[:cut])
+        try:
+            value = json.loads(result.text)
+        except ValueError as e:
+            raise AssertionError(f"case {case}: repaired text is not valid JSON ({e}); repairs={result.repairs}")
+        if expected is not None:
+            assert value == expected, f"case {case}: repaired value differs; repairs={result.repairs}"
+        else:
+            check_truncation(text, cut, reply, value)
+    print(f"✅ Fuzzed {cases} corrupted replies in {time.perf_counter() - started:.1f}s, all repaired to valid JSON")
+
+
+def benchmark() -> None:
+    rng = random.Random(0)
+    print(f"\n{'ops':>6} {'size KB':>9} {'repair ms':>10} {'MB/s':>7}")
+    for op_count in (10, 100, 1000, 5000, 20000):
+        text = json.dumps(make_reply(rng, op_count)).replace('"]', '",]', 1)
+        runs = max(1, 2000 // op_count)
+        start = time.perf_counter()
+        for _ in range(runs):
+            repair_json(text)
+        seconds = (time.perf_counter() - start) / runs
+        print(f"{op_count:>6} {len(text) / 1024:>9.1f} {seconds * 1000:>10.2f} {len(text) / seconds / 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    fuzz(args.cases, args.seed)
+    benchmark()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Chat Path Micro-Benchmarks
+Times the CPU-bound steps of a chat request in isolation:
+
+  • prompt      context selection + prompt assembly, as /api/chat does it,
+                for diagrams of 10 to 5,000 nodes
+  • prompt_full prompt assembly with the whole diagram embedded (what a
+                raised CHAT_CONTEXT_NODE_THRESHOLD costs)
+  • parse       parse_model_reply on well-formed, fenced, prose-wrapped and
+                malformed replies with 5 to 500 ops
+  • ops         expanding compact op lines into operation JSON
+
+Each case runs for at least --min-time seconds per repeat; the best of
+--repeat repeats is reported per call.
+
+Baselines: --save-baseline writes micro_baseline.json, --compare fails
+(exit 1) when a case got more than --threshold slower than its baseline.
+Comparisons use each case's time relative to a fixed calibration workload
+timed alongside it, so a baseline recorded on a faster or slower machine
+still compares sensibly; for precise numbers record and compare on the same
+machine.
+
+Usage:
+    python benchmarks/micro.py [--filter parse] [--compare] [--threshold 0.25]
+    python benchmarks/micro.py --save-baseline
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import codec
+from app.context_selector import select_diagram_context
+from app.env import Env
+from app.model_reply import parse_model_reply
+from app.op_dsl import expand_ops
+from app.prompt import build_prompt
+from json_codec import sample_diagram
+
+BASELINE_PATH = Path(__file__).parent / "micro_baseline.json"
+DIAGRAM_SIZES = (10, 100, 1000, 5000)
+OP_COUNTS = (5, 50, 500)
+REPLY_KINDS = ("json", "fenced", "prose", "malformed")
+
+HISTORY = "\n".join(
+    f"{'USER' if index % 2 == 0 else 'ASSISTANT'}: Message {index} about the checkout service and its database."
+    for index in range(20)
+)
+MESSAGE = "Add a cache in front of the Postgres database used by the checkout service"
+
+
+def sample_ops(count: int) -> List[str]:
+    ops = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            ops.append(f"an|cache-{index}|cache|{100 + index},{200 + index}|Redis Cache {index}|"
+                       f"Caches hot keys for service {index}.|technology=Redis;replicas=2")
+        elif kind == 1:
+            ops.append(f"ae|web-server-{index}|cache-{index - 1}")
+        elif kind == 2:
+            ops.append(f"un|database-{index}||Primary database {index}.|technology=PostgreSQL")
+        else:
+            ops.append(f"dn|worker-{index}")
+    return ops
+
+
+def sample_reply(kind: str, op_count: int) -> str:
+    body = json.dumps({"message": f"I've updated {op_count} components of your diagram.", "ops": sample_ops(op_count)},
+                      indent=2)
+    if kind == "fenced":
+        return f"```json\n{body}\n```"
+    if kind == "prose":
+        return f"Sure! Here is the updated design:\n\n{body}\n\nLet me know if you want changes."
+    if kind == "malformed":
+        # Trailing comma and a cut-off reply: the repair path
+        return body.replace('"\n  ]', '",\n  ]', 1)[:-2]
+    return body
+
+
+def chat_prompt(diagram: Dict) -> str:
+    context, _ = select_diagram_context(
+        diagram,
+        MESSAGE,
+        hops=Env.CHAT_CONTEXT_HOPS,
+        node_threshold=Env.CHAT_CONTEXT_NODE_THRESHOLD,
+        max_nodes=Env.CHAT_CONTEXT_MAX_NODES,
+    )
+    return build_prompt(context, "", HISTORY, MESSAGE)
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    suite: Dict[str, Callable[[], object]] = {}
+    for size in DIAGRAM_SIZES:
+        diagram = sample_diagram(size)
+        suite[f"prompt[{size}]"] = lambda diagram=diagram: chat_prompt(diagram)
+        suite[f"prompt_full[{size}]"] = lambda diagram=diagram: build_prompt(diagram, "", HISTORY, MESSAGE)
+    for kind in REPLY_KINDS:
+        for count in OP_COUNTS:
+            reply = sample_reply(kind, count)
+            suite[f"parse/{kind}[{count}]"] = lambda reply=reply: parse_model_reply(reply)
+    for count in OP_COUNTS:
+        ops = sample_ops(count)
+        suite[f"ops/expand[{count}]"] = lambda ops=ops: expand_ops(ops)
+    return suite
+
+
+def calibration() -> None:
+    """Fixed pure-Python work (parsing, dict building, sorting) used as the machine's yardstick."""
+    rows = [{"id": f"node-{index}", "weight": (index * 7919) % 1000, "tags": ["a", "b", str(index)]} for index in range(400)]
+    text = json.dumps(rows)
+    for _ in range(3):
+        decoded = json.loads(text)
+        sorted(decoded, key=lambda row: (row["weight"], row["id"]))
+        "".join(row["id"] for row in decoded).count("node-1")
+
+
+def loops_for(function: Callable[[], object], min_time: float) -> int:
+    """Calls per timing so one timing takes at least min_time."""
+    function()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return loops
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+
+def timed(function: Callable[[], object], loops: int) -> float:
+    # Like timeit: collector pauses land on whichever case happens to trigger them
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return (time.perf_counter() - started) / loops
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(function: Callable[[], object], min_time: float, repeat: int) -> Tuple[float, float]:
+    """(seconds per call, calibration seconds) as the best of repeat timings.
+
+    The calibration workload is timed between the case's timings, so CPU
+    frequency changes and noisy neighbours affect both the same way.
+    """
+    loops = loops_for(function, min_time)
+    calibration_loops = loops_for(calibration, min_time / 4)
+    timings, calibrations = [], []
+    for _ in range(repeat):
+        calibrations.append(timed(calibration, calibration_loops))
+        timings.append(timed(function, loops))
+    return min(timings), min(calibrations)
+
+
+def format_us(seconds: float) -> str:
+    microseconds = seconds * 1e6
+    return f"{microseconds / 1000:.2f} ms" if microseconds >= 1000 else f"{microseconds:.1f} µs"
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, threshold: float) -> List[Tuple[str, float]]:
+    """[(case, relative change)] of the cases slower than the threshold allows."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline["cases"].get(name)
+        if expected is None:
+            continue
+        change = result["relative"] / expected["relative"] - 1
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per repeat (default: 0.05)")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--compare", action="store_true", help="fail if a case regressed against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown per case (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.compare else None
+    print(f"⏱️  JSON codec: {'orjson' if codec.HAS_ORJSON else 'stdlib json'}; best of {args.repeat}, "
+          f"normalized by a calibration workload timed alongside each case")
+
+    results: Dict[str, Dict[str, float]] = {}
+    header = f"\n{'case':<26} {'per call':>11}"
+    print(header + (f" {'baseline':>11} {'change':>8}" if baseline else ""))
+    for name, function in cases().items():
+        if args.filter not in name:
+            continue
+        seconds, calibration_s = measure(function, args.min_time, args.repeat)
+        results[name] = {"seconds": seconds, "relative": seconds / calibration_s}
+        line = f"{name:<26} {format_us(seconds):>11}"
+        expected = baseline["cases"].get(name) if baseline else None
+        if expected:
+            # The baseline's time scaled to this machine's current speed
+            scaled = expected["relative"] * calibration_s
+            change = seconds / scaled - 1
+            mark = " ⚠️" if change > args.threshold else ""
+            line += f" {format_us(scaled):>11} {change * 100:>+7.0f}%{mark}"
+        print(line)
+
+    if args.save_baseline:
+        if args.filter:
+            raise SystemExit("❌ Save baselines from a full run (no --filter)")
+        args.baseline.write_text(json.dumps({
+            "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "orjson": codec.HAS_ORJSON,
+            "cases": results,
+        }, indent=2) + "\n")
+        print(f"\n💾 Baseline written to {args.baseline}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            # A one-off scheduler hiccup shouldn't fail the run: re-measure and
+            # keep the better timing
+            suite = cases()
+            for name, _ in regressions:
+                seconds, calibration_s = measure(suite[name], args.min_time, args.repeat)
+                if seconds / calibration_s < results[name]["relative"]:
+                    results[name] = {"seconds": seconds, "relative": seconds / calibration_s}
+            regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) more than {args.threshold:.0%} slower than the baseline:")
+            for name, change in regressions:
+                print(f"   • {name}: {change * 100:+.0f}%")
+            sys.exit(1)
+        print(f"\n✅ No case more than {args.threshold:.0%} slower than the baseline")
+
+if __name__ == "__main__":
+    main()
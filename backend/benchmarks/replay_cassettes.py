@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Cassette Replay
+Runs recorded Gemini replies (CASSETTE_DIR, see app/cassettes.py) through
+the chat pipeline's post-LLM steps, without calling Gemini: cleanup,
+parse_model_reply (schema validation, local repair, op expansion) and
+save_chat_messages against a throwaway SQLite database standing in for
+Supabase.
+
+Reports the parse-success rate with the repairs that were needed, the time
+per step, throughput, and reply sizes per recording day. With --compare it
+fails (exit 1) when a reply that parsed in the earlier report no longer
+does, the success rate dropped, or throughput fell by more than
+--max-regression.
+
+Usage:
+    python benchmarks/replay_cassettes.py [cassettes/ | replies-20260101.jsonl ...] [--repeat 3]
+    python benchmarks/replay_cassettes.py cassettes/ --output replay.json
+    python benchmarks/replay_cassettes.py cassettes/ --compare replay.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.env import Env
+
+# Persist to a throwaway SQLite file; must be set before the repository is created
+_database = tempfile.TemporaryDirectory(prefix="archie-replay-")
+Env.STORAGE_BACKEND = "sqlite"
+Env.SQLITE_PATH = str(Path(_database.name) / "replay.db")
+
+from app import cassettes
+from app.model_reply import parse_model_reply
+from app.repository import get_repository
+from app.routes.chat import save_chat_messages
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def project_id(cassette: Dict[str, Any]) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"archie-cassette:{cassette.get('project') or 'unknown'}"))
+
+
+def seed_projects(corpus: List[Dict[str, Any]]) -> None:
+    ids = sorted({project_id(cassette) for cassette in corpus})
+    get_repository().upsert_rows("projects", [
+        {"id": id, "name": "Replayed project", "diagram_json": {}, "created_at": None, "updated_at": None}
+        for id in ids
+    ])
+
+
+def replay(corpus: List[Dict[str, Any]], repeat: int, persist: bool) -> Dict[str, Any]:
+    outcomes: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    repairs: Counter = Counter()
+    rejected_ops = 0
+    parse_ms: List[float] = []
+    persist_ms: List[float] = []
+
+    started = time.perf_counter()
+    for round_number in range(repeat):
+        for cassette in corpus:
+            parse_started = time.perf_counter()
+            reply_text = (cassette.get("text") or "").strip()
+            parsed = parse_model_reply(reply_text) if reply_text else None
+            parsed_at = time.perf_counter()
+            parse_ms.append((parsed_at - parse_started) * 1000)
+            if persist and parsed is not None:
+                user_message = "x" * ((cassette.get("prompt") or {}).get("messageChars") or 1)
+                save_chat_messages(project_id(cassette), user_message, parsed.message)
+                persist_ms.append((time.perf_counter() - parsed_at) * 1000)
+            if round_number:
+                continue
+            # The chat route answers an empty reply with a 500
+            method = parsed.method if parsed is not None else "empty"
+            outcomes[cassette["id"]] = method
+            if parsed is None or parsed.method == "failed":
+                errors[cassette["id"]] = parsed.error if parsed is not None else "empty reply"
+            else:
+                rejected_ops += len(parsed.op_errors)
+                for repair in parsed.repairs:
+                    repairs[repair.split(" x")[0]] += 1
+    elapsed = time.perf_counter() - started
+
+    counts = Counter(outcomes.values())
+    succeeded = counts["schema"] + counts["repaired"]
+    return {
+        "cassettes": len(corpus),
+        "repeat": repeat,
+        "outcomes": outcomes,
+        "errors": errors,
+        "counts": dict(counts),
+        "successRate": round(succeeded / len(corpus), 4) if corpus else 0.0,
+        "repairsByKind": dict(repairs.most_common()),
+        "rejectedOps": rejected_ops,
+        "parseMs": {"p50": round(percentile(parse_ms, 0.5), 3), "p95": round(percentile(parse_ms, 0.95), 3)},
+        "persistMs": {"p50": round(percentile(persist_ms, 0.5), 3), "p95": round(percentile(persist_ms, 0.95), 3)},
+        "throughput": round(len(corpus) * repeat / elapsed, 1) if elapsed else 0.0,
+        "parseThroughput": round(len(parse_ms) / (sum(parse_ms) / 1000), 1) if sum(parse_ms) else 0.0,
+    }
+
+
+def size_trends(corpus: List[Dict[str, Any]], outcomes: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Reply size and parse failures per recording day."""
+    days: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for cassette in corpus:
+        days[(cassette.get("recordedAt") or "unknown")[:10]].append(cassette)
+    trends = []
+    for day, recorded in sorted(days.items()):
+        tokens = [cassette["usage"]["outputTokens"] for cassette in recorded
+                  if (cassette.get("usage") or {}).get("outputTokens")]
+        chars = [len(cassette.get("text") or "") for cassette in recorded]
+        trends.append({
+            "day": day,
+            "cassettes": len(recorded),
+            "outputTokensP50": statistics.median(tokens) if tokens else None,
+            "outputTokensP95": percentile(tokens, 0.95) if tokens else None,
+            "charsP50": statistics.median(chars),
+            "truncated": sum(cassette.get("finishReason") == "MAX_TOKENS" for cassette in recorded),
+            "failed": sum(outcomes.get(cassette["id"]) in ("failed", "empty") for cassette in recorded),
+        })
+    return trends
+
+
+def compare(report: Dict[str, Any], previous: Dict[str, Any], max_regression: float) -> List[str]:
+    problems = []
+    newly_failing = [
+        id for id, method in report["outcomes"].items()
+        if method in ("failed", "empty") and previous["outcomes"].get(id) in ("schema", "repaired")
+    ]
+    if newly_failing:
+        problems.append(f"{len(newly_failing)} reply(ies) no longer parse: {', '.join(newly_failing[:10])}")
+    if report["successRate"] < previous["successRate"]:
+        problems.append(f"success rate {previous['successRate']:.2%} → {report['successRate']:.2%}")
+    # The first pass includes warm-up, so throughput only compares at the same --repeat
+    comparable = previous["throughput"] and previous["repeat"] == report["repeat"]
+    if comparable and report["throughput"] < previous["throughput"] * (1 - max_regression):
+        problems.append(f"throughput {previous['throughput']:.0f}/s → {report['throughput']:.0f}/s")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", type=Path, help="cassette files or directories (default: CASSETTE_DIR)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the corpus this many times for timing")
+    parser.add_argument("--no-persist", action="store_true", help="skip saving the messages")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--compare", type=Path, help="an earlier --output report of the same corpus")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed throughput drop (default: 0.25)")
+    args = parser.parse_args()
+
+    paths = args.paths or ([Path(Env.CASSETTE_DIR)] if Env.CASSETTE_DIR else [])
+    if not paths:
+        raise SystemExit("❌ No cassettes: pass files or directories, or set CASSETTE_DIR")
+    corpus = [cassette for cassette in cassettes.load(paths) if cassette.get("id")]
+    if not corpus:
+        raise SystemExit(f"❌ No cassettes found in {', '.join(map(str, paths))}")
+
+    persist = not args.no_persist
+    if persist:
+        seed_projects(corpus)
+    report = replay(corpus, max(1, args.repeat), persist)
+    report["sizeTrends"] = size_trends(corpus, report["outcomes"])
+    report["models"] = dict(Counter(cassette.get("model") or "unknown" for cassette in corpus))
+
+    counts = report["counts"]
+    print(f"📼 {len(corpus)} cassettes, {len(report['models'])} model(s), replayed {report['repeat']}x")
+    print(f"\n🧩 Parsing: {counts.get('schema', 0)} as generated, {counts.get('repaired', 0)} repaired, "
+          f"{counts.get('failed', 0)} failed, {counts.get('empty', 0)} empty → {report['successRate']:.2%} success")
+    if report["repairsByKind"]:
+        print("   Repairs: " + ", ".join(f"{kind} {count}" for kind, count in report["repairsByKind"].items()))
+    if report["rejectedOps"]:
+        print(f"   Rejected ops: {report['rejectedOps']}")
+    for id, error in list(report["errors"].items())[:10]:
+        print(f"   ❌ {id}: {error}")
+
+    print(f"\n⏱️  Parse p50 {report['parseMs']['p50']:.2f} ms, p95 {report['parseMs']['p95']:.2f} ms"
+          + (f"; persist p50 {report['persistMs']['p50']:.2f} ms, p95 {report['persistMs']['p95']:.2f} ms" if persist else ""))
+    print(f"   Throughput: {report['throughput']:.0f} replies/s end to end, {report['parseThroughput']:.0f}/s parsing only")
+
+    print(f"\n📈 {'day':<12} {'replies':>8} {'tokens p50':>11} {'tokens p95':>11} {'chars p50':>10} {'truncated':>10} {'failed':>7}")
+    for day in report["sizeTrends"]:
+        print(f"   {day['day']:<12} {day['cassettes']:>8} {day['outputTokensP50'] or '-':>11} "
+              f"{day['outputTokensP95'] or '-':>11} {day['charsP50']:>10.0f} {day['truncated']:>10} {day['failed']:>7}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n💾 Report written to {args.output}")
+
+    if args.compare:
+        problems = compare(report, json.loads(args.compare.read_text()), args.max_regression)
+        if problems:
+            print(f"\n❌ Regressed against {args.compare}:")
+            for problem in problems:
+                print(f"   • {problem}")
+            sys.exit(1)
+        print(f"\n✅ No regression against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Fast-Path Corpus Evaluation
+Runs every message in corpus/fast_path.json through the local command parser
+and compares the result with the expected operations.
+
+A case with "expect": null must fall through to Gemini. Any wrong answer or
+missed command fails the run (exit code 1), so the corpus can be used as a
+regression check whenever the parser or the node catalog changes.
+
+Usage:
+    python evaluate_fast_path.py [corpus.json] [--min-confidence 0.85]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import from app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.fast_path import FastPathStats, parse_command
+
+
+def evaluate(corpus_path: Path, min_confidence: float) -> int:
+    corpus = json.loads(corpus_path.read_text())
+    diagram = corpus["diagram"]
+    stats = FastPathStats()
+    failures = []
+    elapsed = 0.0
+
+    for case in corpus["cases"]:
+        message, expected = case["message"], case["expect"]
+        start = time.perf_counter()
+        result = parse_command(message, case.get("diagram", diagram))
+        elapsed += time.perf_counter() - start
+        if result is not None and result.confidence < min_confidence:
+            stats.record(None, low_confidence=True)
+            result = None
+        else:
+            stats.record(result)
+
+        actual = None if result is None else {"intent": result.intent, "operations": result.operations}
+        if actual != expected:
+            failures.append((message, expected, actual))
+
+    summary = stats.snapshot()
+    expected_hits = sum(1 for case in corpus["cases"] if case["expect"] is not None)
+    print(f"📊 Cases: {summary['attempts']}  Hits: {summary['hits']}  Expected hits: {expected_hits}")
+    print(f"📊 Hit rate: {summary['hitRate']:.1%}  Low-confidence fall-throughs: {summary['lowConfidence']}")
+    print(f"📊 Hits by intent: {summary['hitsByIntent']}")
+    print(f"⏱️  Mean parse time: {elapsed / max(1, summary['attempts']) * 1e6:.1f} µs")
+
+    if failures:
+        print(f"\n❌ {len(failures)} case(s) failed:")
+        for message, expected, actual in failures:
+            print(f"   • {message!r}")
+            print(f"     expected: {json.dumps(expected)}")
+            print(f"     actual:   {json.dumps(actual)}")
+        return 1
+
+    print("\n✅ All corpus cases passed")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", default=str(Path(__file__).parent / "corpus" / "fast_path.json"))
+    parser.add_argument("--min-confidence", type=float, default=0.85)
+    args = parser.parse_args()
+    sys.exit(evaluate(Path(args.corpus), args.min_confidence))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Query Plan Audit
+Runs EXPLAIN (ANALYZE, BUFFERS) for the database queries the chat path sends
+through PostgREST (project by id, newest history, history pages, the
+summarizer's fold query, the summary lookup and the message insert) and
+prints a latency table. Sequential scans of large tables and explicit sorts
+(the index didn't provide the order) are flagged; the exit code is 1 when
+anything is flagged, so it can gate schema changes.
+
+Everything runs in one transaction that is rolled back at the end, so the
+insert probe and any seeded data leave nothing behind. --seed-projects adds
+synthetic projects and messages first (and ANALYZEs them) to see the plans
+at a given scale; --keep-seed commits them instead, for reuse on a scratch
+database.
+
+Connects like migrate.py: DATABASE_URL, or the Supabase database with
+SUPABASE_DB_PASSWORD.
+
+Usage:
+    python explain_audit.py [--runs 5] [--project-id UUID]
+    python explain_audit.py --seed-projects 10000 --messages-per-project 100
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path to import from app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from migrate import connection_string  # exits with install instructions when psycopg2 is missing
+
+import psycopg2
+
+# Tables this small are read faster with a sequential scan; don't flag them
+DEFAULT_MIN_FLAG_ROWS = 10000
+
+PROBES = [
+    {
+        "name": "chat: project by id",
+        "sql": "select diagram_json from public.projects where id = %(project_id)s",
+    },
+    {
+        "name": "chat: summary by project",
+        "sql": "select summary, summarized_through, message_count from public.chat_summaries "
+               "where project_id = %(project_id)s limit 1",
+        "requires": "public.chat_summaries",
+    },
+    {
+        "name": "chat: newest history",
+        "sql": "select role, content, created_at from public.chat_messages "
+               "where project_id = %(project_id)s order by created_at desc limit 20",
+    },
+    {
+        "name": "history api: newest page",
+        "sql": "select id, created_at, role, content from public.chat_messages "
+               "where project_id = %(project_id)s order by created_at desc, id desc limit 51",
+    },
+    {
+        "name": "history api: older page",
+        "sql": "select id, created_at, role, content from public.chat_messages "
+               "where project_id = %(project_id)s "
+               "and (created_at < %(cursor_created_at)s or (created_at = %(cursor_created_at)s and id < %(cursor_id)s)) "
+               "order by created_at desc, id desc limit 51",
+        "requires_cursor": True,
+    },
+    {
+        "name": "summarizer: fold batch",
+        "sql": "select role, content, created_at from public.chat_messages "
+               "where project_id = %(project_id)s and created_at > %(cursor_created_at)s "
+               "order by created_at limit 200",
+        "requires_cursor": True,
+    },
+    {
+        "name": "chat: save messages",
+        "sql": "insert into public.chat_messages (project_id, role, content) values "
+               "(%(project_id)s, 'user', 'explain audit'), (%(project_id)s, 'assistant', 'explain audit')",
+    },
+]
+
+
+def seed(cursor, project_count: int, messages_per_project: int) -> None:
+    cursor.execute(
+        "select column_name, data_type from information_schema.columns "
+        "where table_schema = 'public' and table_name = 'projects'"
+    )
+    columns = dict(cursor.fetchall())
+    values = {"diagram_json": "jsonb_build_object('nodes', '[]'::jsonb, 'edges', '[]'::jsonb)"}
+    if "name" in columns:
+        values["name"] = "'Explain audit ' || n"
+    if "session_id" in columns:
+        values["session_id"] = f"gen_random_uuid()::{columns['session_id']}"
+    print(f"🌱 Seeding {project_count} projects with {messages_per_project} messages each...")
+    cursor.execute("create temporary table explain_audit_projects (id uuid) on commit drop")
+    cursor.execute(
+        f"with created as (insert into public.projects ({', '.join(values)}) "
+        f"select {', '.join(values.values())} from generate_series(1, %s) as n returning id) "
+        f"insert into explain_audit_projects select id from created",
+        (project_count,),
+    )
+    cursor.execute(
+        "insert into public.chat_messages (project_id, role, content, created_at) "
+        "select p.id, case when m %% 2 = 0 then 'assistant' else 'user' end, "
+        "repeat('Synthetic message for the query plan audit. ', 4), "
+        "now() - make_interval(secs => %s - m) "
+        "from explain_audit_projects p cross join generate_series(1, %s) as m",
+        (messages_per_project, messages_per_project),
+    )
+    cursor.execute("analyze public.projects")
+    cursor.execute("analyze public.chat_messages")
+
+
+def pick_project(cursor) -> Optional[str]:
+    """The project with the most recent message (usually one with a long history)."""
+    cursor.execute("select project_id from public.chat_messages order by created_at desc limit 1")
+    row = cursor.fetchone()
+    if row:
+        return str(row[0])
+    cursor.execute("select id from public.projects limit 1")
+    row = cursor.fetchone()
+    return str(row[0]) if row else None
+
+
+def pick_cursor(cursor, project_id: str) -> Optional[Dict[str, Any]]:
+    """A (created_at, id) position some way into the project's history, as a client would page from."""
+    cursor.execute(
+        "select created_at, id from public.chat_messages where project_id = %s "
+        "order by created_at desc, id desc offset 50 limit 1",
+        (project_id,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(
+            "select created_at, id from public.chat_messages where project_id = %s order by created_at limit 1",
+            (project_id,),
+        )
+        row = cursor.fetchone()
+    return {"cursor_created_at": row[0], "cursor_id": row[1]} if row else None
+
+
+def table_sizes(cursor) -> Dict[str, float]:
+    cursor.execute(
+        "select c.relname, c.reltuples from pg_class c join pg_namespace n on n.oid = c.relnamespace "
+        "where n.nspname = 'public' and c.relkind = 'r'"
+    )
+    return {name: rows for name, rows in cursor.fetchall()}
+
+
+def walk(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def flags_for(plan: Dict[str, Any], sizes: Dict[str, float], min_rows: int) -> List[str]:
+    flags = []
+    for node in walk(plan):
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan":
+            relation = node.get("Relation Name", "?")
+            if sizes.get(relation, 0) >= min_rows:
+                flags.append(f"seq scan on {relation} (~{int(sizes[relation])} rows)")
+        elif node_type in ("Sort", "Incremental Sort"):
+            keys = ", ".join(node.get("Sort Key", []))
+            flags.append(f"{node_type.lower()} on {keys}")
+    return flags
+
+
+def plan_shape(plan: Dict[str, Any]) -> str:
+    parts = []
+    for node in walk(plan):
+        label = node["Node Type"]
+        if node.get("Index Name"):
+            label += f" ({node['Index Name']})"
+        elif node.get("Relation Name"):
+            label += f" ({node['Relation Name']})"
+        parts.append(label)
+    return " > ".join(parts)
+
+
+def explain(cursor, sql: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    cursor.execute("explain (analyze, buffers, format json) " + sql, params)
+    result = cursor.fetchone()[0]
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query (median reported)")
+    parser.add_argument("--project-id", help="project to query (default: the one with the newest message)")
+    parser.add_argument("--seed-projects", type=int, default=0, help="synthetic projects to add first")
+    parser.add_argument("--messages-per-project", type=int, default=50)
+    parser.add_argument("--keep-seed", action="store_true", help="commit the seeded data instead of rolling it back")
+    parser.add_argument("--min-flag-rows", type=int, default=DEFAULT_MIN_FLAG_ROWS,
+                        help="don't flag sequential scans of tables smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    try:
+        conn = psycopg2.connect(connection_string())
+    except psycopg2.OperationalError as e:
+        print(f"❌ Database connection error: {e}")
+        sys.exit(1)
+
+    flagged = 0
+    try:
+        with conn.cursor() as cursor:
+            if args.seed_projects:
+                seed(cursor, args.seed_projects, args.messages_per_project)
+                if args.keep_seed:
+                    conn.commit()
+                    print("   ✓ seeded data committed")
+
+            project_id = args.project_id or pick_project(cursor)
+            if project_id is None:
+                print("❌ No projects to query; use --seed-projects or --project-id")
+                sys.exit(1)
+            params: Dict[str, Any] = {"project_id": project_id}
+            position = pick_cursor(cursor, project_id)
+            if position:
+                params.update(position)
+            sizes = table_sizes(cursor)
+            print(f"🔍 Project {project_id}; chat_messages ~{int(sizes.get('chat_messages', 0))} rows, "
+                  f"projects ~{int(sizes.get('projects', 0))} rows; {args.runs} run(s) per query\n")
+
+            print(f"{'query':<28} {'p50 ms':>9} {'max ms':>9} {'plan ms':>8} {'buffers hit/read':>17}  plan")
+            for probe in PROBES:
+                if probe.get("requires"):
+                    cursor.execute("select to_regclass(%s)", (probe["requires"],))
+                    if cursor.fetchone()[0] is None:
+                        print(f"{probe['name']:<28} {'—':>9}  skipped: {probe['requires']} doesn't exist (run migrate.py)")
+                        continue
+                if probe.get("requires_cursor") and not position:
+                    print(f"{probe['name']:<28} {'—':>9}  skipped: the project has no messages")
+                    continue
+                # Savepoint per run so the insert probe doesn't accumulate rows
+                runs = []
+                for _ in range(args.runs):
+                    cursor.execute("savepoint probe")
+                    runs.append(explain(cursor, probe["sql"], params))
+                    cursor.execute("rollback to savepoint probe")
+                times = [run["Execution Time"] for run in runs]
+                last = runs[-1]
+                plan = last["Plan"]
+                hit = plan.get("Shared Hit Blocks", 0)
+                read = plan.get("Shared Read Blocks", 0)
+                flags = flags_for(plan, sizes, args.min_flag_rows)
+                flagged += bool(flags)
+                print(f"{probe['name']:<28} {statistics.median(times):>9.3f} {max(times):>9.3f} "
+                      f"{last['Planning Time']:>8.3f} {f'{hit}/{read}':>17}  {plan_shape(plan)}")
+                for flag in flags:
+                    print(f"{'':<28} ⚠️  {flag}")
+                if args.verbose:
+                    print(json.dumps(plan, indent=2))
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if flagged:
+        print(f"\n❌ {flagged} quer{'y' if flagged == 1 else 'ies'} flagged: add or fix an index (see migrations/)")
+        sys.exit(1)
+    print("\n✅ All queries use indexes for filtering and ordering")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Gemini API Stand-In
+A local HTTP server answering the Gemini REST endpoints the backend uses
+(list models, get model, generateContent, streamGenerateContent) with canned
+chat replies, so /api/chat can be load-tested without spending quota. Point
+the backend at it with GEMINI_API_ENDPOINT.
+
+Replies are drawn from a weighted mix of kinds that exercise the reply
+parser: clean JSON, JSON in a markdown fence, JSON wrapped in prose, and
+malformed JSON (trailing commas, cut off mid-object). Latency follows the
+--latency distribution plus output tokens / --tokens-per-second, like real
+decoding (streamed replies arrive in chunks at that rate, and streams the
+client closes early are counted as "cancelled" in /stats); --rate-limit-rate
+and --error-rate inject 429 RESOURCE_EXHAUSTED and 500 INTERNAL responses.
+
+Usage:
+    python fakes/fake_gemini.py [--port 8601] [--latency lognormal:800,0.4] [--replies json=85,fenced=8,prose=4,malformed=3]
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8601 GOOGLE_GEMINI_API_KEY=fake uvicorn app.main:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from faults import add_arguments, from_arguments
+
+MODELS = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-flash-lite"]
+NODE_TYPES = ["web-server", "database", "cache", "queue", "worker", "load-balancer", "storage", "api-gateway"]
+REPLY_KINDS = ("json", "fenced", "prose", "malformed")
+# Characters of reply text per streamed chunk (~20 tokens)
+CHUNK_CHARS = 80
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """"json=85,fenced=8,..." -> [(kind, weight)]."""
+    mix = []
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in REPLY_KINDS:
+            raise argparse.ArgumentTypeError(f"unknown reply kind {kind!r} (one of {', '.join(REPLY_KINDS)})")
+        mix.append((kind.strip(), float(weight or 1)))
+    return mix
+
+
+def model_resource(name: str) -> Dict:
+    return {
+        "name": f"models/{name}",
+        "baseModelId": name,
+        "version": "001",
+        "displayName": name,
+        "description": "Local stand-in",
+        "inputTokenLimit": 1048576,
+        "outputTokenLimit": 65536,
+        "supportedGenerationMethods": ["generateContent", "countTokens"],
+        "temperature": 1.0,
+        "maxTemperature": 2.0,
+        "topP": 0.95,
+        "topK": 64,
+    }
+
+
+class FakeGemini:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency, self.faults, self.rng = from_arguments(args)
+        self.mix = args.replies
+        self.ops_per_reply = args.ops_per_reply
+        self.tokens_per_second = args.tokens_per_second
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            return self.counts[key]
+
+    def reply_text(self, number: int) -> Tuple[str, str]:
+        """(kind, response.text) of a canned reply."""
+        with self._lock:
+            kind = self.rng.choices([kind for kind, _ in self.mix], [weight for _, weight in self.mix])[0]
+            node_types = [self.rng.choice(NODE_TYPES) for _ in range(self.ops_per_reply)]
+        ops = []
+        for index, node_type in enumerate(node_types):
+            node_id = f"{node_type}-{number}-{index + 1}"
+            ops.append(f"an|{node_id}|{node_type}||{node_type.replace('-', ' ').title()} {number}.{index + 1}|"
+                       f"Added by the load test|technology=stand-in;replicas={index % 3 + 1}")
+            if index:
+                ops.append(f"ae|{node_types[index - 1]}-{number}-{index}|{node_id}")
+        message = f"I've added {len(node_types)} components and connected them in a chain."
+        body = json.dumps({"message": message, "ops": ops}, indent=2)
+        if kind == "fenced":
+            return kind, f"```json\n{body}\n```"
+        if kind == "prose":
+            return kind, f"Sure! Here is the updated design:\n\n{body}\n\nLet me know if you want changes."
+        if kind == "malformed":
+            if number % 2:
+                return kind, body.replace('"\n  ]', '",\n  ]', 1) + ","  # trailing commas
+            return kind, body[: len(body) * 2 // 3]  # cut off mid-reply
+        return kind, body
+
+    def generate(self, request: Dict, stream: bool = False) -> Tuple[int, Any]:
+        """(status, body); with stream, a successful body is an iterator of (pause, chunk)."""
+        number = self.count("streamGenerateContent" if stream else "generateContent")
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        fault = self.faults.pick()
+        delay = self.latency.sample()
+        if fault == "rate_limited":
+            time.sleep(min(delay, 0.05))
+            self.count("rate_limited")
+            return 429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED",
+            }}
+        if fault == "error":
+            time.sleep(delay)
+            self.count("error")
+            return 500, {"error": {"code": 500, "message": "Internal error encountered.", "status": "INTERNAL"}}
+
+        kind, text = self.reply_text(number)
+        self.count(kind)
+        # ~4 characters per token, like the real tokenizer on English and JSON
+        prompt_tokens = max(1, len(prompt) // 4)
+        output_tokens = max(1, len(text) // 4)
+        usage = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+        if stream:
+            return 200, self.chunks(text, usage, delay)
+        if self.tokens_per_second:
+            delay += output_tokens / self.tokens_per_second
+        time.sleep(delay)
+        return 200, self.response(text, usage)
+
+    @staticmethod
+    def response(text: str, usage: Optional[Dict] = None) -> Dict:
+        body = {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}],
+            "modelVersion": MODELS[0],
+        }
+        if usage is not None:
+            # Only the last chunk of a stream says why it ended and what it cost
+            body["candidates"][0]["finishReason"] = "STOP"
+            body["usageMetadata"] = usage
+        return body
+
+    def chunks(self, text: str, usage: Dict, first_token_delay: float) -> Iterator[Tuple[float, Dict]]:
+        pieces = [text[start:start + CHUNK_CHARS] for start in range(0, len(text), CHUNK_CHARS)] or [""]
+        for index, piece in enumerate(pieces):
+            pause = first_token_delay if index == 0 else 0.0
+            if self.tokens_per_second:
+                pause += len(piece) / 4 / self.tokens_per_second
+            yield pause, self.response(piece, usage if index == len(pieces) - 1 else None)
+
+
+def make_handler(fake: FakeGemini):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def send_json(self, status: int, body: Dict) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            path = self.path.split("?")[0]
+            if path.endswith("/models"):
+                self.send_json(200, {"models": [model_resource(name) for name in MODELS]})
+            elif path.startswith(("/v1beta/models/", "/v1/models/")):
+                name = path.rsplit("/", 1)[1]
+                if name in MODELS:
+                    self.send_json(200, model_resource(name))
+                else:
+                    self.send_json(404, {"error": {"code": 404, "message": f"models/{name} is not found", "status": "NOT_FOUND"}})
+            elif path == "/stats":
+                self.send_json(200, dict(fake.counts))
+            else:
+                self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        def send_stream(self, chunks: Iterator[Tuple[float, Dict]]) -> None:
+            # A JSON array written element by element, as the REST API streams
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for index, (pause, chunk) in enumerate(chunks):
+                    time.sleep(pause)
+                    self.write_chunk(("[" if index == 0 else ",\r\n") + json.dumps(chunk))
+                self.write_chunk("]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                fake.count("cancelled")
+                self.close_connection = True
+
+        def write_chunk(self, text: str) -> None:
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            path = self.path.split("?")[0]
+            if path.endswith(":generateContent"):
+                self.send_json(*fake.generate(request))
+            elif path.endswith(":streamGenerateContent"):
+                status, body = fake.generate(request, stream=True)
+                if status == 200:
+                    self.send_stream(body)
+                else:
+                    self.send_json(status, body)
+            else:
+                self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8601)
+    add_arguments(parser, default_latency="lognormal:800,0.4")
+    parser.add_argument("--replies", type=parse_mix, default=parse_mix("json=85,fenced=8,prose=4,malformed=3"),
+                        help="weighted mix of reply kinds: json, fenced, prose, malformed")
+    parser.add_argument("--ops-per-reply", type=int, default=3, help="nodes added per canned reply")
+    parser.add_argument("--tokens-per-second", type=float, default=0,
+                        help="decode rate added to the latency (0: latency only)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakeGemini(args)))
+    server.daemon_threads = True
+    print(f"🧪 Gemini stand-in listening on http://{args.host}:{args.port} (latency {args.latency})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Supabase / PostgREST Stand-In
+A local in-memory server answering the PostgREST requests the backend sends
+to Supabase (/rest/v1/<table>), so /api/chat can be load-tested without a
+database. Point SUPABASE_URL at it; any JWT-shaped key is accepted.
+
+Supported: select with column lists; eq, neq, gt, gte, lt, lte and in
+filters; or=(...) with nested and(...); order on several columns; limit and
+offset; single-object responses; insert and upsert (Prefer:
+resolution=merge-duplicates, on_conflict) with return=representation. Rows
+get an id and a created_at (fixed-width ISO timestamps, so they compare as
+strings) when none is given. Tables are created on first use.
+
+Latency and fault injection work as in fake_gemini.py (fakes/faults.py).
+Projects can be seeded with a plain POST /rest/v1/projects.
+
+Usage:
+    python fakes/fake_postgrest.py [--port 8602] [--latency lognormal:15,0.5] [--error-rate 0.01]
+    SUPABASE_URL=http://127.0.0.1:8602 SUPABASE_SERVICE_ROLE_KEY=fake.service.key uvicorn app.main:app
+"""
+
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from faults import add_arguments, from_arguments
+
+# Query parameters that aren't column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda value, operand: value == operand,
+    "neq": lambda value, operand: value != operand,
+    "gt": lambda value, operand: value is not None and value > operand,
+    "gte": lambda value, operand: value is not None and value >= operand,
+    "lt": lambda value, operand: value is not None and value < operand,
+    "lte": lambda value, operand: value is not None and value <= operand,
+}
+# Primary key per table, for upserts without on_conflict
+PRIMARY_KEYS = {"chat_summaries": "project_id"}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split at commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _as_stored(value: Any) -> Any:
+    return str(value) if value is not None and not isinstance(value, str) else value
+
+
+def parse_condition(column: str, expression: str) -> Callable[[Dict], bool]:
+    """A row predicate for column=<op>.<value> (not.<op> negates)."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, operand = expression.partition(".")
+    if op == "in":
+        values = {_unquote(value) for value in _split_top_level(operand.strip("()"))}
+        test = lambda row: _as_stored(row.get(column)) in values
+    elif op == "is":
+        expected = None if operand == "null" else operand == "true"
+        test = lambda row: row.get(column) is expected
+    elif op in OPERATORS:
+        compare, operand = OPERATORS[op], _unquote(operand)
+        test = lambda row: compare(_as_stored(row.get(column)), operand)
+    else:
+        raise QueryError(f"unsupported operator {op!r}")
+    return (lambda row: not test(row)) if negate else test
+
+
+def parse_logic(expression: str, any_of: bool) -> Callable[[Dict], bool]:
+    """or=(a.op.v,and(b.op.v,c.op.v)) style expressions."""
+    predicates = []
+    for part in _split_top_level(expression.strip()[1:-1]):
+        part = part.strip()
+        if part.startswith(("and(", "or(")):
+            name, _, rest = part.partition("(")
+            predicates.append(parse_logic("(" + rest, any_of=name == "or"))
+        else:
+            column, _, rest = part.partition(".")
+            predicates.append(parse_condition(column, rest))
+    if any_of:
+        return lambda row: any(predicate(row) for predicate in predicates)
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+def _sort(rows: List[Dict], order: str) -> List[Dict]:
+    # Stable sorts from the last key to the first give a multi-column order
+    for item in reversed([part for part in order.split(",") if part]):
+        column, *modifiers = item.split(".")
+        descending = "desc" in modifiers
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        # PostgreSQL's default: nulls last ascending, first descending
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+class Store:
+    def __init__(self) -> None:
+        self.tables: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def select(self, table: str, params: List[Tuple[str, str]]) -> List[Dict]:
+        options = {key: value for key, value in params if key in RESERVED_PARAMS}
+        predicates = []
+        for key, value in params:
+            if key in ("or", "and"):
+                predicates.append(parse_logic(value, any_of=key == "or"))
+            elif key not in RESERVED_PARAMS:
+                predicates.append(parse_condition(key, value))
+        with self._lock:
+            rows = [row for row in self.tables.get(table, []) if all(predicate(row) for predicate in predicates)]
+        if options.get("order"):
+            rows = _sort(rows, options["order"])
+        offset = int(options.get("offset", 0))
+        rows = rows[offset:offset + int(options["limit"])] if "limit" in options else rows[offset:]
+        columns = [column.strip() for column in options.get("select", "*").split(",") if column.strip()]
+        if columns and "*" not in columns:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return [dict(row) for row in rows]
+
+    def insert(self, table: str, rows: List[Dict], upsert_on: Optional[str]) -> List[Dict]:
+        saved = []
+        with self._lock:
+            stored = self.tables.setdefault(table, [])
+            for row in rows:
+                row = dict(row)
+                if table not in PRIMARY_KEYS:
+                    row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", _now())
+                existing = None
+                if upsert_on:
+                    existing = next((other for other in stored if other.get(upsert_on) == row.get(upsert_on)), None)
+                elif "id" in row and any(other.get("id") == row["id"] for other in stored):
+                    raise QueryError(f'duplicate key value violates unique constraint "{table}_pkey"')
+                if existing is not None:
+                    existing.update(row)
+                    saved.append(dict(existing))
+                else:
+                    stored.append(row)
+                    saved.append(dict(row))
+        return saved
+
+
+class FakePostgrest:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency, self.faults, _ = from_arguments(args)
+        self.store = Store()
+        self.requests = itertools.count(1)
+        self.handled = 0
+
+    def handle(self, method: str, path: str, params: List[Tuple[str, str]], headers, body: bytes) -> Tuple[int, Any]:
+        self.handled = next(self.requests)
+        match = re.fullmatch(r"/rest/v1/(\w+)", path)
+        if not match:
+            return 404, {"code": "PGRST125", "message": f"Invalid path specified in request URL: {path}"}
+        fault = self.faults.pick()
+        time.sleep(self.latency.sample())
+        if fault == "rate_limited":
+            return 429, {"message": "Too many requests"}
+        if fault == "error":
+            return 500, {"code": "XX000", "message": "injected failure", "details": None, "hint": None}
+
+        table = match.group(1)
+        try:
+            if method == "GET":
+                rows = self.store.select(table, params)
+            elif method == "POST":
+                data = json.loads(body or b"[]")
+                prefer = headers.get("Prefer", "")
+                upsert_on = None
+                if "resolution=merge-duplicates" in prefer:
+                    upsert_on = dict(params).get("on_conflict") or PRIMARY_KEYS.get(table, "id")
+                rows = self.store.insert(table, data if isinstance(data, list) else [data], upsert_on)
+                if "return=representation" not in prefer:
+                    return 201, None
+                status = 201
+            else:
+                return 405, {"message": f"{method} is not supported by the stand-in"}
+        except QueryError as e:
+            return 400, {"code": "PGRST100", "message": str(e), "details": None, "hint": None}
+
+        if "application/vnd.pgrst.object+json" in headers.get("Accept", ""):
+            if len(rows) != 1:
+                return 406, {
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }
+            return (201 if method == "POST" else 200), rows[0]
+        return (201 if method == "POST" else 200), rows
+
+
+def make_handler(fake: FakePostgrest):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def respond(self, method: str) -> None:
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if url.path == "/stats":
+                status, payload = 200, {
+                    "requests": fake.handled,
+                    "rows": {table: len(rows) for table, rows in fake.store.tables.items()},
+                }
+            else:
+                status, payload = fake.handle(method, url.path, parse_qsl(url.query), self.headers, body)
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            self.respond("GET")
+
+        def do_POST(self) -> None:
+            self.respond("POST")
+
+        def do_PATCH(self) -> None:
+            self.respond("PATCH")
+
+        def do_DELETE(self) -> None:
+            self.respond("DELETE")
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8602)
+    add_arguments(parser, default_latency="lognormal:15,0.5")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakePostgrest(args)))
+    server.daemon_threads = True
+    print(f"🧪 PostgREST stand-in listening on http://{args.host}:{args.port} (latency {args.latency})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Latency distributions and fault injection shared by the HTTP stand-ins
+(fake_gemini.py, fake_postgrest.py).
+
+Latency specs, all in milliseconds:
+
+    0                   no delay
+    fixed:50            always 50 ms
+    uniform:20-80       uniformly between 20 and 80 ms
+    normal:100,20       mean 100, standard deviation 20 (never negative)
+    lognormal:800,0.5   median 800, sigma 0.5: a long right tail, like real APIs
+    exp:200             exponential with mean 200
+"""
+
+import argparse
+import math
+import random
+import threading
+from typing import Callable, Optional
+
+
+class Latency:
+    def __init__(self, spec: str, rng: Optional[random.Random] = None) -> None:
+        self.spec = spec
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._sample = self._parse(spec)
+
+    def _parse(self, spec: str) -> Callable[[], float]:
+        kind, _, args = spec.strip().partition(":")
+        try:
+            if kind in ("", "0", "none"):
+                return lambda: 0.0
+            if kind == "fixed":
+                value = float(args)
+                return lambda: value
+            if kind == "uniform":
+                low, high = (float(part) for part in args.split("-"))
+                return lambda: self.rng.uniform(low, high)
+            if kind == "normal":
+                mean, deviation = (float(part) for part in args.split(","))
+                return lambda: max(0.0, self.rng.gauss(mean, deviation))
+            if kind == "lognormal":
+                median, sigma = (float(part) for part in args.split(","))
+                return lambda: self.rng.lognormvariate(math.log(median), sigma)
+            if kind == "exp":
+                mean = float(args)
+                return lambda: self.rng.expovariate(1.0 / mean)
+        except ValueError:
+            pass
+        raise ValueError(f"Invalid latency spec: {spec!r} (e.g. fixed:50, uniform:20-80, lognormal:800,0.5)")
+
+    def sample(self) -> float:
+        """Seconds to wait."""
+        with self._lock:  # random.Random isn't safe to share between threads
+            return self._sample() / 1000.0
+
+
+class Faults:
+    """Decides per request whether to answer with an injected error or a 429."""
+
+    def __init__(self, error_rate: float = 0.0, rate_limit_rate: float = 0.0, rng: Optional[random.Random] = None) -> None:
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def pick(self) -> Optional[str]:
+        """"error", "rate_limited" or None."""
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return None
+
+
+def add_arguments(parser: argparse.ArgumentParser, default_latency: str) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", default=default_latency, help="latency per request (see fakes/faults.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--seed", type=int, help="random seed, for reproducible runs")
+
+
+def from_arguments(args: argparse.Namespace):
+    """(Latency, Faults, rng) for parsed add_arguments() options; each gets its own generator."""
+    def rng(offset: int) -> random.Random:
+        return random.Random(None if args.seed is None else args.seed + offset)
+    return Latency(args.latency, rng(0)), Faults(args.error_rate, args.rate_limit_rate, rng(1)), rng(2)
@@ -0,0 +1,15 @@
+-- Rolling per-project summary of older chat messages (backend/app/history_summary.py).
+-- Messages created up to summarized_through are represented by the summary
+-- and no longer sent to the model verbatim.
+create table if not exists public.chat_summaries (
+    project_id uuid primary key references public.projects(id) on delete cascade,
+    summary text not null,
+    summarized_through timestamptz not null,
+    message_count integer not null default 0,
+    method text not null,
+    updated_at timestamptz not null default now()
+);
+
+-- Written and read only by the backend with the service role key, which
+-- bypasses RLS; with RLS on and no policies, anon/authenticated get nothing
+alter table public.chat_summaries enable row level security;
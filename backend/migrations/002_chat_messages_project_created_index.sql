@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Chat history reads (the prompt's newest messages, the paginated history
+-- API, the summarizer) all filter on project_id and order by created_at, id.
+-- Built CONCURRENTLY so writes to chat_messages aren't blocked meanwhile.
+
+-- A failed concurrent build leaves an INVALID index behind; drop it so a rerun builds it again
+drop index concurrently if exists public.chat_messages_project_created_idx;
+
+create index concurrently chat_messages_project_created_idx
+    on public.chat_messages (project_id, created_at, id);
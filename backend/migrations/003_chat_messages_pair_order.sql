@@ -0,0 +1,32 @@
+-- A chat request used to save the user's message and the reply with one
+-- shared created_at, so ordering by (created_at, id) (the history API's
+-- cursor, the prompt's history) put the reply first about half the time.
+-- The backend now saves them 1 µs apart; this does the same for existing
+-- pairs by moving each such reply 1 µs later.
+
+-- Summaries folded through a pair's shared timestamp cover the reply too:
+-- move their watermark along with it
+update public.chat_summaries as summary
+set summarized_through = summary.summarized_through + interval '1 microsecond'
+where exists (
+    select 1
+    from public.chat_messages as message
+    join public.chat_messages as reply
+        on reply.project_id = message.project_id
+        and reply.created_at = message.created_at
+        and reply.role = 'assistant'
+    where message.project_id = summary.project_id
+        and message.created_at = summary.summarized_through
+        and message.role = 'user'
+);
+
+update public.chat_messages as reply
+set created_at = reply.created_at + interval '1 microsecond'
+where reply.role = 'assistant'
+    and exists (
+        select 1
+        from public.chat_messages as message
+        where message.project_id = reply.project_id
+            and message.created_at = reply.created_at
+            and message.role = 'user'
+    );
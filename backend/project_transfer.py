@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Project Export / Import
+Streams projects and their chat messages between Supabase and an NDJSON file,
+for backups and for moving projects between Supabase instances. Import
+writes to the configured storage backend, so with STORAGE_BACKEND=sqlite an
+export seeds a self-hosted SQLite database.
+
+The file holds one JSON object per line:
+
+    {"type": "meta", "version": 1, "exportedAt": "..."}
+    {"type": "project", "data": {...projects row...}}
+    {"type": "message", "data": {...chat_messages row...}}
+
+Export walks `projects` in pages ordered by id (keyset pagination: each page
+starts after the last id of the previous one, so deep pages are as cheap as
+the first) and after each page writes that page's projects followed by their
+messages, also fetched by keyset. Memory use is bounded by the page size, not
+the number of projects.
+
+Import reads the file line by line and upserts rows in batches (by id, so
+importing twice is harmless). After every batch it records the last line
+written in <file>.cursor; with --resume an interrupted import continues
+from there.
+
+Files ending in .gz are compressed/decompressed transparently; "-" means
+stdout/stdin.
+
+Usage:
+    python project_transfer.py export projects.ndjson.gz [--page-size 200] [--after <project id>]
+    python project_transfer.py import projects.ndjson.gz [--batch-size 500] [--resume]
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional
+
+# Add parent directory to path to import from app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import codec
+from app.env import Env
+from app.repository import get_repository
+from app.supabase_client import get_supabase
+
+FORMAT_VERSION = 1
+MESSAGE_PAGE_SIZE = 1000
+
+
+def open_output(path: str) -> IO[str]:
+    if path == "-":
+        return sys.stdout
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "wb", compresslevel=6), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def open_input(path: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+# Export
+
+def project_pages(client, page_size: int, after: Optional[str]) -> Iterator[List[Dict]]:
+    """Pages of project rows ordered by id, starting after the given id."""
+    last_id = after
+    while True:
+        query = client.table("projects").select("*").order("id").limit(page_size)
+        if last_id:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def message_rows(client, project_ids: List[str]) -> Iterator[Dict]:
+    """All chat messages of the given projects, in keyset pages ordered by id."""
+    last_id = None
+    while True:
+        query = (
+            client.table("chat_messages")
+            .select("*")
+            .in_("project_id", project_ids)
+            .order("id")
+            .limit(MESSAGE_PAGE_SIZE)
+        )
+        if last_id:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        yield from rows
+        if len(rows) < MESSAGE_PAGE_SIZE:
+            return
+        last_id = rows[-1]["id"]
+
+
+def write_line(out: IO[str], record: Dict) -> None:
+    out.write(codec.dumps_str(record))
+    out.write("\n")
+
+
+def export(client, path: str, page_size: int, after: Optional[str]) -> None:
+    started = time.monotonic()
+    projects = messages = 0
+    out = open_output(path)
+    try:
+        write_line(out, {
+            "type": "meta",
+            "version": FORMAT_VERSION,
+            "exportedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        })
+        for page in project_pages(client, page_size, after):
+            for row in page:
+                write_line(out, {"type": "project", "data": row})
+            for row in message_rows(client, [row["id"] for row in page]):
+                write_line(out, {"type": "message", "data": row})
+                messages += 1
+            projects += len(page)
+            # Progress goes to stderr so exporting to stdout stays clean
+            print(f"   … {projects} projects, {messages} messages (last id {page[-1]['id']})", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ Exported {projects} projects and {messages} messages in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+
+# Import
+
+TABLES = {"project": "projects", "message": "chat_messages"}
+
+
+def cursor_path(path: str) -> Path:
+    return Path(f"{path}.cursor")
+
+
+def read_cursor(path: str) -> int:
+    try:
+        return json.loads(cursor_path(path).read_text())["line"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def write_cursor(path: str, line: int) -> None:
+    target = cursor_path(path)
+    temporary = target.with_name(target.name + ".tmp")
+    temporary.write_text(json.dumps({"line": line}))
+    os.replace(temporary, target)
+
+
+def import_file(repository, path: str, batch_size: int, resume: bool) -> None:
+    started = time.monotonic()
+    use_cursor = path != "-"
+    skip_through = read_cursor(path) if resume and use_cursor else 0
+    if skip_through:
+        print(f"⏩ Resuming after line {skip_through}", file=sys.stderr)
+
+    counts = {"project": 0, "message": 0}
+    batch: List[Dict] = []
+    batch_type = None
+    line_number = 0
+    batched_through = 0  # last line whose row is in the batch
+
+    def flush() -> None:
+        if not batch:
+            return
+        repository.upsert_rows(TABLES[batch_type], batch)
+        counts[batch_type] += len(batch)
+        batch.clear()
+        if use_cursor:
+            write_cursor(path, batched_through)
+        print(f"   … {counts['project']} projects, {counts['message']} messages (through line {batched_through})",
+              file=sys.stderr)
+
+    source = open_input(path)
+    try:
+        for line_number, line in enumerate(source, start=1):
+            if line_number <= skip_through or not line.strip():
+                continue
+            record = codec.loads(line)
+            kind = record.get("type")
+            if kind == "meta":
+                if record.get("version") != FORMAT_VERSION:
+                    raise SystemExit(f"❌ Unsupported export format version: {record.get('version')}")
+                continue
+            if kind not in TABLES:
+                raise SystemExit(f"❌ Line {line_number}: unknown record type {kind!r}")
+            # Messages reference projects: write the pending batch before switching tables
+            if kind != batch_type:
+                flush()
+                batch_type = kind
+            batch.append(record["data"])
+            batched_through = line_number
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        print(f"❌ Import stopped at line {line_number}; rerun with --resume to continue", file=sys.stderr)
+        raise
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    if use_cursor:
+        cursor_path(path).unlink(missing_ok=True)
+    print(f"✅ Imported {counts['project']} projects and {counts['message']} messages "
+          f"in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write projects and chat messages to an NDJSON file")
+    export_parser.add_argument("path", help="output file (.gz to compress, - for stdout)")
+    export_parser.add_argument("--page-size", type=int, default=200, help="projects fetched per query")
+    export_parser.add_argument("--after", help="only export projects with an id after this one")
+
+    import_parser = commands.add_parser("import", help="upsert projects and chat messages from an NDJSON file")
+    import_parser.add_argument("path", help="input file (.gz if compressed, - for stdin)")
+    import_parser.add_argument("--batch-size", type=int, default=500, help="rows per upsert")
+    import_parser.add_argument("--resume", action="store_true", help="continue after the line recorded in <path>.cursor")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        client = get_supabase()
+        if client is None:
+            print("❌ Error: Supabase is not configured")
+            print("   Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in backend/.env")
+            sys.exit(1)
+        export(client, args.path, args.page_size, args.after)
+    else:
+        repository = get_repository()
+        if repository is None:
+            print("❌ Error: Supabase is not configured")
+            print("   Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in backend/.env, or STORAGE_BACKEND=sqlite")
+            sys.exit(1)
+        print(f"📥 Importing into {repository.name}"
+              + (f" ({Env.SQLITE_PATH})" if repository.name == "sqlite" else ""), file=sys.stderr)
+        import_file(repository, args.path, args.batch_size, args.resume)
+
+
+if __name__ == "__main__":
+    main()
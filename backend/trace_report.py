@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Trace Report
+Prints the request traces written by TRACING_EXPORTER=jsonl as a waterfall
+of stage spans, so slow conversations can be debugged without a collector.
+
+Usage:
+    python trace_report.py [traces.jsonl] [--trace TRACE_ID] [--last 10] [--slowest]
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BAR_WIDTH = 40
+
+
+def _attribute_value(value: dict):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    return None
+
+
+def load_traces(path: Path) -> dict:
+    traces = defaultdict(list)
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            span["start"] = int(span["startTimeUnixNano"])
+            span["end"] = int(span["endTimeUnixNano"])
+            span["attrs"] = {a["key"]: _attribute_value(a["value"]) for a in span.get("attributes", [])}
+            traces[span["traceId"]].append(span)
+    return traces
+
+
+def print_trace(trace_id: str, spans: list) -> None:
+    spans = sorted(spans, key=lambda span: (span["start"], span.get("parentSpanId", "") != ""))
+    start = min(span["start"] for span in spans)
+    total = max(span["end"] for span in spans) - start or 1
+    root = next((span for span in spans if span.get("kind") == 2), spans[0])
+    status = "❌" if root.get("status", {}).get("code") == 2 else "✅"
+    print(f"\n{status} {root['name']}  trace {trace_id}  {total / 1e6:.1f} ms")
+    for key, value in sorted(root["attrs"].items()):
+        print(f"   {key} = {value}")
+    for span in spans:
+        if span is root:
+            continue
+        offset = int((span["start"] - start) / total * BAR_WIDTH)
+        width = max(1, int((span["end"] - span["start"]) / total * BAR_WIDTH))
+        bar = " " * offset + "█" * min(width, BAR_WIDTH - offset)
+        attrs = ", ".join(f"{k}={v}" for k, v in span["attrs"].items())
+        print(f"   {span['name']:<22} {(span['end'] - span['start']) / 1e6:>9.1f} ms |{bar:<{BAR_WIDTH}}| {attrs}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="traces.jsonl")
+    parser.add_argument("--trace", help="only show this trace ID")
+    parser.add_argument("--last", type=int, default=10, help="number of traces to show (default: 10)")
+    parser.add_argument("--slowest", action="store_true", help="show the slowest traces instead of the latest")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"❌ {path} not found. Run the backend with TRACING_EXPORTER=jsonl first.")
+        return 1
+    traces = load_traces(path)
+    if args.trace:
+        if args.trace not in traces:
+            print(f"❌ Trace {args.trace} not found in {path}")
+            return 1
+        print_trace(args.trace, traces[args.trace])
+        return 0
+
+    def duration(item):
+        spans = item[1]
+        return max(s["end"] for s in spans) - min(s["start"] for s in spans)
+
+    def started(item):
+        return min(s["start"] for s in item[1])
+
+    ordered = sorted(traces.items(), key=duration if args.slowest else started, reverse=True)[:args.last]
+    print(f"📊 {len(traces)} trace(s) in {path}, showing {len(ordered)}")
+    for trace_id, spans in ordered:
+        print_trace(trace_id, spans)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from "react";
 import { useProjectContext } from "../contexts/ProjectContext";
 import { supabaseClient, isSupabaseAvailable } from "../lib/supabaseClient";
+import { createTraceContext } from "../lib/tracing";
 
 interface ChatMessage {
   id: string;
@@ -232,17 +233,20 @@ export function useChatWithGemini(projectId: string) {
       let backendUrl = import.meta.env.VITE_BACKEND_URL || "http://localhost:4000";
       backendUrl = backendUrl.replace(/\/api\/?$/, '').replace(/\/$/, '');
       
-      console.log(`📤 Sending message to backend with projectId: ${projectId}`);
+      // Propagate a trace so this request can be found in the backend's traces
+      const trace = createTraceContext();
+      console.log(`📤 Sending message to backend with projectId: ${projectId} (trace ${trace.traceId})`);
       const res = await fetch(
         `${backendUrl}/api/chat`,
         {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
+          headers: { "Content-Type": "application/json", traceparent: trace.traceparent },
           body: JSON.stringify({ projectId, message: text }),
         }
       );
 
       if (!res.ok) {
+        console.error(`❌ Chat request failed (trace ${trace.traceId})`);
         let errorMessage = `Chat failed with status ${res.status}`;
         try {
           const errorData = await res.json();
@@ -0,0 +1,20 @@
+// W3C Trace Context helpers so a chat request can be followed through the backend's traces
+
+function randomHex(bytes: number): string {
+  const values = new Uint8Array(bytes);
+  crypto.getRandomValues(values);
+  return Array.from(values, (value) => value.toString(16).padStart(2, "0")).join("");
+}
+
+export interface TraceContext {
+  traceId: string;
+  traceparent: string;
+}
+
+// Starts a new trace; send `traceparent` as a request header. The flags are
+// 00 (not sampled) so the backend decides with its TRACING_SAMPLE_RATE
+export function createTraceContext(): TraceContext {
+  const traceId = randomHex(16);
+  const spanId = randomHex(8);
+  return { traceId, traceparent: `00-${traceId}-${spanId}-00` };
+}